@@ -0,0 +1,518 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from libs import Cell, Game
+from libs.data import CornerCells, CuttingInfo
+from libs.local_server import LocalServer
+from libs.network import API
+
+ARCHIVE_DIR = Path(__file__).parent / "大会ログ"
+SIZES = (8, 32, 64, 128, 256)
+
+# デバッグ用の盤面生成時に渡す問題フォーマット 盤面は生成したもので置き換えられる
+DEBUG_INPUT = {
+    "board": {"width": 1, "height": 1, "start": ["0"], "goal": ["0"]},
+    "general": {"n": 0, "patterns": []},
+}
+
+
+def load_cases(sizes: list[int], seed: int, archive: bool = True) -> dict[str, dict]:
+    """ベンチマーク対象の問題を読み込み
+
+    Args:
+        sizes (list[int]): ランダム生成する盤面の縦横幅
+        seed (int): ランダム生成のシード値
+        archive (bool, optional): 大会ログの問題を含める. Defaults to True.
+
+    Returns:
+        dict[str, dict]: ケース名とGameの引数
+    """
+    cases = {}
+    if archive:
+        for match in sorted(ARCHIVE_DIR.iterdir()):
+            for name in ("problem.json", "dump.json"):
+                if (path := match / name).exists():
+                    with path.open() as f:
+                        cases[match.name] = {"game_input": json.load(f)}
+                    break
+    for size in sizes:
+        cases[f"random_{size}x{size}"] = {
+            "game_input": DEBUG_INPUT,
+            "debug": Cell(size, size),
+            "debug_seed": seed,
+        }
+    return cases
+
+
+def run_case(case: dict, executor: str, memory: bool = False) -> dict:
+    """1問を解いて計測
+
+    Args:
+        case (dict): Gameの引数
+        executor (str): 並列処理の実行方式
+        memory (bool, optional): tracemallocでメモリ使用量の最大値を計測する.
+            Defaults to False.
+
+    Returns:
+        dict: 計測結果
+    """
+    if memory:
+        tracemalloc.start()
+    game = Game(**case, executor=executor)
+    stages = {}
+    for stage in Game.STAGES:
+        start = time.perf_counter()
+        getattr(game, stage)()
+        stages[stage] = time.perf_counter() - start
+    result = {
+        "width": game.board.width,
+        "height": game.board.height,
+        "stages": stages,
+        "total": sum(stages.values()),
+        "n": len(game.logs),
+        "is_goal": bool(game.is_goal),
+    }
+    if memory:
+        result["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    game.executor.shutdown()
+    return result
+
+
+def benchmark(
+    cases: dict[str, dict], repeat: int, executor: str, memory: bool = True
+) -> dict:
+    """全ケースを計測
+
+    時間は計測の影響を避けるためtracemallocを使わない実行の最小値とし,
+    メモリ使用量は別に1回実行して計測する
+
+    Args:
+        cases (dict[str, dict]): ケース名とGameの引数
+        repeat (int): 時間計測の試行回数
+        executor (str): 並列処理の実行方式
+        memory (bool, optional): メモリ使用量を計測する. Defaults to True.
+
+    Returns:
+        dict: レポート
+    """
+    results = {}
+    for name, case in cases.items():
+        runs = [run_case(case, executor) for _ in range(repeat)]
+        result = min(runs, key=lambda run: run["total"])
+        result["stages"] = {
+            stage: min(run["stages"][stage] for run in runs) for stage in Game.STAGES
+        }
+        if memory:
+            result["peak_memory"] = run_case(case, executor, memory=True)[
+                "peak_memory"
+            ]
+        results[name] = result
+        print(
+            f"{name}: {result['total']:.3f}s, n={result['n']}"
+            + (f", peak={result['peak_memory'] / 2**20:.1f}MiB" if memory else ""),
+            file=sys.stderr,
+        )
+    return {
+        "meta": {
+            "date": str(datetime.now()),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "executor": executor,
+            "repeat": repeat,
+        },
+        "cases": results,
+    }
+
+
+def custom_die_case(size: int, count: int, seed: int) -> dict:
+    """一般抜き型を含む問題をランダム生成
+
+    最終盤面は初期盤面のセルを並べ替えたものとする
+
+    Args:
+        size (int): 盤面の縦横幅
+        count (int): 一般抜き型の数
+        seed (int): ランダム生成のシード値
+
+    Returns:
+        dict: Gameの引数
+    """
+    rng = np.random.default_rng(seed)
+    start = rng.integers(0, 4, (size, size))
+    goal = rng.permutation(start.ravel()).reshape(size, size)
+    patterns = []
+    for i in range(count):
+        width, height = rng.integers(1, size + 1, 2).tolist()
+        cells = rng.integers(0, 2, (height, width))
+        patterns.append(
+            {
+                "p": 25 + i,
+                "width": width,
+                "height": height,
+                "cells": ["".join(map(str, row)) for row in cells],
+            }
+        )
+    return {
+        "game_input": {
+            "board": {
+                "width": size,
+                "height": size,
+                "start": ["".join(map(str, row)) for row in start],
+                "goal": ["".join(map(str, row)) for row in goal],
+            },
+            "general": {"n": count, "patterns": patterns},
+        }
+    }
+
+
+def benchmark_custom_dies(cases: dict[str, dict], executor: str) -> dict:
+    """一般抜き型で辺のラインを分割する処理の有無で時間と操作数を比べる
+
+    Args:
+        cases (dict[str, dict]): ケース名とGameの引数
+        executor (str): 並列処理の実行方式
+
+    Returns:
+        dict: ケースごとの計測結果
+    """
+    results = {}
+    for name, case in cases.items():
+        enabled = run_case(case, executor)
+        disabled = run_case({**case, "custom_dies": False}, executor)
+        results[name] = {
+            "enabled": {key: enabled[key] for key in ("total", "n", "is_goal")},
+            "disabled": {key: disabled[key] for key in ("total", "n", "is_goal")},
+            "saved_ops": disabled["n"] - enabled["n"],
+            "extra_seconds": enabled["total"] - disabled["total"],
+        }
+    return results
+
+
+def benchmark_fetch(
+    problem: dict,
+    delay: float,
+    latency: float,
+    failure_rate: float,
+    interval: float,
+    known_start: bool,
+    seed: int,
+) -> dict:
+    """ローカルの競技サーバーから問題を取得して解き始めるまでの遅延を計測
+
+    Args:
+        problem (dict): 配信する問題
+        delay (float): 競技開始までの秒数
+        latency (float): 応答の遅延(秒)
+        failure_rate (float): 500エラーを返す確率
+        interval (float): 再試行時インターバル
+        known_start (bool): クライアントに競技開始時刻を渡す
+        seed (int): エラー発生のシード値
+
+    Returns:
+        dict: 計測結果
+    """
+    starts_at = time.time() + delay
+    with LocalServer(
+        problem,
+        starts_at=starts_at,
+        latency=latency,
+        failure_rate=failure_rate,
+        seed=seed,
+    ) as server:
+        api = API(url=server.url, token=server.token)
+        problem = api.get_problem(
+            retry=100, interval=interval, starts_at=starts_at if known_start else None
+        )
+        fetched = time.time()
+        Game(problem, executor="serial")
+        started = time.time()
+        requests = len(server.requests)
+    return {
+        "known_start": known_start,
+        "fetch_latency": fetched - starts_at,
+        "solve_start_latency": started - starts_at,
+        "requests": requests,
+    }
+
+
+@contextmanager
+def count_instances(*classes: type) -> Iterator[dict[str, int]]:
+    """範囲内で作られたインスタンスをクラスごとに数える
+
+    Args:
+        *classes (type): 数えるクラス
+
+    Yields:
+        dict[str, int]: クラス名と作られた数
+    """
+    counts = dict.fromkeys((cls.__name__ for cls in classes), 0)
+    originals = {cls: cls.__init__ for cls in classes}
+
+    def counting(name: str, init: Callable) -> Callable:
+        def __init__(self, *args, **kwargs):
+            counts[name] += 1
+            init(self, *args, **kwargs)
+
+        return __init__
+
+    for cls, init in originals.items():
+        cls.__init__ = counting(cls.__name__, init)
+    try:
+        yield counts
+    finally:
+        for cls, init in originals.items():
+            cls.__init__ = init
+
+
+def benchmark_swaps(size: int, count: int, seed: int) -> dict:
+    """Game.swap 1回あたりの時間と作られる座標・操作・角の値の数を計測
+
+    時間は数えない実行で計測する
+
+    Args:
+        size (int): 盤面の縦横幅
+        count (int): 交換回数
+        seed (int): 盤面と交換対象の生成のシード値
+
+    Returns:
+        dict: 計測結果
+    """
+    game = Game(
+        DEBUG_INPUT, debug=Cell(size, size), debug_seed=seed, executor="serial"
+    )
+    rng = np.random.default_rng(seed)
+    targets = [
+        (Cell(x_1, y_1), Cell(x_2, y_2))
+        for x_1, y_1, x_2, y_2 in rng.integers(0, size, (count, 4)).tolist()
+        if (x_1, y_1) != (x_2, y_2)
+    ]
+    start = time.perf_counter()
+    for target_1, target_2 in targets:
+        game.swap(game.board, target_1, target_2)
+    elapsed = time.perf_counter() - start
+
+    with count_instances(Cell, CuttingInfo, CornerCells) as counts:
+        for target_1, target_2 in targets:
+            game.swap(game.board, target_1, target_2)
+    game.executor.shutdown()
+    return {
+        "size": size,
+        "swaps": len(targets),
+        "time_per_swap": elapsed / len(targets),
+        "instances_per_swap": {
+            name: instances / len(targets) for name, instances in counts.items()
+        },
+    }
+
+
+def compare(
+    report: dict, baseline: dict, threshold: float, min_seconds: float
+) -> list[str]:
+    """基準のレポートと比較して悪化した項目を列挙
+
+    Args:
+        report (dict): 今回のレポート
+        baseline (dict): 基準のレポート
+        threshold (float): 許容する悪化の割合
+        min_seconds (float): 許容する時間の悪化の絶対値
+
+    Returns:
+        list[str]: 悪化した項目
+    """
+    regressions = []
+    for name, result in report["cases"].items():
+        if name not in baseline["cases"]:
+            continue
+        base = baseline["cases"][name]
+        times = {**result["stages"], "total": result["total"]}
+        base_times = {**base["stages"], "total": base["total"]}
+        for key, seconds in times.items():
+            if key not in base_times:
+                continue
+            limit = max(
+                base_times[key] * (1 + threshold), base_times[key] + min_seconds
+            )
+            if seconds > limit:
+                regressions.append(
+                    f"{name} {key}: {base_times[key]:.3f}s -> {seconds:.3f}s"
+                )
+        if result["n"] > base["n"]:
+            regressions.append(f"{name} n: {base['n']} -> {result['n']}")
+        if "peak_memory" in result and "peak_memory" in base:
+            if result["peak_memory"] > base["peak_memory"] * (1 + threshold):
+                regressions.append(
+                    f"{name} peak_memory: {base['peak_memory']} -> {result['peak_memory']}"
+                )
+        if base["is_goal"] and not result["is_goal"]:
+            regressions.append(f"{name} is_goal: True -> False")
+    for name, result in report.get("fetch", {}).items():
+        base = baseline.get("fetch", {}).get(name)
+        if base is None:
+            continue
+        limit = max(
+            base["solve_start_latency"] * (1 + threshold),
+            base["solve_start_latency"] + min_seconds,
+        )
+        if result["solve_start_latency"] > limit:
+            regressions.append(
+                f"fetch {name}: {base['solve_start_latency']:.3f}s -> {result['solve_start_latency']:.3f}s"
+            )
+    if "swaps" in report and "swaps" in baseline:
+        result, base = report["swaps"], baseline["swaps"]
+        if result["time_per_swap"] > base["time_per_swap"] * (1 + threshold):
+            regressions.append(
+                f"swaps time_per_swap: {base['time_per_swap'] * 1e6:.1f}us -> "
+                f"{result['time_per_swap'] * 1e6:.1f}us"
+            )
+        for name, instances in result["instances_per_swap"].items():
+            base_instances = base["instances_per_swap"].get(name, 0)
+            if instances > base_instances * (1 + threshold):
+                regressions.append(
+                    f"swaps {name} per swap: {base_instances:.1f} -> {instances:.1f}"
+                )
+    return regressions
+
+
+parser = argparse.ArgumentParser(description="ソルバーの処理時間と操作数の計測")
+parser.add_argument(
+    "-o", "--output", type=str, default="./benchmark.json", help="レポートの出力先"
+)
+parser.add_argument(
+    "-c", "--compare", type=str, help="比較する基準のレポート 悪化があれば終了コード1"
+)
+parser.add_argument(
+    "--sizes",
+    type=int,
+    nargs="*",
+    default=list(SIZES),
+    help="ランダム生成する盤面の縦横幅",
+)
+parser.add_argument("-s", "--seed", type=int, default=0, help="ランダム生成のシード値")
+parser.add_argument("-n", "--repeat", type=int, default=1, help="時間計測の試行回数")
+parser.add_argument(
+    "--no-archive", action="store_true", help="大会ログの問題を計測しない"
+)
+parser.add_argument(
+    "--no-memory", action="store_true", help="メモリ使用量を計測しない"
+)
+parser.add_argument(
+    "-e", "--executor", type=str, default="auto", help="並列処理の実行方式"
+)
+parser.add_argument(
+    "--fetch",
+    action="store_true",
+    help="ローカルの競技サーバーから問題を取得して解き始めるまでの遅延を計測する",
+)
+parser.add_argument(
+    "--swaps",
+    type=int,
+    nargs="?",
+    const=10000,
+    help="Game.swapの1回あたりの時間と作られる値の数を指定回数の交換で計測する",
+)
+parser.add_argument(
+    "--custom-dies",
+    type=int,
+    nargs="*",
+    help="一般抜き型で辺のラインを分割する処理の有無で時間と操作数を比べる"
+    " 大会ログの問題と指定した縦横幅の一般抜き型を含む問題で計測する",
+)
+parser.add_argument(
+    "--latency", type=float, default=0.01, help="ローカルの競技サーバーの応答の遅延(秒)"
+)
+parser.add_argument(
+    "--failure-rate",
+    type=float,
+    default=0.1,
+    help="ローカルの競技サーバーが500エラーを返す確率",
+)
+parser.add_argument(
+    "-t",
+    "--threshold",
+    type=float,
+    default=0.1,
+    help="比較時に悪化とみなす割合",
+)
+parser.add_argument(
+    "--min-seconds",
+    type=float,
+    default=0.05,
+    help="比較時に悪化とみなす時間の差の最小値",
+)
+
+
+def main():
+    args = parser.parse_args()
+    cases = load_cases(args.sizes, args.seed, archive=not args.no_archive)
+    report = benchmark(cases, args.repeat, args.executor, memory=not args.no_memory)
+    if args.fetch:
+        # 大会ログの問題を配信し, 競技開始時刻を渡さない場合と渡す場合を比べる
+        problem = next(iter(load_cases([], args.seed).values()))["game_input"]
+        report["fetch"] = {
+            name: benchmark_fetch(
+                problem,
+                delay=1.25,
+                latency=args.latency,
+                failure_rate=args.failure_rate,
+                interval=0.5,
+                known_start=known_start,
+                seed=args.seed,
+            )
+            for name, known_start in (("polling", False), ("aligned", True))
+        }
+        for name, result in report["fetch"].items():
+            print(
+                f"fetch {name}: {result['solve_start_latency']:.3f}s, "
+                f"requests={result['requests']}",
+                file=sys.stderr,
+            )
+    if args.swaps:
+        # 盤面の縦横幅は最大とし, 交換ごとの処理の差が見えるようにする
+        report["swaps"] = benchmark_swaps(max(SIZES), args.swaps, args.seed)
+        print(
+            f"swaps: {report['swaps']['time_per_swap'] * 1e6:.1f}us, "
+            f"instances={report['swaps']['instances_per_swap']} per swap",
+            file=sys.stderr,
+        )
+    if args.custom_dies is not None:
+        custom_cases = {
+            name: case for name, case in cases.items() if not name.startswith("random")
+        }
+        for size in args.custom_dies:
+            custom_cases[f"custom_{size}x{size}"] = custom_die_case(
+                size, count=25, seed=args.seed
+            )
+        report["custom_dies"] = benchmark_custom_dies(custom_cases, args.executor)
+        for name, result in report["custom_dies"].items():
+            print(
+                f"custom_dies {name}: saved {result['saved_ops']} ops "
+                f"for {result['extra_seconds']:+.3f}s",
+                file=sys.stderr,
+            )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_seconds)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, Self
+
+from .game import Game
+from .oplog import OpLog
+from .portfolio import solve_portfolio
+from .replay import ReplayEngine, ops_to_array
+
+# 試す解法と実行する処理 先頭から順に試し, 操作ログの局所最適化は各解法の後に行う
+STRATEGIES: dict[str, tuple[str, ...]] = {
+    "default": ("initial_optimize_board", "rough_arrange", "arrange"),
+    "skip_initial": ("rough_arrange", "arrange"),
+}
+# 複数の変種を並列に解く処理 Gameのメソッドではなくsolve_portfolioを呼ぶ
+PORTFOLIO = "portfolio"
+
+
+class AnswerSubmitter:
+    def __init__(self, post: Callable[[OpLog], Any]) -> None:
+        """回答をバックグラウンドで提出する
+
+        操作数が減った回答のみ受け付け, 提出中に複数の回答が届いた場合は最新のもののみ提出する
+
+        Args:
+            post (Callable[[OpLog], Any]): 回答を提出する関数
+        """
+        self._post = post
+        self._condition = threading.Condition()
+        self._pending: OpLog | None = None
+        self._closed = False
+        self.best_n: int | None = None
+        self.responses: list[Any] = []
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, answer: OpLog) -> bool:
+        """回答を提出待ちにする
+
+        Args:
+            answer (OpLog): 操作ログ 提出後も変更しないもの
+
+        Returns:
+            bool: 受け付けたか
+        """
+        with self._condition:
+            if self.best_n is not None and len(answer) >= self.best_n:
+                return False
+            self.best_n = len(answer)
+            self._pending = answer
+            self._condition.notify()
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                answer, self._pending = self._pending, None
+            try:
+                response = self._post(answer)
+            except Exception as e:
+                # 次の回答の提出は続ける
+                print(f"post answer failed: {e}")
+                continue
+            print(f"posted n={len(answer)}: {response}")
+            self.responses.append(response)
+
+    def close(self, timeout: float | None = None) -> None:
+        """提出待ちの回答を提出して終了
+
+        Args:
+            timeout (float | None, optional): 待機する最大時間. Defaults to None.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class AnytimeSolver:
+    def __init__(
+        self,
+        game_input: dict,
+        submit: Callable[[OpLog], Any],
+        deadline: float | None = None,
+        strategies: dict[str, tuple[str, ...]] = STRATEGIES,
+        portfolio: bool = False,
+        **game_kwargs: Any,
+    ) -> None:
+        """最初の回答を早く提出し, 期限まで操作数の少ない回答を探し続ける
+
+        期限は処理の区切りごとに確認するため, 実行中の処理は中断しない
+
+        Args:
+            game_input (dict): APIから受け取るデータをdict形式として入力
+            submit (Callable[[OpLog], Any]): 完成した回答を渡す関数
+            deadline (float | None, optional): 探索を打ち切るUNIX時刻. Defaults to None.
+            strategies (dict[str, tuple[str, ...]], optional): 試す解法. Defaults to STRATEGIES.
+            portfolio (bool, optional): 最初に複数の変種を並列に解く解法を試すか. Defaults to False.
+            **game_kwargs (Any): Gameに渡す引数
+        """
+        self.game_input = game_input
+        self.submit = submit
+        self.deadline = deadline
+        self.strategies = (
+            {PORTFOLIO: (PORTFOLIO,), **strategies} if portfolio else strategies
+        )
+        self.game_kwargs = game_kwargs
+        self.best: Game | None = None
+        self.best_n: int | None = None
+        self._engine: ReplayEngine | None = None
+
+    def expired(self) -> bool:
+        """期限を過ぎたか"""
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def _verify(self, game: Game) -> bool:
+        """初期盤面から操作ログを再生して完成するか確認
+
+        Args:
+            game (Game): 解いたゲーム
+
+        Returns:
+            bool: 完成するか
+        """
+        start = Game(self.game_input, executor="serial")
+        if self._engine is None:
+            self._engine = ReplayEngine(
+                start.dies, start.board.width, start.board.height
+            )
+        result = self._engine.verify(
+            start.board.field, ops_to_array(game.logs), start.goal.field
+        )
+        return result.matched == result.field.size
+
+    def _offer(self, name: str, game: Game) -> None:
+        """操作数が減っていれば最良の回答として提出
+
+        Args:
+            name (str): 解法名
+            game (Game): 解いたゲーム
+        """
+        if self.best_n is not None and len(game.logs) >= self.best_n:
+            return
+        if not self._verify(game):
+            print(f"{name}: invalid answer")
+            return
+        print(f"{name}: n={len(game.logs)}")
+        self.best = game
+        self.best_n = len(game.logs)
+        # 以降の処理で操作ログが変わっても提出する回答は変えない
+        self.submit(game.logs.copy())
+
+    def solve(self) -> Game | None:
+        """期限まで解法を順に試す 最初の回答は期限を過ぎても完成させる
+
+        Returns:
+            Game | None: 最も操作数の少ない回答 完成した回答がなければNone
+        """
+        for name, stages in self.strategies.items():
+            if self.best is not None and self.expired():
+                break
+            game = Game(self.game_input, **self.game_kwargs)
+            try:
+                for stage in stages:
+                    if self.best is not None and self.expired():
+                        break
+                    if stage == PORTFOLIO:
+                        # 全体と変種ごとの計測はsolve_portfolioが行う
+                        solve_portfolio(game, executor=game.executor)
+                        continue
+                    with game.profiler.stage(stage):
+                        getattr(game, stage)()
+                else:
+                    self._offer(name, game)
+                    if not self.expired():
+                        with game.profiler.stage("optimize_logs"):
+                            game.optimize_logs()
+                        self._offer(f"{name}+optimize_logs", game)
+            finally:
+                if game is not self.best:
+                    game.executor.shutdown()
+        return self.best
@@ -1,5 +1,7 @@
 import argparse
 
+from .executor import EXECUTORS
+
 parser = argparse.ArgumentParser()
 
 parser.add_argument("-l", "--log", type=str, default="./logs", help="ログの出力先")
@@ -10,6 +12,11 @@ parser.add_argument(
 parser.add_argument(
     "-i", "--interval", type=int, default=10, help="APIリクエストの再試行待機時間"
 )
+parser.add_argument(
+    "--starts-at",
+    type=float,
+    help="競技開始のUNIX時刻 指定すると開始直前まで待機してから問題の取得を細かく試す",
+)
 parser.add_argument(
     "-d", "--debug", action="store_true", help="デバッグ(オフライン)モード"
 )
@@ -42,3 +49,33 @@ parser.add_argument(
     help="ボードの縦幅 問題フォーマットが入力された場合は無視される",
 )
 parser.add_argument("-s", "--seed", type=int, help="ボードのランダム生成用シード値")
+parser.add_argument(
+    "-e",
+    "--executor",
+    type=str,
+    choices=["auto", *EXECUTORS],
+    default="auto",
+    help="--portfolioで解法を並列に試す際の実行方式 autoの場合はワーカー数と盤面の大きさから決定",
+)
+parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    help="--portfolioで解法を並列に試す際のワーカー数 未指定の場合はCPU数から決定",
+)
+parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="処理時間と操作回数を計測してログの出力先にprofile.jsonを保存する",
+)
+parser.add_argument(
+    "-t",
+    "--deadline",
+    type=float,
+    help="オンラインモードで最初の回答の提出後も回答の改善と再提出を続ける期限 競技開始からの秒数",
+)
+parser.add_argument(
+    "--portfolio",
+    action="store_true",
+    help="複数の解法を並列に試して最も操作数の少ない回答を使う --deadlineと併用すると最初に試す",
+)
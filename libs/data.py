@@ -1,26 +1,40 @@
 from abc import ABC
-from dataclasses import asdict, astuple, dataclass, replace
+from dataclasses import dataclass, field
 from enum import IntEnum, auto
+from functools import cache
 
 
 class DataClassBase(ABC):
+    # サブクラスはdataclass(frozen=True, slots=True)とし, インスタンスに__dict__を持たせない
+    __slots__ = ()
+
     def tuple(self) -> tuple:
-        return astuple(self)
+        values = (getattr(self, name) for name in self.__match_args__)
+        return tuple(
+            value.tuple() if isinstance(value, DataClassBase) else value
+            for value in values
+        )
 
     def dict(self) -> dict:
-        return asdict(self)
+        values = {}
+        for name in self.__match_args__:
+            value = getattr(self, name)
+            values[name] = value.dict() if isinstance(value, DataClassBase) else value
+        return values
 
     def __repr__(self) -> str:
         return str(self.dict())
 
     def copy(self):
-        return replace(self)
+        # 不変のため複製せずに自身を返す
+        return self
 
 
 class GameSpecification(IntEnum):
     """ゲームの仕様"""
 
     MAX_SIZE = 256
+    CELL_VALUES = 4
 
 
 class Direction(IntEnum):
@@ -40,7 +54,7 @@ class StaticDieTypes(IntEnum):
     EVEN_COLUMN = auto()
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class CuttingInfo(DataClassBase):
     """操作内容"""
 
@@ -50,7 +64,7 @@ class CuttingInfo(DataClassBase):
     s: int
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Cell(DataClassBase):
     """座標"""
 
@@ -58,7 +72,7 @@ class Cell(DataClassBase):
     y: int
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class CornerCells(DataClassBase):
     """角のセル"""
 
@@ -66,28 +80,65 @@ class CornerCells(DataClassBase):
     ne: Cell
     sw: Cell
     se: Cell
+    # 角のセルから(北側か, 南側か, 西側か, 東側か)を引く表
+    sides: dict[Cell, tuple[bool, bool, bool, bool]] = field(
+        init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        # 判定のたびに角の組を作らないよう, 角ごとの判定を先に求めておく
+        sides = {
+            corner: (
+                corner.y in (self.nw.y, self.ne.y),
+                corner.y in (self.sw.y, self.se.y),
+                corner.x in (self.nw.x, self.sw.x),
+                corner.x in (self.ne.x, self.se.x),
+            )
+            for corner in self.members()
+        }
+        object.__setattr__(self, "sides", sides)
+
+    @classmethod
+    @cache
+    def of_size(cls, width: int, height: int) -> "CornerCells":
+        """盤面の角のセル 不変のため同じ大きさの盤面で共有する
+
+        Args:
+            width (int): 盤面の横幅
+            height (int): 盤面の縦幅
+
+        Returns:
+            CornerCells: 角のセル
+        """
+        return cls(
+            nw=Cell(0, 0),
+            ne=Cell(width - 1, 0),
+            sw=Cell(0, height - 1),
+            se=Cell(width - 1, height - 1),
+        )
 
     def members(self) -> tuple[Cell]:
         return self.nw, self.ne, self.sw, self.se
 
     def is_corner(self, corner: Cell):
-        return corner in self.members()
+        return corner in self.sides
+
+    def _side(self, corner: Cell, index: int) -> bool:
+        sides = self.sides.get(corner)
+        assert sides is not None, f"{corner} is not corner cell"
+        return sides[index]
 
     def is_n(self, corner: Cell):
-        assert self.is_corner(corner), f"{corner} is not corner cell"
-        return corner.y in (self.nw.y, self.ne.y)
+        return self._side(corner, 0)
 
     def is_s(self, corner: Cell):
-        assert self.is_corner(corner), f"{corner} is not corner cell"
-        return corner.y in (self.sw.y, self.se.y)
+        return self._side(corner, 1)
 
     def is_w(self, corner: Cell):
-        assert self.is_corner(corner), f"{corner} is not corner cell"
-        return corner.x in (self.nw.x, self.sw.x)
+        return self._side(corner, 2)
 
     def is_e(self, corner: Cell):
-        assert self.is_corner(corner), f"{corner} is not corner cell"
-        return corner.x in (self.ne.x, self.se.x)
+        return self._side(corner, 3)
 
     @property
     def n(self):
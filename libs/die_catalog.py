@@ -0,0 +1,381 @@
+from dataclasses import dataclass
+from typing import ClassVar
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .data import CuttingInfo, Direction
+from .patterns import CuttingDie
+
+# ラインの外などを埋める値 セルの値(0〜3)とも互いにも一致しない
+UNMATCHED_LINE = 4
+UNMATCHED_GOAL = 5
+
+
+def _prefix_counts(values: np.ndarray) -> np.ndarray:
+    """最後の軸に沿った, 各位置より前のTrueの数
+
+    ラインの長さはGameSpecification.MAX_SIZE以下のため, 数や位置はint16で扱う
+
+    Args:
+        values (np.ndarray): bool配列
+
+    Returns:
+        np.ndarray: 最後の軸の長さが1つ長いint16配列 先頭は0
+    """
+    counts = np.zeros((*values.shape[:-1], values.shape[-1] + 1), dtype=np.int16)
+    np.cumsum(values, axis=-1, out=counts[..., 1:])
+    return counts
+
+
+def _diagonal_counts(line: np.ndarray, goal: np.ndarray, span: int) -> np.ndarray:
+    """ラインの各セルとdだけずれた位置の完成状態の一致数の累積
+
+    Args:
+        line (np.ndarray): 辺のラインの現在の値
+        goal (np.ndarray): 辺のラインの完成状態の値
+        span (int): dの範囲 -span〜span
+
+    Returns:
+        np.ndarray: [d + span, i]がi未満のセルについてline[i'] == goal[i' + d]の数
+            ライン外の位置は一致に数えない
+    """
+    # 完成状態の前後にspanずつ一致しない値を付け, ずれごとの窓をラインと比べる
+    padded = np.pad(goal, span, constant_values=UNMATCHED_GOAL)
+    return _prefix_counts(sliding_window_view(padded, len(line)) == line)
+
+
+def _stack_masks(masks: list[np.ndarray]) -> np.ndarray:
+    """マスクの末尾をFalseで埋めて長さを揃える
+
+    Args:
+        masks (list[np.ndarray]): マスク
+
+    Returns:
+        np.ndarray: (マスク, 最大の長さ)の配列
+    """
+    size = max(len(mask) for mask in masks)
+    return np.stack([np.pad(mask, (0, size - len(mask))) for mask in masks])
+
+
+@dataclass(frozen=True)
+class EdgePartitions:
+    """辺のラインのみに重なる一般抜き型の置き方
+
+    抜き型を盤面の外にはみ出させて辺のラインだけに重ねると,
+    そのラインを抜かれたセルと残りのセルに安定分割する並べ替えになる
+    並べ替えは置き方ごとに持たず, 抜き型のラインのマスクから一致数を求める
+    """
+
+    # 一致数を求める際に一度に扱うセル数の上限
+    CHUNK_SIZE: ClassVar[int] = 1 << 20
+
+    length: int
+    ids: np.ndarray
+    offsets: np.ndarray
+    directions: np.ndarray
+    # 置き方ごとの抜き型のラインのindex
+    lines: np.ndarray
+    # 抜かれたセルを前に寄せる置き方か
+    backward: np.ndarray
+    # 抜き型のラインのマスク 長さの近いものをまとめた(ラインのindex, マスク)の並び
+    masks: tuple[tuple[np.ndarray, np.ndarray], ...]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def punched(self, index: int) -> np.ndarray:
+        """置き方で抜かれる辺のラインのセル
+
+        Args:
+            index (int): 置き方のindex
+
+        Returns:
+            np.ndarray: 抜かれるセルがTrueのbool配列
+        """
+        line = int(self.lines[index])
+        mask = next(
+            masks[lines == line][0] for lines, masks in self.masks if line in lines
+        )
+        punched = np.zeros(self.length, dtype=np.bool_)
+        offset = int(self.offsets[index])
+        start, stop = max(offset, 0), min(offset + len(mask), self.length)
+        punched[start:stop] = mask[start - offset : stop - offset]
+        return punched
+
+    def matches(self, line: np.ndarray, goal: np.ndarray) -> np.ndarray:
+        """置き方ごとに並べ替えた後のラインと完成状態の一致数
+
+        Args:
+            line (np.ndarray): 辺のラインの現在の値
+            goal (np.ndarray): 辺のラインの完成状態の値
+
+        Returns:
+            np.ndarray: 置き方ごとの一致数
+        """
+        sizes = [masks.shape[1] for _, masks in self.masks]
+        # 抜かれるセルの数だけずれるため, ずれは辺のラインより短い抜き型のラインの長さ以下
+        span = max((size for size in sizes if size <= self.length), default=0)
+        counts = _diagonal_counts(line, goal, span) if span else None
+        matches = np.zeros(
+            (2, len(self.lines), max(sizes) + self.length - 1), dtype=np.intp
+        )
+        for lines, masks in self.masks:
+            size = masks.shape[1]
+            cells = min(size, self.length) * (size + self.length - 1)
+            step = max(1, self.CHUNK_SIZE // cells)
+            for start in range(0, len(lines), step):
+                chunk = slice(start, start + step)
+                if size <= self.length:
+                    forward, backward = self._footprint_matches(
+                        masks[chunk], line, goal, counts, span
+                    )
+                else:
+                    forward, backward = self._window_matches(masks[chunk], line, goal)
+                matches[0, lines[chunk], : size + self.length - 1] = forward
+                matches[1, lines[chunk], : size + self.length - 1] = backward
+        windows = self.length - 1 - self.offsets
+        return matches[self.backward.astype(np.intp), self.lines, windows]
+
+    def _window_matches(
+        self, masks: np.ndarray, line: np.ndarray, goal: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """辺のラインより長いマスクの全てのずらし方について, 両方向に分割した後の一致数
+
+        辺のラインの全てのセルについて, 残るセル・抜かれたセルそれぞれの中での順位から
+        並べ替え後の位置を求める 抜き型の外のセルは残るセルとして同じ式で求まる
+
+        Args:
+            masks (np.ndarray): (ライン, 抜き型のラインの長さ)のマスク
+            line (np.ndarray): 辺のラインの現在の値
+            goal (np.ndarray): 辺のラインの完成状態の値
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: 抜かれたセルを後ろ・前に寄せた場合の
+                (ライン, length - 1 - ずらす量)の一致数
+        """
+        # 前後にlength - 1ずつ余白を付けて, 全てのずらし方のマスクを窓として見る
+        padded = np.pad(masks, ((0, 0), (self.length - 1, self.length - 1)))
+        hit = sliding_window_view(padded, self.length, axis=1)
+        prefix = _prefix_counts(padded)
+        windows = hit.shape[1]
+        rank = (
+            sliding_window_view(prefix[:, :-1], self.length, axis=1)
+            - prefix[:, :windows, None]
+        )
+        punched = prefix[:, self.length : self.length + windows] - prefix[:, :windows]
+        punched = punched[:, :, None]
+        kept = np.arange(self.length, dtype=np.int16) - rank
+        forward = np.where(hit, self.length - punched + rank, kept)
+        backward = np.where(hit, rank, punched + kept)
+        return (
+            (goal[forward] == line).sum(axis=2, dtype=np.int16),
+            (goal[backward] == line).sum(axis=2, dtype=np.int16),
+        )
+
+    def _footprint_matches(
+        self,
+        masks: np.ndarray,
+        line: np.ndarray,
+        goal: np.ndarray,
+        counts: np.ndarray,
+        span: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """辺のライン以下の長さのマスクの全てのずらし方について, 両方向に分割した後の一致数
+
+        抜き型が重ならないセルは並べ替え後も一定量ずれるだけのため,
+        ずれごとの一致数の累積から求め, 重なるセルのみ並べ替え後の位置を計算する
+
+        Args:
+            masks (np.ndarray): (ライン, 抜き型のラインの長さ)のマスク
+            line (np.ndarray): 辺のラインの現在の値
+            goal (np.ndarray): 辺のラインの完成状態の値
+            counts (np.ndarray): _diagonal_countsの結果
+            span (int): countsのずれの範囲
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: 抜かれたセルを後ろ・前に寄せた場合の
+                (ライン, length - 1 - ずらす量)の一致数
+        """
+        size = masks.shape[1]
+        offsets = self.length - 1 - np.arange(size + self.length - 1, dtype=np.int16)
+        # 抜き型のラインのうち辺のラインに重なる範囲と, 辺のラインのうち重なる範囲
+        start = np.maximum(0, -offsets)
+        stop = np.minimum(size, self.length - offsets)
+        first, last = start + offsets, stop + offsets
+        prefix = _prefix_counts(masks)
+        punched = prefix[:, stop] - prefix[:, start]
+
+        # 重ならないセル 前の残るセルと後ろの残るセルはそれぞれ一定量ずれる
+        forward = (
+            counts[span, first]
+            + counts[span - punched, self.length]
+            - counts[span - punched, last]
+        )
+        backward = (
+            counts[span + punched, first]
+            + counts[span, self.length]
+            - counts[span, last]
+        )
+
+        # 重なるセル 残るセル・抜かれたセルそれぞれの中での順位から位置を求める
+        # 抜き型のラインに沿って数え, 辺のラインの外は一致しない値で埋める
+        padded = np.pad(line, size - 1, constant_values=UNMATCHED_LINE)
+        values = sliding_window_view(padded, size)[::-1]
+        cells = offsets[:, None] + np.arange(size, dtype=np.int16)
+        rank = prefix[:, None, :-1] - prefix[:, start][:, :, None]
+        hit = masks[:, None, :]
+        # 辺のラインの外のセルの位置ははみ出すため, 完成状態に余白を付ける
+        padding = 2 * size + 1
+        targets = np.pad(goal, padding, constant_values=UNMATCHED_GOAL)
+        kept = cells + padding - rank
+        rank += padding
+        punched = punched[:, :, None]
+        for matches, positions in (
+            (forward, np.where(hit, self.length - punched + rank, kept)),
+            (backward, np.where(hit, rank, punched + kept)),
+        ):
+            matches += (targets[positions] == values).sum(axis=2, dtype=np.int16)
+        return forward, backward
+
+
+class DieCatalog:
+    # 辺ごとに盤面の外にはみ出させて重ねる抜き型のラインのindexと, 列か
+    EDGE_LINES = {
+        Direction.UP: (-1, False),
+        Direction.DOWN: (0, False),
+        Direction.LEFT: (-1, True),
+        Direction.RIGHT: (0, True),
+    }
+    # 辺のラインより短い, これ以下の長さのマスクは長さが2倍以内のものをまとめて計算する
+    BUCKET_SIZE = 32
+
+    def __init__(self, dies: list[CuttingDie]) -> None:
+        """一般抜き型を辺ごとのラインのマスクで引ける索引
+
+        各辺について, 盤面の外にはみ出させたときに辺に重なる抜き型の行・列のマスクを
+        重複を除いて持ち, ラインの長さごとの置き方は初回参照時に求める
+
+        Args:
+            dies (list[CuttingDie]): idの順に並んだ全ての抜き型
+        """
+        self.dies = {die.id: die for die in dies if die.type is None}
+        self._lines: dict[int, list[tuple[CuttingDie, np.ndarray]]] = {}
+        for edge, (index, vertical) in self.EDGE_LINES.items():
+            lines, seen = [], set()
+            for die in self.dies.values():
+                field = die.field.astype(np.bool_)
+                line = field[:, index] if vertical else field[index]
+                if line.any() and (key := line.tobytes()) not in seen:
+                    seen.add(key)
+                    lines.append((die, line))
+            self._lines[edge] = lines
+        self._partitions: dict[tuple[int, int], EdgePartitions] = {}
+
+    def __len__(self) -> int:
+        return len(self.dies)
+
+    def partitions(self, edge: int, length: int) -> EdgePartitions:
+        """辺のラインを分割する全ての置き方
+
+        Args:
+            edge (int): 辺
+            length (int): ラインの長さ
+
+        Returns:
+            EdgePartitions: 置き方ごとの抜き型・位置・方向と抜き型のラインのマスク
+        """
+        if (edge, length) in self._partitions:
+            return self._partitions[(edge, length)]
+
+        entries = self._lines[edge]
+        vertical = self.EDGE_LINES[edge][1]
+        forward, backward = (
+            (Direction.UP, Direction.DOWN)
+            if vertical
+            else (Direction.LEFT, Direction.RIGHT)
+        )
+        ids, offsets, directions, lines, backwards = [], [], [], [], []
+        for i, (die, line) in enumerate(entries):
+            # 抜き型のラインが辺のラインに1セル以上重なるずらし方
+            shifts = length - 1 - np.arange(len(line) + length - 1)
+            prefix = _prefix_counts(line)
+            start = np.maximum(0, -shifts)
+            stop = np.minimum(len(line), length - shifts)
+            shifts = shifts[prefix[stop] > prefix[start]]
+            for direction in (forward, backward):
+                ids.append(np.full(len(shifts), die.id))
+                offsets.append(shifts)
+                directions.append(np.full(len(shifts), int(direction)))
+                lines.append(np.full(len(shifts), i))
+                backwards.append(np.full(len(shifts), direction == backward))
+
+        # 辺のラインより長いマスクと短いマスクは末尾を抜かれないセルで揃えてまとめる
+        # 末尾の抜かれないセルは並べ替えを変えない
+        groups: dict[int, list[int]] = {}
+        for i, (_, line) in enumerate(entries):
+            size = len(line)
+            if size > length:
+                key = -1
+            elif size > self.BUCKET_SIZE:
+                key = size
+            else:
+                key = -2 - (size - 1).bit_length()
+            groups.setdefault(key, []).append(i)
+        partitions = EdgePartitions(
+            length,
+            *(
+                np.concatenate(values) if values else np.empty(0, dtype=np.intp)
+                for values in (ids, offsets, directions, lines)
+            ),
+            np.concatenate(backwards) if backwards else np.empty(0, dtype=np.bool_),
+            tuple(
+                (np.array(indices), _stack_masks([entries[i][1] for i in indices]))
+                for indices in groups.values()
+            ),
+        )
+        self._partitions[(edge, length)] = partitions
+        return partitions
+
+    def best_partition(
+        self,
+        edge: int,
+        line: np.ndarray,
+        goal: np.ndarray,
+        width: int,
+        height: int,
+    ) -> tuple[int, CuttingInfo] | None:
+        """辺のラインの一致数が最も増える操作
+
+        Args:
+            edge (int): 辺
+            line (np.ndarray): 辺のラインの現在の値
+            goal (np.ndarray): 辺のラインの完成状態の値
+            width (int): 盤面の横幅
+            height (int): 盤面の縦幅
+
+        Returns:
+            tuple[int, CuttingInfo] | None: 一致数の増分と操作 置き方がなければNone
+        """
+        partitions = self.partitions(edge, len(line))
+        if not len(partitions):
+            return None
+        matches = partitions.matches(line, goal)
+        best = int(np.argmax(matches))
+        gain = int(matches[best]) - int(np.count_nonzero(line == goal))
+
+        die_id = int(partitions.ids[best])
+        offset = int(partitions.offsets[best])
+        die = self.dies[die_id]
+        match edge:
+            case Direction.UP:
+                x, y = offset, 1 - die.height
+            case Direction.DOWN:
+                x, y = offset, height - 1
+            case Direction.LEFT:
+                x, y = 1 - die.width, offset
+            case _:
+                x, y = width - 1, offset
+        return gain, CuttingInfo(
+            p=die_id, x=x, y=y, s=int(partitions.directions[best])
+        )
@@ -0,0 +1,279 @@
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor as PoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Self
+
+import numpy as np
+
+# この面積以下の盤面では変種を解くよりワーカーの起動と受け渡しの方が重いため逐次実行する
+SERIAL_MAX_CELLS = 64 * 64
+
+
+def default_workers() -> int:
+    """マシンに合わせたワーカー数
+
+    Returns:
+        int: 利用可能なCPU数から2つ残した数(最低1)
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    return max(1, cpus - 2)
+
+
+class SharedArrays:
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        """ワーカーに渡す共有配列のハンドル
+
+        同一プロセス内で実行する場合は配列をそのまま参照する
+
+        Args:
+            arrays (dict[str, np.ndarray]): 共有する配列
+        """
+        self._arrays = arrays
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self._arrays[key]
+
+    def close(self) -> None:
+        """ワーカー側での参照を終了"""
+
+    def release(self) -> None:
+        """共有を終了"""
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.release()
+
+
+class SharedMemoryArrays(SharedArrays):
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        """共有メモリ上に配置した配列のハンドル
+
+        配列は作成時に1度だけ共有メモリへコピーされ, ワーカーには名前と形状のみが渡る
+
+        Args:
+            arrays (dict[str, np.ndarray]): 共有する配列
+        """
+        self._segments: dict[str, SharedMemory] = {}
+        self._specs: dict[str, tuple[str, tuple[int, ...], str]] = {}
+        self._owner = True
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            segment = SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+            self._segments[key] = segment
+            self._specs[key] = (segment.name, array.shape, array.dtype.str)
+
+    def __getstate__(self) -> dict:
+        return {"specs": self._specs}
+
+    def __setstate__(self, state: dict) -> None:
+        self._segments = {}
+        self._specs = state["specs"]
+        self._owner = False
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        name, shape, dtype = self._specs[key]
+        if key not in self._segments:
+            # ワーカーは作成側のresource trackerを共有するため解放は作成側のみで行う
+            self._segments[key] = SharedMemory(name=name)
+        array = np.ndarray(shape, dtype, buffer=self._segments[key].buf)
+        array.flags.writeable = False
+        return array
+
+    def close(self) -> None:
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
+
+    def release(self) -> None:
+        segments = list(self._segments.values())
+        self.close()
+        if self._owner:
+            for segment in segments:
+                segment.unlink()
+
+
+class RayArrays(SharedArrays):
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        """Rayのobject storeに配置した配列のハンドル
+
+        Args:
+            arrays (dict[str, np.ndarray]): 共有する配列
+        """
+        import ray
+
+        self._refs = {key: ray.put(array) for key, array in arrays.items()}
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        import ray
+
+        return ray.get(self._refs[key])
+
+    def release(self) -> None:
+        self._refs.clear()
+
+
+class Executor(ABC):
+    name: str
+    shared_class: type[SharedArrays] = SharedArrays
+
+    def __init__(self, workers: int | None = None) -> None:
+        """並列処理の実行方式の基底クラス
+
+        ワーカーは最初のmap呼び出し時に起動する
+
+        Args:
+            workers (int | None, optional): ワーカー数. Defaults to None.
+        """
+        self.workers = workers or default_workers()
+
+    @abstractmethod
+    def map(self, fn: Callable, *iterables: Iterable) -> list:
+        """関数を各引数に適用
+
+        Args:
+            fn (Callable): 適用する関数
+            *iterables (Iterable): 引数
+
+        Returns:
+            list: 引数の順序での結果
+        """
+
+    def share(self, arrays: dict[str, np.ndarray]) -> SharedArrays:
+        """配列をワーカーと共有
+
+        Args:
+            arrays (dict[str, np.ndarray]): 共有する配列
+
+        Returns:
+            SharedArrays: ワーカーに渡すハンドル
+        """
+        return self.shared_class(arrays)
+
+    def shutdown(self) -> None:
+        """ワーカーを停止"""
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+
+    def __getstate__(self) -> dict:
+        # ワーカーはプロセス間で共有できないため起動前の状態として渡す
+        return {"workers": self.workers}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["workers"])
+
+
+class SerialExecutor(Executor):
+    name = "serial"
+
+    def __init__(self, workers: int | None = None) -> None:
+        super().__init__(1)
+
+    def map(self, fn: Callable, *iterables: Iterable) -> list:
+        return list(map(fn, *iterables))
+
+
+class _PoolExecutor(Executor):
+    pool_class: type[PoolExecutor]
+
+    def __init__(self, workers: int | None = None) -> None:
+        super().__init__(workers)
+        self._pool: PoolExecutor | None = None
+
+    def map(self, fn: Callable, *iterables: Iterable) -> list:
+        if self._pool is None:
+            self._pool = self.pool_class(max_workers=self.workers)
+        return list(self._pool.map(fn, *iterables))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class ThreadExecutor(_PoolExecutor):
+    name = "thread"
+    pool_class = ThreadPoolExecutor
+
+
+class ProcessExecutor(_PoolExecutor):
+    name = "process"
+    pool_class = ProcessPoolExecutor
+    shared_class = SharedMemoryArrays
+
+
+def _call(fn: Callable, *args: Any) -> Any:
+    return fn(*args)
+
+
+class RayExecutor(Executor):
+    name = "ray"
+    shared_class = RayArrays
+
+    def __init__(self, workers: int | None = None) -> None:
+        super().__init__(workers)
+        self._remote = None
+
+    def _start(self) -> None:
+        import ray
+
+        if not ray.is_initialized():
+            ray.init(num_cpus=self.workers)
+        if self._remote is None:
+            self._remote = ray.remote(_call)
+
+    def map(self, fn: Callable, *iterables: Iterable) -> list:
+        import ray
+
+        self._start()
+        return ray.get([self._remote.remote(fn, *args) for args in zip(*iterables)])
+
+    def share(self, arrays: dict[str, np.ndarray]) -> SharedArrays:
+        self._start()
+        return super().share(arrays)
+
+
+EXECUTORS: dict[str, type[Executor]] = {
+    executor.name: executor
+    for executor in (SerialExecutor, ThreadExecutor, ProcessExecutor, RayExecutor)
+}
+
+
+def get_executor(
+    name: str = "auto", workers: int | None = None, cells: int | None = None
+) -> Executor:
+    """実行方式を取得
+
+    Args:
+        name (str, optional): 実行方式名 autoの場合はワーカー数と盤面のセル数から決定.
+            Defaults to "auto".
+        workers (int | None, optional): ワーカー数. Defaults to None.
+        cells (int | None, optional): 盤面のセル数 SERIAL_MAX_CELLS以下なら逐次実行.
+            Defaults to None.
+
+    Raises:
+        ValueError: 未知の実行方式
+
+    Returns:
+        Executor: 実行方式
+    """
+    if name == "auto":
+        workers = workers or default_workers()
+        if workers <= 1 or (cells is not None and cells <= SERIAL_MAX_CELLS):
+            return SerialExecutor()
+        return ProcessExecutor(workers)
+    if name not in EXECUTORS:
+        raise ValueError(f"{name} is not executor name")
+    return EXECUTORS[name](workers)
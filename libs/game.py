@@ -1,27 +1,69 @@
 import json
+import time
+from typing import Self
 
 import matplotlib.pyplot as plt
 import numpy as np
-import ray
 
-from .data import Cell, CuttingInfo, Direction, GameSpecification, StaticDieTypes
-from .patterns import Board, CuttingDie
+from .data import Cell, Direction, GameSpecification, StaticDieTypes
+from .die_catalog import DieCatalog
+from .executor import Executor, get_executor
+from .mismatch import MismatchIndex
+from .oplog import OpLog
+from .patterns import Board, CuttingDie, DieRegistry, PhantomBoard, RotatedBoard
+from .peephole import optimize_logs
+from .profiler import Profiler
+from .swap_cost import CORNERS, cheapest_corner, swap_costs
 
 
 class Game:
+    # mainで順に実行する処理
+    STAGES = ("initial_optimize_board", "rough_arrange", "arrange", "optimize_logs")
+    # arrangeで交換の組を割り当てる際に一度に比べるセル数
+    ASSIGNMENT_CHUNK = 256
+    # 辺のラインを一般抜き型で分割する操作の一致数の増分の下限
+    PARTITION_MIN_GAIN = 1
+    # 一致箇所の再計算が必要な範囲を個別に持つ数の上限
+    DIRTY_REGIONS = 64
+
     def __init__(
-        self, game_input: dict, debug: Cell = None, debug_seed: int = None
+        self,
+        game_input: dict,
+        debug: Cell = None,
+        debug_seed: int = None,
+        executor: Executor | str = "auto",
+        workers: int | None = None,
+        profile: bool = False,
+        fast_swap: bool = True,
+        check_swap: bool = False,
+        custom_dies: bool = True,
     ) -> None:
         """ゲームを管理するクラス
 
         Args:
             game_input (dict): APIから受け取るデータをdict形式として入力
+            executor (Executor | str, optional): 並列処理の実行方式. Defaults to "auto".
+            workers (int | None, optional): 並列処理のワーカー数. Defaults to None.
+            profile (bool, optional): 処理時間と操作回数を計測する. Defaults to False.
+            fast_swap (bool, optional): swapの操作を盤面に適用せず, 2点の値のみ入れ替える.
+                Defaults to True.
+            check_swap (bool, optional): fast_swapの結果を操作の適用結果と照合する.
+                Defaults to False.
+            custom_dies (bool, optional): 一般抜き型で辺のラインを分割してから揃える.
+                Defaults to True.
         """
-        self.logs: list[CuttingInfo] = []
+        self._executor = executor
+        self.workers = workers
+        self.profiler = Profiler(profile)
+        self.fast_swap = fast_swap
+        self.check_swap = check_swap
+        self.custom_dies = custom_dies
+        self.logs = OpLog()
         self.board = Board(
             width=game_input["board"]["width"],
             height=game_input["board"]["height"],
             pattern=game_input["board"]["start"],
+            lazy=True,
         )
         self.goal = Board(
             width=game_input["board"]["width"],
@@ -29,7 +71,7 @@ class Game:
             pattern=game_input["board"]["goal"],
         )
 
-        self.dies: list[CuttingDie] = []
+        self.dies = DieRegistry()
         self.generate_standard_dies()
         standard_dies_count = len(self.dies)
         for pattern in game_input["general"]["patterns"]:
@@ -43,6 +85,65 @@ class Game:
             )
         assert len(self.dies) - standard_dies_count == game_input["general"]["n"]
 
+        if debug:
+            np.random.seed(debug_seed)
+            pattern = np.random.randint(0, 4, (debug.y, debug.x)).astype(np.uint8)
+            self.board = Board(debug.x, debug.y, pattern.copy(), lazy=True)
+            np.random.shuffle(pattern)
+            self.goal = Board(debug.x, debug.y, pattern)
+
+        self._setup()
+
+    @classmethod
+    def from_boards(
+        cls,
+        board: Board,
+        goal: Board,
+        dies: list[CuttingDie],
+        executor: Executor | str = "auto",
+        workers: int | None = None,
+        profile: bool = False,
+        fast_swap: bool = True,
+        check_swap: bool = False,
+        custom_dies: bool = True,
+    ) -> Self:
+        """作成済みの盤面と抜き型からゲームを作成
+
+        ワーカーが共有された配列から問題を読み込み直さずに復元するために使う
+
+        Args:
+            board (Board): 現在盤面
+            goal (Board): 最終盤面
+            dies (list[CuttingDie]): idの順に並んだ全ての抜き型
+            executor (Executor | str, optional): 並列処理の実行方式. Defaults to "auto".
+            workers (int | None, optional): 並列処理のワーカー数. Defaults to None.
+            profile (bool, optional): 処理時間と操作回数を計測する. Defaults to False.
+            fast_swap (bool, optional): swapの操作を盤面に適用せず, 2点の値のみ入れ替える.
+                Defaults to True.
+            check_swap (bool, optional): fast_swapの結果を操作の適用結果と照合する.
+                Defaults to False.
+            custom_dies (bool, optional): 一般抜き型で辺のラインを分割してから揃える.
+                Defaults to True.
+
+        Returns:
+            Self: ゲーム
+        """
+        game = cls.__new__(cls)
+        game._executor = executor
+        game.workers = workers
+        game.profiler = Profiler(profile)
+        game.fast_swap = fast_swap
+        game.check_swap = check_swap
+        game.custom_dies = custom_dies
+        game.logs = OpLog()
+        game.board = board
+        game.goal = goal
+        game.dies = dies if isinstance(dies, DieRegistry) else DieRegistry(dies)
+        game._setup()
+        return game
+
+    def _setup(self) -> None:
+        """盤面と抜き型の読み込み後の初期化"""
         self.full_die = self.get_static_die(
             size=GameSpecification.MAX_SIZE, type=StaticDieTypes.FULL
         )
@@ -52,13 +153,40 @@ class Game:
         self.full_even_column = self.get_static_die(
             size=GameSpecification.MAX_SIZE, type=StaticDieTypes.EVEN_COLUMN
         )
+        self.catalog = DieCatalog(self.dies)
+        self.goal.registry = self.dies
+        self.set_board(self.board)
 
-        if debug:
-            np.random.seed(debug_seed)
-            pattern = np.random.randint(0, 4, (debug.y, debug.x))
-            self.board = Board(debug.x, debug.y, pattern.copy())
-            np.random.shuffle(pattern)
-            self.goal = Board(debug.x, debug.y, pattern)
+    def set_board(self, board: Board) -> None:
+        """現在盤面を置き換える
+
+        抜き型の適用範囲のキャッシュと計測を設定し, 一致箇所の追跡をやり直す
+
+        Args:
+            board (Board): 新しい現在盤面
+        """
+        self.board = board
+        board.registry = self.dies
+        if self.profiler.enabled:
+            board.profiler = self.profiler
+
+        # 一致箇所のbool mapと不一致数 apply_dieで変化した範囲のみ再計算する
+        self._matched: np.ndarray | None = None
+        self._mismatch_count = 0
+        self._tracked: tuple[Board, Board] | None = None
+        # 再計算が必要な行・列と, 行全体・列全体にわたらない範囲
+        self._dirty_rows: np.ndarray | None = None
+        self._dirty_columns: np.ndarray | None = None
+        self._dirty: list[tuple[slice, slice]] = []
+
+    @property
+    def executor(self) -> Executor:
+        """並列処理の実行方式 初回参照時に決定し, solve_portfolioで変種を並列に解くのに使う"""
+        if not isinstance(self._executor, Executor):
+            self._executor = get_executor(
+                self._executor, self.workers, self.board.width * self.board.height
+            )
+        return self._executor
 
     def generate_standard_dies(self) -> None:
         """定型抜き型を作成"""
@@ -75,7 +203,7 @@ class Game:
         Returns:
             dict: JSON形式データ
         """
-        return {"n": len(self.logs), "ops": [log.dict() for log in self.logs]}
+        return self.logs.format()
 
     def log_to_json(self) -> str:
         """回答フォーマットを作成
@@ -85,18 +213,91 @@ class Game:
         """
         return json.dumps(self.format_log())
 
+    def _update_matched(self) -> None:
+        """一致箇所のbool mapと不一致数を変化した範囲について更新"""
+        if self._tracked is None or (
+            self._tracked[0] is not self.board or self._tracked[1] is not self.goal
+        ):
+            self._matched = self.board.field == self.goal.field
+            self._mismatch_count = self._matched.size - np.count_nonzero(self._matched)
+            self._tracked = (self.board, self.goal)
+            self._dirty_rows = np.zeros(self._matched.shape[0], dtype=np.bool_)
+            self._dirty_columns = np.zeros(self._matched.shape[1], dtype=np.bool_)
+            self._dirty.clear()
+            return
+
+        if self._dirty_rows.any():
+            self._recompute_matched(np.flatnonzero(self._dirty_rows))
+            self._dirty_rows[:] = False
+        if self._dirty_columns.any():
+            self._recompute_matched((slice(None), np.flatnonzero(self._dirty_columns)))
+            self._dirty_columns[:] = False
+        for region in self._dirty:
+            self._recompute_matched(region)
+        self._dirty.clear()
+
+    def _recompute_matched(self, key: tuple | np.ndarray) -> None:
+        """一致箇所のbool mapと不一致数を指定範囲について再計算
+
+        Args:
+            key (tuple | np.ndarray): 盤面の範囲を表すindex
+        """
+        matched = self.board.field[key] == self.goal.field[key]
+        lost = np.count_nonzero(self._matched[key]) - np.count_nonzero(matched)
+        self._mismatch_count += lost
+        self._matched[key] = matched
+
+    def _mark_dirty(self, rows: slice, columns: slice) -> None:
+        """一致箇所の再計算が必要な範囲を追加
+
+        行全体・列全体にわたる範囲はその行・列として持ち,
+        それ以外の範囲がDIRTY_REGIONSを超えたら短い方の辺の行・列にまとめる
+
+        Args:
+            rows (slice): 行の範囲
+            columns (slice): 列の範囲
+        """
+        if self._dirty_rows is None:
+            # 初回の更新で全体を計算する
+            return
+        height, width = self._matched.shape
+        if len(range(width)[columns]) == width:
+            self._dirty_rows[rows] = True
+        elif len(range(height)[rows]) == height:
+            self._dirty_columns[columns] = True
+        else:
+            self._dirty.append((rows, columns))
+            if len(self._dirty) > self.DIRTY_REGIONS:
+                for region_rows, region_columns in self._dirty:
+                    if len(range(height)[region_rows]) <= len(
+                        range(width)[region_columns]
+                    ):
+                        self._dirty_rows[region_rows] = True
+                    else:
+                        self._dirty_columns[region_columns] = True
+                self._dirty.clear()
+
     def check_board(self) -> np.ndarray:
         """現在盤面と最終盤面を比較
 
         Returns:
-            np.ndarray: 一致箇所がTrueのbool map
+            np.ndarray: 一致箇所がTrueのbool map(読み取り専用)
         """
-        return self.board.field == self.goal.field
+        self._update_matched()
+        matched = self._matched.view()
+        matched.flags.writeable = False
+        return matched
+
+    @property
+    def mismatch_count(self) -> int:
+        """現在盤面と最終盤面の不一致数"""
+        self._update_matched()
+        return int(self._mismatch_count)
 
     @property
     def is_goal(self) -> bool:
         """完成しているか"""
-        return self.check_board().all()
+        return self.mismatch_count == 0
 
     def get_static_die(self, size: int, type: int) -> CuttingDie:
         """定型抜き型を取得
@@ -108,9 +309,7 @@ class Game:
         Returns:
             CuttingDie: 抜き型
         """
-        for die in self.dies:
-            if die.width == die.height == size and die.type == type:
-                return die
+        return self.dies.static(size, type)
 
     def apply_die(
         self, board: Board, die: CuttingDie, cell: Cell, direction: int
@@ -123,9 +322,20 @@ class Game:
             cell (Cell): 適用する座標
             direction (int): 適用する方向(Directionで定義)
         """
-        log = board._apply_die(die=die, cell=cell, direction=direction)
+        if self.profiler.enabled:
+            start = time.perf_counter()
+            log = board._apply_die(die=die, cell=cell, direction=direction)
+            seconds = time.perf_counter() - start
+            if isinstance(board, PhantomBoard):
+                self.profiler.record_phantom(seconds)
+            else:
+                self.profiler.record_die(die.id, direction, seconds)
+        else:
+            log = board._apply_die(die=die, cell=cell, direction=direction)
         if board is self.board:
             self.logs.append(log)
+        if board is self.board or board is self.goal:
+            self._mark_dirty(*board.affected_region(die, cell, direction))
         # print(board.field)
 
     def decompose_to_powers_of_two(self, x: int) -> list[int]:
@@ -286,8 +496,7 @@ class Game:
             else:
                 raise ValueError(f"{corner} is not corner cell")
 
-        corner = corner_target.copy()
-        corner_target = corner_target.copy()  # id被り対策
+        corner = corner_target
         if board.corners.is_w(corner):
             direction = Direction.RIGHT
         elif board.corners.is_e(corner):
@@ -308,10 +517,6 @@ class Game:
                     Cell(target.x + get_offset_x(True), target.y + get_offset_y()),
                     direction,
                 )
-                if direction == Direction.RIGHT:
-                    corner_target.x += size
-                else:
-                    corner_target.x -= size
 
             offset = -1 if direction == Direction.RIGHT else 1
             size = 1
@@ -329,10 +534,6 @@ class Game:
                     Cell(target.x + get_offset_x(), target.y + get_offset_y()),
                     direction,
                 )
-                if direction == Direction.RIGHT:
-                    corner_target.x += size
-                else:
-                    corner_target.x -= size
 
             size = 1
             self.apply_die(
@@ -383,8 +584,7 @@ class Game:
             else:
                 raise ValueError(f"{corner} is not corner cell")
 
-        corner = corner_target.copy()
-        corner_target = corner_target.copy()  # id被り対策
+        corner = corner_target
         if board.corners.is_n(corner):
             direction = Direction.DOWN
         elif board.corners.is_s(corner):
@@ -405,10 +605,6 @@ class Game:
                     Cell(target.x + get_offset_x(), target.y + get_offset_y(True)),
                     direction,
                 )
-                if direction == Direction.DOWN:
-                    corner_target.y += size
-                else:
-                    corner_target.y -= size
 
             offset = -1 if direction == Direction.DOWN else 1
             size = 1
@@ -426,10 +622,6 @@ class Game:
                     Cell(target.x + get_offset_x(), target.y + get_offset_y()),
                     direction,
                 )
-                if direction == Direction.DOWN:
-                    corner_target.y += size
-                else:
-                    corner_target.y -= size
 
             size = 1
             self.apply_die(
@@ -637,180 +829,244 @@ class Game:
             else:
                 self._move_to_edge_column(board, target.x, Direction.RIGHT)
 
-    def swap(self, board: Board, target_1: Cell, target_2: Cell) -> None:
-        """任意の2点を交換
+    def _swap_corner(
+        self, board: Board, corner: str, target_1: Cell, target_2: Cell
+    ) -> None:
+        """2点を囲むブロックを角に移動して交換し, 元の位置に戻す
 
         Args:
             board (Board): 対象のboard
+            corner (str): ブロックを移動する角(nw, ne, sw, se)
             target_1 (Cell): 交換対象
             target_2 (Cell): 交換対象
         """
+        north, west = corner[0] == "n", corner[1] == "w"
+        block_cell = Cell(
+            x=(min if west else max)(target_1.x, target_2.x),
+            y=(min if north else max)(target_1.y, target_2.y),
+        )
+        self._move_to_edge_row(
+            board, block_cell.y, Direction.UP if north else Direction.DOWN
+        )
+        self._move_to_edge_column(
+            board, block_cell.x, Direction.LEFT if west else Direction.RIGHT
+        )
 
-        def nw():
-            block_cell = Cell(
-                x=min(target_1.x, target_2.x), y=min(target_1.y, target_2.y)
-            )
-            self._move_to_edge_row(board, block_cell.y, Direction.UP)
-            self._move_to_edge_column(board, block_cell.x, Direction.LEFT)
-            self._swap_edges(
-                board,
-                board.corners.nw,
-                Cell(x=target_1.x - block_cell.x, y=target_1.y - block_cell.y),
-                Cell(x=target_2.x - block_cell.x, y=target_2.y - block_cell.y),
-            )
-            self._move_to_edge_column(
-                board, board.width - block_cell.x - 1, Direction.RIGHT
-            )
-            self._move_to_edge_row(
-                board, board.height - block_cell.y - 1, Direction.DOWN
-            )
-
-        def se():
-            block_cell = Cell(
-                x=max(target_1.x, target_2.x), y=max(target_1.y, target_2.y)
-            )
-            self._move_to_edge_row(board, block_cell.y, Direction.DOWN)
-            self._move_to_edge_column(board, block_cell.x, Direction.RIGHT)
-            self._swap_edges(
-                board,
-                board.corners.se,
-                Cell(
-                    x=board.width - (block_cell.x + 1) + target_1.x,
-                    y=target_1.y + board.height - (block_cell.y + 1),
+        def moved(target: Cell) -> Cell:
+            return Cell(
+                x=(
+                    target.x - block_cell.x
+                    if west
+                    else board.width - (block_cell.x + 1) + target.x
                 ),
-                Cell(
-                    x=board.width - (block_cell.x + 1) + target_2.x,
-                    y=target_2.y + board.height - (block_cell.y + 1),
+                y=(
+                    target.y - block_cell.y
+                    if north
+                    else target.y + board.height - (block_cell.y + 1)
                 ),
             )
-            self._move_to_edge_column(
-                board, board.width - block_cell.x - 1, Direction.LEFT
-            )
-            self._move_to_edge_row(
-                board, board.height - (block_cell.y + 1), Direction.UP
-            )
 
-        def ne():
-            block_cell = Cell(
-                x=max(target_1.x, target_2.x), y=min(target_1.y, target_2.y)
-            )
-            self._move_to_edge_row(board, block_cell.y, Direction.UP)
-            self._move_to_edge_column(board, block_cell.x, Direction.RIGHT)
-            self._swap_edges(
-                board,
-                board.corners.ne,
-                Cell(
-                    x=board.width - (block_cell.x + 1) + target_1.x,
-                    y=target_1.y - block_cell.y,
-                ),
-                Cell(
-                    x=board.width - (block_cell.x + 1) + target_2.x,
-                    y=target_2.y - block_cell.y,
-                ),
-            )
-            self._move_to_edge_column(
-                board, board.width - block_cell.x - 1, Direction.LEFT
-            )
-            self._move_to_edge_row(
-                board, board.height - block_cell.y - 1, Direction.DOWN
-            )
+        self._swap_edges(
+            board, getattr(board.corners, corner), moved(target_1), moved(target_2)
+        )
+        self._move_to_edge_column(
+            board,
+            board.width - block_cell.x - 1,
+            Direction.RIGHT if west else Direction.LEFT,
+        )
+        self._move_to_edge_row(
+            board,
+            board.height - block_cell.y - 1,
+            Direction.DOWN if north else Direction.UP,
+        )
 
-        def sw():
-            block_cell = Cell(
-                x=min(target_1.x, target_2.x), y=max(target_1.y, target_2.y)
-            )
-            self._move_to_edge_row(board, block_cell.y, Direction.DOWN)
-            self._move_to_edge_column(board, block_cell.x, Direction.LEFT)
-            self._swap_edges(
-                board,
-                board.corners.sw,
-                Cell(
-                    x=target_1.x - block_cell.x,
-                    y=target_1.y + board.height - (block_cell.y + 1),
-                ),
-                Cell(
-                    x=target_2.x - block_cell.x,
-                    y=target_2.y + board.height - (block_cell.y + 1),
-                ),
-            )
-            self._move_to_edge_column(
-                board, board.width - block_cell.x - 1, Direction.RIGHT
-            )
-            self._move_to_edge_row(
-                board, board.height - (block_cell.y + 1), Direction.UP
-            )
+    def _default_corner(
+        self, board: Board, target_1: Cell, target_2: Cell
+    ) -> tuple[str, Cell, Cell]:
+        """2点の位置関係から交換に使う角を決める
 
-        block_size = max(abs(target_1.x - target_2.x), abs(target_1.y - target_2.y))
-        block_size = int(np.power(2, np.ceil(np.log2(block_size))))
+        Args:
+            board (Board): 対象のboard
+            target_1 (Cell): 交換対象
+            target_2 (Cell): 交換対象
 
+        Returns:
+            tuple[str, Cell, Cell]: 角と並べ替えた交換対象
+        """
         if np.sign(target_1.x - target_2.x) != np.sign(target_1.y - target_2.y):
             if target_1.x < target_2.x and target_1.y > target_2.y:
                 target_1, target_2 = target_2, target_1
 
             if target_1.x == board.width - 1 and target_2.y == board.height - 1:
-                se()
+                corner = "se"
             elif (
                 not board.corners.is_corner(target_1) or target_2.y != board.height - 1
             ):
-                nw()
+                corner = "nw"
             else:
-                se()
+                corner = "se"
         else:
             if target_1.x > target_2.x and target_1.y > target_2.y:
                 target_1, target_2 = target_2, target_1
 
             if target_1.y == 0 and target_2.x == board.width - 1:
-                ne()
+                corner = "ne"
             elif target_1.x == 0 and target_2.y == board.height - 1:
-                sw()
+                corner = "sw"
             elif (
                 not board.corners.is_corner(target_1) or target_2.y != board.height - 1
             ):
-                ne()
+                corner = "ne"
             else:
-                sw()
+                corner = "sw"
+        return corner, target_1, target_2
+
+    def _fast_forward_swap(
+        self, board: Board, corner: str, target_1: Cell, target_2: Cell
+    ) -> None:
+        """交換の操作列を盤面に適用せずに求め, 2点の値のみ入れ替える
+
+        交換の操作列は座標と盤面の大きさのみで決まるため値を持たない盤面で生成する
 
-    def arrange_edge(self, board: Board, target: Board, edge: int) -> None:
+        Args:
+            board (Board): 対象のboard
+            corner (str): ブロックを移動する角(nw, ne, sw, se)
+            target_1 (Cell): 交換対象
+            target_2 (Cell): 交換対象
+
+        Raises:
+            RuntimeError: check_swapが有効で操作の適用結果と一致しない
+        """
+        phantom = PhantomBoard(board.width, board.height)
+        self._swap_corner(phantom, corner, target_1, target_2)
+        if self.check_swap:
+            expected = Board(board.width, board.height, board.field.copy())
+            for log in phantom.ops:
+                expected._apply_die(self.dies[log.p], Cell(log.x, log.y), log.s)
+
+        field = board.field
+        field[target_1.y, target_1.x], field[target_2.y, target_2.x] = (
+            field[target_2.y, target_2.x],
+            field[target_1.y, target_1.x],
+        )
+        if self.check_swap and not np.array_equal(field, expected.field):
+            raise RuntimeError(
+                f"fast swap of {target_1} and {target_2} with {corner} differs from replay"
+            )
+
+        if board is self.board:
+            self.logs.extend(phantom.ops)
+        if board is self.board or board is self.goal:
+            for target in (target_1, target_2):
+                self._mark_dirty(
+                    slice(target.y, target.y + 1), slice(target.x, target.x + 1)
+                )
+
+    def swap(self, board: Board, target_1: Cell, target_2: Cell) -> None:
+        """任意の2点を交換
+
+        fast_swapが有効な場合は操作ログのみ追加し, 盤面は2点の値を入れ替える
+
+        Args:
+            board (Board): 対象のboard
+            target_1 (Cell): 交換対象
+            target_2 (Cell): 交換対象
+        """
+        corner, target_1, target_2 = self._default_corner(board, target_1, target_2)
+        # 位置関係による既定の角より操作数の少ない角があれば使う
+        costs = swap_costs(
+            target_1.x, target_1.y, target_2.x, target_2.y, board.width, board.height
+        )
+        cheapest = int(np.argmin(costs))
+        if costs[cheapest] < costs[CORNERS.index(corner)]:
+            corner = CORNERS[cheapest]
+        swap = self._fast_forward_swap if self.fast_swap else self._swap_corner
+
+        if not self.profiler.enabled:
+            swap(board, corner, target_1, target_2)
+            return
+        ops = self.profiler.ops
+        swap(board, corner, target_1, target_2)
+        self.profiler.record_swap(corner, self.profiler.ops - ops)
+        if board is self.board:
+            self.profiler.record_mismatch(len(self.logs), self.mismatch_count)
+
+    def partition_edge(self, board: Board, target: RotatedBoard, edge: int) -> None:
+        """辺のラインのみに一般抜き型を重ねて分割し, 一致数が増える限り繰り返す
+
+        1回の操作で複数のセルを揃えられるため, 交換の前に行う
+
+        Args:
+            board (Board): 対象のboard
+            target (RotatedBoard): 目的の状態
+            edge (int): 揃える辺
+        """
+        if not len(self.catalog):
+            return
+        while True:
+            match edge:
+                case Direction.UP:
+                    line, goal_line = board.field[0], target.row(0)
+                case Direction.DOWN:
+                    line, goal_line = board.field[-1], target.row(-1)
+                case Direction.LEFT:
+                    line, goal_line = board.field[:, 0], target.column(0)
+                case _:
+                    line, goal_line = board.field[:, -1], target.column(-1)
+            best = self.catalog.best_partition(
+                edge, line, goal_line, board.width, board.height
+            )
+            if best is None or best[0] < self.PARTITION_MIN_GAIN:
+                return
+            _, log = best
+            self.apply_die(board, self.dies[log.p], Cell(log.x, log.y), log.s)
+
+    def arrange_edge(self, board: Board, target: RotatedBoard, edge: int) -> None:
         """辺を対象に揃える
 
         Args:
             board (Board): 対象のboard
-            target (Board): 目的の状態
+            target (RotatedBoard): 目的の状態
             edge (int): 揃える辺
         """
-        mask: np.ndarray = board.field == target.field
+        if self.custom_dies:
+            self.partition_edge(board, target, edge)
         match edge:
             case Direction.UP:
-                for x, goal in enumerate(target.field[0]):
-                    if ~mask[0, x]:
+                goal_line = target.row(0)
+                mask = board.field[0] == goal_line
+                for x, goal in enumerate(goal_line):
+                    if ~mask[x]:
                         swap_target_cells = np.argwhere(
-                            ~mask[0]
+                            ~mask
                             & (board.field[0] == goal)
-                            & (board.field[0, x] == target.field[0])
+                            & (board.field[0, x] == goal_line)
                         ).flatten()
                         if not swap_target_cells.size:
                             swap_target_cells = np.argwhere(
-                                ~mask[0]
+                                ~mask
                                 & (board.field[0] == goal)
-                                & (board.field[0, x] != target.field[0])
+                                & (board.field[0, x] != goal_line)
                             ).flatten()
                         for target_x in swap_target_cells:
                             self.swap(board, Cell(x, 0), Cell(int(target_x), 0))
-                            mask = board.field == target.field
+                            mask = board.field[0] == goal_line
                             break
             case Direction.DOWN:
-                for x, goal in enumerate(target.field[-1]):
-                    if ~mask[-1, x]:
+                goal_line = target.row(-1)
+                mask = board.field[-1] == goal_line
+                for x, goal in enumerate(goal_line):
+                    if ~mask[x]:
                         swap_target_cells = np.argwhere(
-                            ~mask[-1]
+                            ~mask
                             & (board.field[-1] == goal)
-                            & (board.field[-1, x] == target.field[-1])
+                            & (board.field[-1, x] == goal_line)
                         ).flatten()
                         if not swap_target_cells.size:
                             swap_target_cells = np.argwhere(
-                                ~mask[-1]
+                                ~mask
                                 & (board.field[-1] == goal)
-                                & (board.field[-1, x] != target.field[-1])
+                                & (board.field[-1, x] != goal_line)
                             ).flatten()
                         for target_x in swap_target_cells:
                             self.swap(
@@ -818,39 +1074,43 @@ class Game:
                                 Cell(x, board.height - 1),
                                 Cell(int(target_x), board.height - 1),
                             )
-                            mask = board.field == target.field
+                            mask = board.field[-1] == goal_line
                             break
             case Direction.LEFT:
-                for y, goal in enumerate(target.field[:, 0]):
-                    if ~mask[y, 0]:
+                goal_line = target.column(0)
+                mask = board.field[:, 0] == goal_line
+                for y, goal in enumerate(goal_line):
+                    if ~mask[y]:
                         swap_target_cells = np.argwhere(
-                            ~mask[:, 0]
+                            ~mask
                             & (board.field[:, 0] == goal)
-                            & (board.field[y, 0] == target.field[:, 0])
+                            & (board.field[y, 0] == goal_line)
                         ).flatten()
                         if not swap_target_cells.size:
                             swap_target_cells = np.argwhere(
-                                ~mask[:, 0]
+                                ~mask
                                 & (board.field[:, 0] == goal)
-                                & (board.field[y, 0] != target.field[:, 0])
+                                & (board.field[y, 0] != goal_line)
                             ).flatten()
                         for target_y in swap_target_cells:
                             self.swap(board, Cell(0, y), Cell(0, int(target_y)))
-                            mask = board.field == target.field
+                            mask = board.field[:, 0] == goal_line
                             break
             case Direction.RIGHT:
-                for y, goal in enumerate(target.field[:, -1]):
-                    if ~mask[y, -1]:
+                goal_line = target.column(-1)
+                mask = board.field[:, -1] == goal_line
+                for y, goal in enumerate(goal_line):
+                    if ~mask[y]:
                         swap_target_cells = np.argwhere(
-                            ~mask[:, -1]
+                            ~mask
                             & (board.field[:, -1] == goal)
-                            & (board.field[y, -1] == target.field[:, -1])
+                            & (board.field[y, -1] == goal_line)
                         ).flatten()
                         if not swap_target_cells.size:
                             swap_target_cells = np.argwhere(
-                                ~mask[:, -1]
+                                ~mask
                                 & (board.field[:, -1] == goal)
-                                & (board.field[y, -1] != target.field[:, -1])
+                                & (board.field[y, -1] != goal_line)
                             ).flatten()
                         for target_y in swap_target_cells:
                             self.swap(
@@ -858,7 +1118,7 @@ class Game:
                                 Cell(board.width - 1, y),
                                 Cell(board.width - 1, int(target_y)),
                             )
-                            mask = board.field == target.field
+                            mask = board.field[:, -1] == goal_line
                             break
 
     def is_arrangeable(self, vec: np.ndarray, target: np.ndarray) -> bool:
@@ -907,107 +1167,93 @@ class Game:
 
     def arrange_rows(self) -> None:
         """行単位で揃える"""
-        target = self.goal.copy()
+        target = RotatedBoard(self.goal)
         self.arrange_edge(self.board, target, edge=Direction.UP)
         self.arrange_edge(self.board, target, edge=Direction.DOWN)
         arrangeable_rows = np.argwhere(self.is_arrangeable_row()).flatten()
-        row_indexes = np.arange(target.height)
 
         for index in arrangeable_rows:
-            if index in row_indexes[[0, -1]]:
+            if index in (target.row_offset, (target.row_offset - 1) % target.height):
                 continue
-            move_to = index - row_indexes[0] + 1
+            move_to = index - target.row_offset + 1
             self._move_to_edge_row(self.board, move_to, Direction.UP)
-            self._move_to_edge_row(target, move_to, Direction.UP)
-            row_indexes = np.roll(row_indexes, -move_to)
+            target.move_to_edge_row(move_to)
             self.arrange_edge(self.board, target, edge=Direction.UP)
             self.arrange_edge(self.board, target, edge=Direction.DOWN)
 
-        move_to = np.argwhere(row_indexes == 0).flatten()[0]
+        move_to = -target.row_offset % target.height
         self._move_to_edge_row(self.board, move_to, Direction.UP)
-        self._move_to_edge_row(target, move_to, Direction.UP)
-        row_indexes = np.roll(row_indexes, -move_to)
+        target.move_to_edge_row(move_to)
 
-        assert (self.goal.field == target.field).all()
+        assert target.row_offset == 0
 
     def arrange_columns(self) -> None:
         """列単位で揃える"""
-        target = self.goal.copy()
+        target = RotatedBoard(self.goal)
 
         self.arrange_edge(self.board, target, edge=Direction.LEFT)
         self.arrange_edge(self.board, target, edge=Direction.RIGHT)
         arrangeable_columns = np.argwhere(self.is_arrangeable_column()).flatten()
-        column_indexes = np.arange(target.width)
 
         for index in arrangeable_columns:
-            if index in column_indexes[[0, -1]]:
+            if index in (
+                target.column_offset,
+                (target.column_offset - 1) % target.width,
+            ):
                 continue
-            move_to = index - column_indexes[0] + 1
+            move_to = index - target.column_offset + 1
             self._move_to_edge_column(self.board, move_to, Direction.LEFT)
-            self._move_to_edge_column(target, move_to, Direction.LEFT)
-            column_indexes = np.roll(column_indexes, -move_to)
+            target.move_to_edge_column(move_to)
             self.arrange_edge(self.board, target, edge=Direction.LEFT)
             self.arrange_edge(self.board, target, edge=Direction.RIGHT)
 
-        move_to = np.argwhere(column_indexes == 0).flatten()[0]
+        move_to = -target.column_offset % target.width
         self._move_to_edge_column(self.board, move_to, Direction.LEFT)
-        self._move_to_edge_column(target, move_to, Direction.LEFT)
-        column_indexes = np.roll(column_indexes, -move_to)
+        target.move_to_edge_column(move_to)
 
-        assert (self.goal.field == target.field).all()
+        assert target.column_offset == 0
 
-    def rough_arrange(self, limit: int = None) -> None:
+    def rough_arrange(self, limit: int = None, columns_first: bool = False) -> None:
         """行列単位で揃える
 
         Args:
             limit (int, optional): 試行回数の上限. Defaults to None.
+            columns_first (bool, optional): 列単位から揃える. Defaults to False.
         """
         while self.is_arrangeable_row().any() or self.is_arrangeable_column().any():
-            self.arrange_rows()
-            self.arrange_columns()
+            if columns_first:
+                self.arrange_columns()
+                self.arrange_rows()
+            else:
+                self.arrange_rows()
+                self.arrange_columns()
 
     def optimize_board_target(self) -> tuple[Cell, int]:
         """適合率の高い初期状態となる移動先を取得
 
+        北西の角への移動は盤面の巡回シフトになるため, 全てのシフト量に対する一致数を
+        値ごとの相互相関としてFFTでまとめて求める
+        全面の縞型抜き型の適用は行・列の固定の並べ替えのため, 最終盤面側を逆に並べ替えて評価する
+
         Returns:
             tuple[Cell, int]: 始点座標と抜き型Type
         """
-
-        @ray.remote
-        def _generate_row_scores(y: int) -> list[list[int]]:
-            row_matrixes = []
-            for i in range(self.board.width):
-                scores = []
-                temp_board = self.board.copy()
-                self._move_to_edge(temp_board, temp_board.corners.nw, Cell(i, y))
-                score = (temp_board.field == self.goal.field).sum()
-                scores.append(score)
-
-                row_temp = temp_board.copy()
-                self.apply_die(
-                    row_temp, self.full_even_row, row_temp.corners.nw, Direction.UP
-                )
-                score = (row_temp.field == self.goal.field).sum()
-                scores.append(score)
-
-                column_temp = temp_board.copy()
-                self.apply_die(
-                    column_temp,
-                    self.full_even_column,
-                    column_temp.corners.nw,
-                    Direction.LEFT,
-                )
-                score = (column_temp.field == self.goal.field).sum()
-                scores.append(score)
-
-                row_matrixes.append(scores)
-            return row_matrixes
-
-        matrixes = ray.get(
-            [_generate_row_scores.remote(i) for i in range(self.board.height)]
-        )
-
-        matrixes = np.array(matrixes)
+        height, width = self.board.height, self.board.width
+        goal = self.goal.field
+        # 北西の角から適用した全面の縞型抜き型は奇数番目, 偶数番目の順に並べ替える
+        goal_row = np.empty_like(goal)
+        goal_row[np.r_[1:height:2, 0:height:2]] = goal
+        goal_column = np.empty_like(goal)
+        goal_column[:, np.r_[1:width:2, 0:width:2]] = goal
+        goals = np.stack([goal, goal_row, goal_column])
+
+        spectra = np.zeros((len(goals), height, width // 2 + 1), dtype=np.complex128)
+        for value in range(GameSpecification.CELL_VALUES):
+            board_spectrum = np.fft.rfft2(self.board.field == value)
+            spectra += board_spectrum * np.fft.rfft2(goals == value).conj()
+        scores = np.rint(np.fft.irfft2(spectra, s=(height, width))).astype(np.int64)
+
+        matrixes = np.moveaxis(scores, 0, -1)
         idx = np.unravel_index(np.argmax(matrixes), matrixes.shape)
         y, x, type = tuple(map(int, idx))
         target = Cell(x=x, y=y)
@@ -1032,38 +1278,146 @@ class Game:
                 Direction.LEFT,
             )
 
-    def arrange(self) -> None:
-        """揃える"""
-        while not self.check_board().all():
-            mask = self.check_board()
-            target = np.argwhere(~mask)[0]
-            swap_targets = np.argwhere(
-                ~mask & (self.board.field[*target] == self.goal.field)
-            )
-            if not swap_targets.size:
-                swap_targets = np.argwhere(~mask)
-            for y, x in swap_targets:
-                self.swap(self.board, Cell(*target[::-1]), Cell(x, y))
+    def _assign(self, cells_1: np.ndarray, cells_2: np.ndarray) -> list[tuple[Cell, Cell]]:
+        """2つのセル群を交換の操作数が小さい組から貪欲に割り当てる
+
+        Args:
+            cells_1 (np.ndarray): 行優先index
+            cells_2 (np.ndarray): 行優先index
+
+        Returns:
+            list[tuple[Cell, Cell]]: 交換する組
+        """
+        y_1, x_1 = np.divmod(cells_1, self.board.width)
+        y_2, x_2 = np.divmod(cells_2, self.board.width)
+        _, costs = cheapest_corner(
+            x_1[:, np.newaxis],
+            y_1[:, np.newaxis],
+            x_2[np.newaxis],
+            y_2[np.newaxis],
+            self.board.width,
+            self.board.height,
+        )
+        used_1 = np.zeros(len(cells_1), dtype=np.bool_)
+        used_2 = np.zeros(len(cells_2), dtype=np.bool_)
+        pairs = []
+        order = np.argsort(costs, axis=None, kind="stable")
+        for i, j in zip(*np.unravel_index(order, costs.shape)):
+            if used_1[i] or used_2[j]:
+                continue
+            used_1[i] = used_2[j] = True
+            pairs.append((Cell(int(x_1[i]), int(y_1[i])), Cell(int(x_2[j]), int(y_2[j]))))
+            if len(pairs) == min(len(cells_1), len(cells_2)):
                 break
+        return pairs
+
+    def plan_swaps(self) -> list[tuple[Cell, Cell]]:
+        """互いの値を交換すれば両方揃う不一致セルの組を決める
+
+        (現在の値, 完成状態の値)が逆の組み合わせ同士を行優先で同じ数の区間に分け,
+        区間ごとに交換の操作数が小さい組から割り当てる
+
+        Returns:
+            list[tuple[Cell, Cell]]: 交換する組
+        """
+        field = self.board.field.ravel()
+        goal = self.goal.field.ravel()
+        values = GameSpecification.CELL_VALUES
+        pairs = []
+        for current in range(values):
+            for target in range(current + 1, values):
+                cells_1 = np.flatnonzero((field == current) & (goal == target))
+                cells_2 = np.flatnonzero((field == target) & (goal == current))
+                count = min(len(cells_1), len(cells_2))
+                if not count:
+                    continue
+                chunks = -(-count // self.ASSIGNMENT_CHUNK)
+                for chunk_1, chunk_2 in zip(
+                    np.array_split(cells_1, chunks), np.array_split(cells_2, chunks)
+                ):
+                    pairs.extend(self._assign(chunk_1, chunk_2))
+        return pairs
+
+    def _cheapest_partner(self, index: MismatchIndex, target: Cell) -> Cell:
+        """対象セルの値で揃うセルのうち交換の操作数が最小のものを取得
+
+        交換で対象セルも揃う相手を優先する
+
+        Args:
+            index (MismatchIndex): 不一致セルの索引
+            target (Cell): 対象セル
+
+        Returns:
+            Cell: 交換相手
+        """
+        value = int(self.board.field[target.y, target.x])
+        candidates = np.concatenate(
+            [
+                index.cells(current, value)
+                for current in range(GameSpecification.CELL_VALUES)
+                if current != value
+            ]
+        )
+        if not len(candidates):
+            return index.first()
+        y, x = np.divmod(candidates, self.board.width)
+        _, costs = cheapest_corner(
+            target.x, target.y, x, y, self.board.width, self.board.height
+        )
+        both = self.board.field.ravel()[candidates] == self.goal.field[target.y, target.x]
+        best = np.lexsort((costs, ~both))[0]
+        return Cell(int(x[best]), int(y[best]))
+
+    def arrange(self) -> None:
+        """揃える
 
-    def shred(self, offset=0) -> None:
+        両方が揃う交換をまとめて割り当ててから, 残りの不一致セルを行優先に操作数の少ない相手と交換する
+        """
+        for target_1, target_2 in self.plan_swaps():
+            self.swap(self.board, target_1, target_2)
+
+        index = MismatchIndex(self.board, self.goal)
+        while (target := index.first()) is not None:
+            partner = self._cheapest_partner(index, target)
+            self.swap(self.board, target, partner)
+            index.update(target, partner)
+
+    def shred(self, offset=0, goal: bool = True) -> None:
+        """縞型で盤面を細かく混ぜる
+
+        Args:
+            offset (int, optional): 繰り返し回数の増減. Defaults to 0.
+            goal (bool, optional): 最終盤面にも同じ操作を適用する
+                Falseの場合は現在盤面の初期配置を変えるだけになる. Defaults to True.
+        """
         for _ in range(int(np.log2(self.board.width)) + offset):
             self.apply_die(self.board, self.full_even_row, Cell(0, 0), Direction.UP)
             self.apply_die(
                 self.board, self.full_even_column, Cell(0, 0), Direction.RIGHT
             )
+            if not goal:
+                continue
             self.apply_die(self.goal, self.full_even_row, Cell(0, 0), Direction.UP)
             self.apply_die(
                 self.goal, self.full_even_column, Cell(0, 0), Direction.RIGHT
             )
 
+    def optimize_logs(self) -> None:
+        """操作ログから打ち消し合う操作と合成できる操作をまとめて操作数を減らす"""
+        self.logs = OpLog(
+            optimize_logs(self.logs, self.dies, self.board.width, self.board.height)
+        )
+
     def plot(self, board: Board):
         plt.clf()
         plt.imshow(board.field)
         plt.show()
 
     def main(self) -> None:
-        """呼び出し用"""
-        self.initial_optimize_board()
-        self.rough_arrange()
-        self.arrange()
+        """呼び出し用 STAGESの処理を順に実行"""
+        for stage in self.STAGES:
+            with self.profiler.stage(stage):
+                getattr(self, stage)()
+            if self.profiler.enabled:
+                self.profiler.record_mismatch(len(self.logs), self.mismatch_count)
+
@@ -0,0 +1,181 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Self
+from urllib.parse import parse_qs, urlparse
+
+
+class LocalServer:
+    def __init__(
+        self,
+        problem: dict,
+        token: str = "token",
+        starts_at: float | None = None,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int | None = None,
+    ) -> None:
+        """競技サーバーの代わりにローカルで/problemと/answerを提供する
+
+        競技開始前は403を返し, 指定した遅延と確率での500エラーを挟む
+
+        Args:
+            problem (dict): 配信する問題
+            token (str, optional): 受け付けるトークン. Defaults to "token".
+            starts_at (float | None, optional): 競技開始のUNIX時刻 未指定の場合は即時開始.
+                Defaults to None.
+            latency (float, optional): 各リクエストへの応答の遅延(秒). Defaults to 0.0.
+            failure_rate (float, optional): 500エラーを返す確率. Defaults to 0.0.
+            host (str, optional): 待ち受けるホスト. Defaults to "127.0.0.1".
+            port (int, optional): 待ち受けるポート 0の場合は空いているポート. Defaults to 0.
+            seed (int | None, optional): エラー発生のシード値. Defaults to None.
+        """
+        self.problem = problem
+        self.token = token
+        self.starts_at = starts_at if starts_at is not None else time.time()
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.answers: list[dict] = []
+        self.requests: list[tuple[float, str, int]] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _respond(self, status: int, body: Any) -> None:
+                data = (body if isinstance(body, str) else json.dumps(body)).encode()
+                with server._lock:
+                    server.requests.append((time.time(), self.path, status))
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # タイムアウトなどでクライアントが切断済み
+                    pass
+
+            def _check(self) -> bool:
+                """遅延・認証・エラー発生・競技開始を確認して応答済みならFalse"""
+                time.sleep(server.latency)
+                query = parse_qs(urlparse(self.path).query)
+                token = query.get("token", [self.headers.get("Procon-Token")])[0]
+                if token != server.token:
+                    self._respond(401, "InvalidToken")
+                    return False
+                with server._lock:
+                    failed = server._random.random() < server.failure_rate
+                if failed:
+                    self._respond(500, "InjectedFailure")
+                    return False
+                if time.time() < server.starts_at:
+                    self._respond(403, "AccessTimeError")
+                    return False
+                return True
+
+            def do_GET(self) -> None:
+                if urlparse(self.path).path != "/problem":
+                    self._respond(404, "NotFound")
+                elif self._check():
+                    self._respond(200, server.problem)
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if urlparse(self.path).path != "/answer":
+                    self._respond(404, "NotFound")
+                    return
+                if not self._check():
+                    return
+                try:
+                    answer = json.loads(body)
+                    assert answer["n"] == len(answer["ops"])
+                except (ValueError, KeyError, TypeError, AssertionError):
+                    self._respond(400, "InvalidAnswer")
+                    return
+                with server._lock:
+                    server.answers.append(answer)
+                    revision = len(server.answers)
+                self._respond(200, {"revision": revision})
+
+        return Handler
+
+    def start(self) -> Self:
+        """バックグラウンドで待ち受けを開始
+
+        Returns:
+            Self: サーバー
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """待ち受けを終了"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカルの競技サーバー")
+    parser.add_argument("problem", type=str, help="配信する問題フォーマットのjson")
+    parser.add_argument("--port", type=int, default=8080, help="待ち受けるポート")
+    parser.add_argument("--token", type=str, default="token", help="トークン")
+    parser.add_argument("--delay", type=float, default=0.0, help="競技開始までの秒数")
+    parser.add_argument("--latency", type=float, default=0.0, help="応答の遅延(秒)")
+    parser.add_argument(
+        "--failure-rate", type=float, default=0.0, help="500エラーを返す確率"
+    )
+    args = parser.parse_args()
+
+    with Path(args.problem).open() as f:
+        problem = json.load(f)
+    starts_at = time.time() + args.delay
+    problem["startsAt"] = int(starts_at)
+    server = LocalServer(
+        problem,
+        token=args.token,
+        starts_at=starts_at,
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        port=args.port,
+    )
+    print(f"serving on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
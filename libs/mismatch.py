@@ -0,0 +1,117 @@
+import heapq
+
+import numpy as np
+
+from .data import Cell, GameSpecification
+from .patterns import Board
+
+
+class MismatchIndex:
+    def __init__(self, board: Board, goal: Board) -> None:
+        """不一致セルを(現在の値, 完成状態の値)ごとに管理する索引
+
+        各組み合わせについて不一致セルの行優先indexをヒープで持ち,
+        交換後は交換した2点のみを追加する
+        古くなった要素は先頭を参照したときに取り除く
+
+        Args:
+            board (Board): 現在盤面
+            goal (Board): 最終盤面
+        """
+        self.board = board
+        self.width = board.width
+        self.goal = goal.field.ravel().copy()
+        values = GameSpecification.CELL_VALUES
+        self._buckets: list[list[int]] = [[] for _ in range(values * values)]
+
+        field = board.field.ravel()
+        indexes = np.flatnonzero(field != self.goal)
+        keys = field[indexes].astype(np.intp) * values + self.goal[indexes]
+        for key in np.unique(keys):
+            # 行優先で昇順のためそのままヒープとして使える
+            self._buckets[key] = indexes[keys == key].tolist()
+
+    def _head(self, current: int, goal: int) -> int | None:
+        """組み合わせ内で行優先で最初の不一致セル
+
+        Args:
+            current (int): 現在の値
+            goal (int): 完成状態の値
+
+        Returns:
+            int | None: 行優先index 存在しなければNone
+        """
+        heap = self._buckets[current * GameSpecification.CELL_VALUES + goal]
+        field = self.board.field
+        while heap:
+            index = heap[0]
+            if field[divmod(index, self.width)] == current:
+                return index
+            heapq.heappop(heap)
+        return None
+
+    def cells(self, current: int, goal: int) -> np.ndarray:
+        """組み合わせ内の全ての不一致セル
+
+        古くなった要素を取り除いてヒープを詰め直す
+
+        Args:
+            current (int): 現在の値
+            goal (int): 完成状態の値
+
+        Returns:
+            np.ndarray: 行優先indexの昇順
+        """
+        key = current * GameSpecification.CELL_VALUES + goal
+        indexes = np.unique(np.array(self._buckets[key], dtype=np.intp))
+        indexes = indexes[self.board.field.ravel()[indexes] == current]
+        # 昇順のためそのままヒープとして使える
+        self._buckets[key] = indexes.tolist()
+        return indexes
+
+    def _first(self, currents: range, goals: range) -> Cell | None:
+        """指定した組み合わせの中で行優先で最初の不一致セル
+
+        Args:
+            currents (range): 現在の値の候補
+            goals (range): 完成状態の値の候補
+
+        Returns:
+            Cell | None: 座標 存在しなければNone
+        """
+        heads = [
+            head
+            for current in currents
+            for goal in goals
+            if current != goal and (head := self._head(current, goal)) is not None
+        ]
+        if not heads:
+            return None
+        y, x = divmod(min(heads), self.width)
+        return Cell(x, y)
+
+    def first(self) -> Cell | None:
+        """行優先で最初の不一致セル
+
+        Returns:
+            Cell | None: 座標 全て一致していればNone
+        """
+        values = range(GameSpecification.CELL_VALUES)
+        return self._first(values, values)
+
+    def update(self, *cells: Cell) -> None:
+        """値が変化したセルを索引に反映
+
+        Args:
+            *cells (Cell): 値が変化したセル
+        """
+        field = self.board.field
+        for cell in cells:
+            index = cell.y * self.width + cell.x
+            current = int(field[cell.y, cell.x])
+            goal = int(self.goal[index])
+            if current != goal:
+                heapq.heappush(
+                    self._buckets[current * GameSpecification.CELL_VALUES + goal],
+                    index,
+                )
@@ -1,29 +1,95 @@
+import json
 import os
 import time
 
 import requests
 from dotenv import load_dotenv
+from urllib3.exceptions import HTTPError as URLLibError
+
+from .oplog import OpLog
 
 
 class API:
-    def __init__(self, env_file: str = ".env") -> None:
+    def __init__(
+        self,
+        env_file: str = ".env",
+        url: str | None = None,
+        token: str | None = None,
+        max_interval: float = 5.0,
+        poll_interval: float = 0.05,
+        wait_interval: float = 0.5,
+        timeout: float = 10.0,
+    ) -> None:
+        """競技サーバーのクライアント
+
+        接続はセッションで保持し, 問題の取得と回答の提出で使い回す
+
+        Args:
+            env_file (str, optional): 環境変数ファイル. Defaults to ".env".
+            url (str | None, optional): APIのURL 未指定の場合は環境変数URL. Defaults to None.
+            token (str | None, optional): トークン 未指定の場合は環境変数TOKEN. Defaults to None.
+            max_interval (float, optional): 再試行間隔の上限. Defaults to 5.0.
+            poll_interval (float, optional): 競技開始直前の問題取得の間隔. Defaults to 0.05.
+            wait_interval (float, optional): 競技開始時刻が不明な場合の競技開始前の
+                問題取得の間隔の上限. Defaults to 0.5.
+            timeout (float, optional): 1回のリクエストの接続・受信のタイムアウト(秒).
+                Defaults to 10.0.
+        """
         load_dotenv(env_file)
-        token = os.environ["TOKEN"]
-        self.api_url = os.environ["URL"]
-        if self.api_url.endswith("/"):
-            self.api_url = self.api_url[:-1]
+        token = token or os.environ["TOKEN"]
+        self.api_url = (url or os.environ["URL"]).rstrip("/")
         self.params = {"token": token}
-        self.debugger_api_url = os.environ["DEBUGGER_API_URL"]
-        if self.debugger_api_url.endswith("/"):
-            self.debugger_api_url = self.debugger_api_url[:-1]
+        self.debugger_api_url = os.environ.get("DEBUGGER_API_URL", "").rstrip("/")
+        self.max_interval = max_interval
+        self.poll_interval = poll_interval
+        self.wait_interval = wait_interval
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.params = self.params
+
+    def _backoff(self, interval: float, attempt: int) -> float:
+        """再試行の待機時間 失敗するごとに倍にして上限で打ち切る
+
+        Args:
+            interval (float): 初回の待機時間
+            attempt (int): 失敗回数
+
+        Returns:
+            float: 待機時間
+        """
+        return min(interval * 2**attempt, self.max_interval)
+
+    def _wait_interval(self, interval: float, starts_at: float | None) -> float:
+        """競技開始前の待機時間 開始時刻が分かれば直前まで待ってから細かく確認する
 
-    def get_problem(self, retry: int = 10, interval: float = 0.5) -> dict:
+        開始時刻が分からなければwait_intervalを上限として確認を続ける
+
+        Args:
+            interval (float): 通常の待機時間
+            starts_at (float | None): 競技開始のUNIX時刻
+
+        Returns:
+            float: 待機時間
+        """
+        if starts_at is None:
+            return min(interval, self.wait_interval)
+        remaining = starts_at - time.time()
+        if remaining > interval:
+            return remaining - self.poll_interval
+        return self.poll_interval
+
+    def get_problem(
+        self, retry: int = 10, interval: float = 0.5, starts_at: float | None = None
+    ) -> dict:
         """問題取得
 
+        競技開始前(403)は再試行回数に数えずに待機し, それ以外の失敗は再試行回数まで待機時間を伸ばして再試行する
+
         Args:
-            data (dict): 回答データ
             retry (int): 再試行回数
             interval (float): 再試行時インターバル
+            starts_at (float | None, optional): 競技開始のUNIX時刻 分かっていれば直前まで待機する.
+                Defaults to None.
 
         Raises:
             HTTPError: Get失敗
@@ -31,31 +97,40 @@ class API:
         Returns:
             dict: json形式問題
         """
-        for i in range(retry):
-            response = requests.get(f"{self.api_url}/problem", params=self.params)
-            if response.status_code == 200:
-                break
-            elif response.status_code == 403:
+        failures = 0
+        while True:
+            try:
+                with self.session.get(
+                    f"{self.api_url}/problem", stream=True, timeout=self.timeout
+                ) as response:
+                    if response.status_code == 200:
+                        # 受信しながらそのままパースする
+                        response.raw.decode_content = True
+                        return json.load(response.raw)
+                    status, text = response.status_code, response.text
+            except (requests.RequestException, URLLibError) as e:
+                status, text = None, str(e)
+
+            if status == 403:
                 print("waiting server...")
-                time.sleep(interval)
-                return self.get_problem()
-            else:
-                print(
-                    f"get problem failed with status code {response.status_code}: {response.text}"
+                time.sleep(self._wait_interval(interval, starts_at))
+                continue
+            failures += 1
+            print(f"get problem failed with status code {status}: {text}")
+            if failures >= retry:
+                raise requests.HTTPError(
+                    f"get problem failed with status code {status}: {text}"
                 )
-                print(f"retry {i+1}/{retry}")
-                time.sleep(interval)
-        if response.status_code != 200:
-            raise requests.HTTPError(
-                f"get problem failed with status code {response.status_code}: {response.text}"
-            )
-        return response.json()
+            print(f"retry {failures}/{retry}")
+            time.sleep(self._backoff(interval, failures - 1))
 
-    def post_answer(self, data: dict, retry: int = 10, interval: float = 0.5) -> dict:
+    def post_answer(
+        self, data: dict | OpLog, retry: int = 10, interval: float = 0.5
+    ) -> dict:
         """回答提出
 
         Args:
-            data (dict): 回答データ
+            data (dict | OpLog): 回答データまたは操作ログ
             retry (int): 再試行回数
             interval (float): 再試行時インターバル
 
@@ -65,23 +140,31 @@ class API:
         Returns:
             dict: レスポンスメッセージ
         """
+        if isinstance(data, OpLog):
+            # 操作ログから直接JSONを書き出してボディにする
+            body = {
+                "data": data.json_bytes(),
+                "headers": {"Content-Type": "application/json"},
+            }
+        else:
+            body = {"json": data}
         for i in range(retry):
-            response = requests.post(
-                f"{self.api_url}/answer", params=self.params, json=data
-            )
-            if response.status_code == 200:
-                break
-            else:
-                print(
-                    f"post answer failed with status code {response.status_code}: {response.text}"
+            try:
+                response = self.session.post(
+                    f"{self.api_url}/answer", timeout=self.timeout, **body
                 )
-                print(f"retry {i+1}/{retry}")
-                time.sleep(interval)
-        if response.status_code != 200:
-            raise requests.HTTPError(
-                f"post answer failed with status code {response.status_code}: {response.text}"
-            )
-        return response.json()
+                if response.status_code == 200:
+                    return response.json()
+                status, text = response.status_code, response.text
+            except requests.RequestException as e:
+                status, text = None, str(e)
+            print(f"post answer failed with status code {status}: {text}")
+            print(f"retry {i+1}/{retry}")
+            if i + 1 < retry:
+                time.sleep(self._backoff(interval, i))
+        raise requests.HTTPError(
+            f"post answer failed with status code {status}: {text}"
+        )
 
     def post_debug_info(self, dump: dict, log: dict):
         """デバッガーのサーバーにデータ送信
@@ -97,6 +180,8 @@ class API:
             "dump.json": dump,
             "log.json": log,
         }
-        response = requests.post(f"{self.debugger_api_url}/reapply", json=data)
+        response = requests.post(
+            f"{self.debugger_api_url}/reapply", json=data, timeout=self.timeout
+        )
 
         return response.json()
@@ -0,0 +1,231 @@
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import Self
+
+import numpy as np
+
+from .data import CuttingInfo
+
+# 操作配列の列の並び
+OP_FIELDS = ("p", "x", "y", "s")
+
+
+class OpLog:
+    # 最初に確保する操作数
+    INITIAL_CAPACITY = 1024
+    # JSONを書き出すときに1度に文字列にする操作数
+    CHUNK_SIZE = 4096
+    # バイナリ形式の先頭の識別子
+    MAGIC = b"OPLG"
+    # バイナリ形式の値の型 座標は盤面の外の-255〜255に収まる
+    BINARY_DTYPE = np.dtype("<i2")
+    # 1操作分のJSON
+    OP_FORMAT = '{"p":%d,"x":%d,"y":%d,"s":%d}'
+
+    def __init__(self, logs: Iterable[CuttingInfo | Sequence[int]] = ()) -> None:
+        """(p, x, y, s)の列を持つ操作ログ
+
+        操作はint32の(容量, 4)配列に詰めて持ち, 足りなくなると容量を倍にする
+        1操作ずつの追加はタプルで溜めておき, 配列を参照するときにまとめて書き込む
+        list[CuttingInfo]と同じように追加・参照でき, 参照時にCuttingInfoを作る
+
+        Args:
+            logs (Iterable[CuttingInfo | Sequence[int]], optional): 最初の操作.
+                Defaults to ().
+        """
+        self._ops = np.empty((self.INITIAL_CAPACITY, len(OP_FIELDS)), dtype=np.int32)
+        self._size = 0
+        self._pending: list[tuple[int, int, int, int]] = []
+        self.extend(logs)
+
+    @classmethod
+    def from_array(cls, ops: np.ndarray) -> Self:
+        """(n, 4)の配列から作成
+
+        Args:
+            ops (np.ndarray): 各行が(p, x, y, s)の配列
+
+        Returns:
+            Self: 操作ログ
+        """
+        log = cls()
+        log.extend(ops)
+        return log
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self._write(np.array(pending, dtype=np.int32))
+
+    def _write(self, ops: np.ndarray) -> None:
+        self._reserve(len(ops))
+        self._ops[self._size : self._size + len(ops)] = ops
+        self._size += len(ops)
+
+    def _reserve(self, count: int) -> None:
+        required = self._size + count
+        if required <= len(self._ops):
+            return
+        capacity = max(required, 2 * len(self._ops))
+        ops = np.empty((capacity, len(OP_FIELDS)), dtype=np.int32)
+        ops[: self._size] = self._ops[: self._size]
+        self._ops = ops
+
+    def append(self, log: CuttingInfo) -> None:
+        """操作を追加
+
+        Args:
+            log (CuttingInfo): 操作
+        """
+        self._pending.append((log.p, log.x, log.y, log.s))
+
+    def extend(self, logs: Iterable[CuttingInfo | Sequence[int]] | np.ndarray) -> None:
+        """操作をまとめて追加
+
+        Args:
+            logs (Iterable[CuttingInfo | Sequence[int]] | np.ndarray): 操作ログ,
+                (p, x, y, s)の並びまたは(n, 4)の配列
+        """
+        if isinstance(logs, OpLog):
+            ops = logs.array()
+        elif isinstance(logs, np.ndarray):
+            ops = logs.reshape(-1, len(OP_FIELDS))
+        else:
+            rows = [
+                (
+                    (log.p, log.x, log.y, log.s)
+                    if isinstance(log, CuttingInfo)
+                    else tuple(log)
+                )
+                for log in logs
+            ]
+            self._pending.extend(rows)
+            return
+        self._flush()
+        self._write(ops)
+
+    def array(self) -> np.ndarray:
+        """(n, 4)の配列
+
+        Returns:
+            np.ndarray: 各行が(p, x, y, s)の配列 操作ログと領域を共有する
+        """
+        self._flush()
+        return self._ops[: self._size]
+
+    def copy(self) -> Self:
+        return self.from_array(self.array())
+
+    def clear(self) -> None:
+        self._size = 0
+        self._pending = []
+
+    def __len__(self) -> int:
+        return self._size + len(self._pending)
+
+    def __iter__(self) -> Iterator[CuttingInfo]:
+        for op in self.array().tolist():
+            yield CuttingInfo(*op)
+
+    def __getitem__(self, index: int | slice) -> CuttingInfo | Self:
+        if isinstance(index, slice):
+            return self.from_array(self.array()[index])
+        return CuttingInfo(*self.array()[index].tolist())
+
+    def __getstate__(self) -> dict:
+        # 未使用の容量は転送しない
+        return {"ops": self.array().copy()}
+
+    def __setstate__(self, state: dict) -> None:
+        self._ops, self._size = state["ops"], len(state["ops"])
+        self._pending = []
+
+    def format(self) -> dict:
+        """回答フォーマットを作成
+
+        Returns:
+            dict: JSON形式データ
+        """
+        return {
+            "n": len(self),
+            "ops": [dict(zip(OP_FIELDS, op)) for op in self.array().tolist()],
+        }
+
+    def iter_json(self) -> Iterator[str]:
+        """回答フォーマットのJSONを操作CHUNK_SIZE個ずつ文字列にする
+
+        Yields:
+            str: JSONの断片 連結すると回答フォーマットになる
+        """
+        yield f'{{"n":{len(self)},"ops":['
+        ops = self.array()
+        for start in range(0, len(ops), self.CHUNK_SIZE):
+            chunk = ops[start : start + self.CHUNK_SIZE].tolist()
+            separator = "," if start else ""
+            yield separator + ",".join(self.OP_FORMAT % tuple(op) for op in chunk)
+        yield "]}"
+
+    def json_bytes(self) -> bytes:
+        """回答フォーマットのJSON
+
+        Returns:
+            bytes: 提出するリクエストボディ
+        """
+        return "".join(self.iter_json()).encode()
+
+    def to_bytes(self) -> bytes:
+        """バイナリ形式に変換
+
+        MAGIC, 操作数(uint32), 各操作の(p, x, y, s)(int16)の順に並べる
+
+        Returns:
+            bytes: バイナリ形式
+        """
+        return (
+            self.MAGIC
+            + np.uint32(len(self)).astype("<u4").tobytes()
+            + self.array().astype(self.BINARY_DTYPE).tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Self:
+        """バイナリ形式から作成
+
+        Args:
+            data (bytes): バイナリ形式
+
+        Raises:
+            ValueError: バイナリ形式でない
+
+        Returns:
+            Self: 操作ログ
+        """
+        header = len(cls.MAGIC) + 4
+        if data[: len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError("not an operation log")
+        n = int(np.frombuffer(data, dtype="<u4", count=1, offset=len(cls.MAGIC))[0])
+        ops = np.frombuffer(
+            data, dtype=cls.BINARY_DTYPE, count=n * len(OP_FIELDS), offset=header
+        )
+        return cls.from_array(ops)
+
+    def save(self, path: str | Path) -> None:
+        """バイナリ形式で保存
+
+        Args:
+            path (str | Path): 保存先
+        """
+        Path(path).write_bytes(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str | Path) -> Self:
+        """バイナリ形式のファイルから読み込む
+
+        Args:
+            path (str | Path): 読み込むファイル
+
+        Returns:
+            Self: 操作ログ
+        """
+        return cls.from_bytes(Path(path).read_bytes())
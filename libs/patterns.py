@@ -1,8 +1,20 @@
-from typing import Self
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+from typing import Self, overload
 
 import numpy as np
 
-from .data import Cell, CornerCells, CuttingInfo, Direction, StaticDieTypes
+from .data import (
+    Cell,
+    CornerCells,
+    CuttingInfo,
+    Direction,
+    GameSpecification,
+    StaticDieTypes,
+)
+from .profiler import Profiler
 
 
 class Pattern:
@@ -30,14 +42,45 @@ class Pattern:
     def load_pattern(self, pattern: list[str]) -> np.ndarray:
         """パターンを読み込み
 
+        セルの値は0〜3のためuint8で持つ
+
         Args:
             pattern (list[str]): 問題フォーマット形式のパターン
 
         Returns:
             np.ndarray: 読み込んだパターン
         """
-        pattern = np.array([list(map(int, row)) for row in pattern])
-        return pattern
+        cells = np.frombuffer("".join(pattern).encode(), dtype=np.uint8) - ord("0")
+        return cells.reshape(len(pattern), -1)
+
+
+def pack_cells(field: np.ndarray) -> np.ndarray:
+    """0〜3の値を1byteに4セルずつ詰める
+
+    Args:
+        field (np.ndarray): 盤面
+
+    Returns:
+        np.ndarray: 行優先に4セルずつ下位bitから詰めた配列
+    """
+    cells = np.zeros(-(-field.size // 4) * 4, dtype=np.uint8)
+    cells[: field.size] = field.ravel()
+    quads = cells.reshape(-1, 4)
+    return quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6
+
+
+def unpack_cells(packed: np.ndarray, shape: tuple[int, int]) -> np.ndarray:
+    """pack_cellsで詰めた配列を盤面に戻す
+
+    Args:
+        packed (np.ndarray): 詰めた配列
+        shape (tuple[int, int]): 盤面の(縦幅, 横幅)
+
+    Returns:
+        np.ndarray: uint8の盤面
+    """
+    cells = packed[:, np.newaxis] >> np.array([0, 2, 4, 6], dtype=np.uint8) & 3
+    return cells.ravel()[: shape[0] * shape[1]].reshape(shape)
 
 
 class CuttingDie(Pattern):
@@ -59,7 +102,8 @@ class CuttingDie(Pattern):
             type (StaticDieTypes, optional): 定型抜き型のタイプ. Defaults to None.
         """
         super().__init__(width, height, pattern)
-        self.field = np.bool_(self.field)
+        # boolの配列はコピーせずにそのまま使う
+        self.field = np.asarray(self.field, dtype=np.bool_)
         self.id = id
         self.type = type
 
@@ -90,10 +134,181 @@ class CuttingDie(Pattern):
                 raise ValueError(f"{type} is not StaticDieType")
         return cls(id=id, width=size, height=size, type=type, pattern=pattern)
 
+    @staticmethod
+    def pack(dies: list[Self]) -> tuple[np.ndarray, np.ndarray]:
+        """抜き型の一覧を1つの配列にまとめる
+
+        Args:
+            dies (list[Self]): 抜き型の一覧
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: 全パターンを連結した配列と
+                各抜き型の(id, 横幅, 縦幅, Type, 開始位置)の配列
+        """
+        fields = np.concatenate([die.field.ravel() for die in dies])
+        sizes = [die.field.size for die in dies]
+        meta = np.array(
+            [
+                (die.id, die.width, die.height, die.type or 0, offset)
+                for die, offset in zip(dies, np.cumsum([0, *sizes[:-1]]))
+            ],
+            dtype=np.int64,
+        )
+        return fields, meta
+
+    @classmethod
+    def unpack(cls, fields: np.ndarray, meta: np.ndarray) -> list[Self]:
+        """packでまとめた配列から抜き型の一覧を復元 パターンは配列のビューとなる
+
+        Args:
+            fields (np.ndarray): 全パターンを連結した配列
+            meta (np.ndarray): 各抜き型の(id, 横幅, 縦幅, Type, 開始位置)の配列
+
+        Returns:
+            list[Self]: 抜き型の一覧
+        """
+        return [
+            cls(
+                id=id,
+                width=width,
+                height=height,
+                pattern=fields[offset : offset + width * height].reshape(height, width),
+                type=StaticDieTypes(type) if type else None,
+            )
+            for id, width, height, type, offset in meta.tolist()
+        ]
+
+
+@dataclass(frozen=True)
+class ClippedDie:
+    """抜き型の盤面上の適用範囲と盤面の値によらない並べ替え"""
+
+    mask_start: Cell
+    mask_end: Cell
+    # 値が変わりうる行と列の範囲
+    region: tuple[slice, slice]
+    # 定型抜き型の(最初に抜かれる位置, 終了位置, 間隔, 対象ライン) 抜かれる要素がなければNone
+    geometry: tuple[int, int, int, slice] | None = None
+    # 一般抜き型の適用範囲から移動方向の端までの各ラインの並べ替えindex(int16)
+    order: np.ndarray | None = None
+
+    @property
+    def nbytes(self) -> int:
+        """並べ替えindexのバイト数"""
+        return 0 if self.order is None else self.order.nbytes
+
+
+class DieRegistry(Sequence[CuttingDie]):
+    # 適用範囲のキャッシュの上限数
+    CACHE_SIZE = 512
+    # 適用範囲のキャッシュが持つ並べ替えindexの合計バイト数の上限
+    CACHE_BYTES = 32 << 20
+
+    def __init__(self, dies: Iterable[CuttingDie] = ()) -> None:
+        """idの順に並んだ抜き型の一覧
+
+        リストと同様にidで参照でき, 定型抜き型は(大きさ, Type)で引ける
+        抜き型の盤面上の適用範囲と並べ替えを(id, 座標, 方向, 盤面の大きさ)ごとに
+        数と並べ替えindexの合計バイト数に上限を付けたLRUで保持する
+
+        Args:
+            dies (Iterable[CuttingDie], optional): 抜き型. Defaults to ().
+        """
+        self._dies: list[CuttingDie] = []
+        self._static: dict[tuple[int, int], CuttingDie] = {}
+        self._clipped: OrderedDict[tuple, ClippedDie] = OrderedDict()
+        self._clipped_bytes = 0
+        for die in dies:
+            self.append(die)
+
+    @overload
+    def __getitem__(self, index: int) -> CuttingDie: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[CuttingDie]: ...
+
+    def __getitem__(self, index: int | slice) -> CuttingDie | list[CuttingDie]:
+        return self._dies[index]
+
+    def __len__(self) -> int:
+        return len(self._dies)
+
+    def __getstate__(self) -> dict:
+        # ワーカーにはキャッシュを渡さない
+        return {**self.__dict__, "_clipped": OrderedDict(), "_clipped_bytes": 0}
+
+    def append(self, die: CuttingDie) -> None:
+        """抜き型を追加
+
+        Args:
+            die (CuttingDie): idが登録済みの数と等しい抜き型
+        """
+        assert die.id == len(self._dies), f"die id {die.id} is not {len(self._dies)}"
+        self._dies.append(die)
+        if die.type is not None:
+            self._static.setdefault((die.width, die.type), die)
+
+    def static(self, size: int, type: int) -> CuttingDie | None:
+        """定型抜き型を取得
+
+        Args:
+            size (int): 縦横幅
+            type (int): 定型抜き型のタイプ
+
+        Returns:
+            CuttingDie | None: 抜き型 存在しなければNone
+        """
+        return self._static.get((size, type))
+
+    def owns(self, die: CuttingDie) -> bool:
+        """登録済みの抜き型そのものか
+
+        Args:
+            die (CuttingDie): 抜き型
+
+        Returns:
+            bool: 登録済みか
+        """
+        return 0 <= die.id < len(self._dies) and self._dies[die.id] is die
+
+    def clipped(self, key: tuple, factory: Callable[[], ClippedDie]) -> ClippedDie:
+        """キャッシュした適用範囲を取得 なければ作成して追加する
+
+        Args:
+            key (tuple): (id, x, y, 方向, 横幅, 縦幅)
+            factory (Callable[[], ClippedDie]): 適用範囲を作成する関数
+
+        Returns:
+            ClippedDie: 適用範囲
+        """
+        clipped = self._clipped.get(key)
+        if clipped is not None:
+            self._clipped.move_to_end(key)
+            return clipped
+        clipped = factory()
+        self._clipped[key] = clipped
+        self._clipped_bytes += clipped.nbytes
+        while len(self._clipped) > 1 and (
+            len(self._clipped) > self.CACHE_SIZE
+            or self._clipped_bytes > self.CACHE_BYTES
+        ):
+            _, evicted = self._clipped.popitem(last=False)
+            self._clipped_bytes -= evicted.nbytes
+        return clipped
+
 
 class Board(Pattern):
+    # 計測が有効な場合にGameから設定される
+    profiler: Profiler | None = None
+    # Gameから設定され, 登録済みの抜き型の適用範囲をキャッシュする
+    registry: DieRegistry | None = None
+
     def __init__(
-        self, width: int, height: int, pattern: list[str] | np.ndarray
+        self,
+        width: int,
+        height: int,
+        pattern: list[str] | np.ndarray,
+        lazy: bool = False,
     ) -> None:
         """盤面
 
@@ -101,28 +316,107 @@ class Board(Pattern):
             width (int): 横幅
             height (int): 縦幅
             pattern (list[str] | np.ndarray): パターン
+            lazy (bool, optional): 行全体・列全体の並べ替えとなる操作を置換として溜め,
+                fieldの参照時にまとめて適用する. Defaults to False.
         """
+        self.lazy = lazy
         super().__init__(width, height, pattern)
-        self.corners = CornerCells(
-            nw=Cell(0, 0),
-            ne=Cell(self.width - 1, 0),
-            sw=Cell(0, self.height - 1),
-            se=Cell(self.width - 1, self.height - 1),
-        )
+        self.corners = CornerCells.of_size(self.width, self.height)
 
-    def _apply_die(self, die: CuttingDie, cell: Cell, direction: int) -> CuttingInfo:
-        """抜き型を適用
+    @property
+    def field(self) -> np.ndarray:
+        """盤面の値 溜まっている置換があれば適用してから返す"""
+        if self._rows is not None or self._columns is not None:
+            self.materialize()
+        return self._field
+
+    @field.setter
+    def field(self, field: np.ndarray) -> None:
+        self._field = field
+        self._rows: np.ndarray | None = None
+        self._columns: np.ndarray | None = None
+
+    def materialize(self) -> None:
+        """溜まっている行・列の置換を1回のgatherで適用"""
+        if self.profiler is not None:
+            start = time.perf_counter()
+        row_shift = self._rotation(self._rows)
+        column_shift = self._rotation(self._columns)
+        if row_shift is not None and column_shift is not None:
+            # 端への移動の合成は巡回シフトになるためスライスのコピーで済む
+            self._field = np.roll(self._field, (-row_shift, -column_shift), (0, 1))
+        else:
+            if self._rows is not None:
+                self._field = np.take(self._field, self._rows, axis=0)
+            if self._columns is not None:
+                self._field = np.take(self._field, self._columns, axis=1)
+        self._rows = None
+        self._columns = None
+        if self.profiler is not None:
+            self.profiler.record_materialize(time.perf_counter() - start)
+
+    @staticmethod
+    def _rotation(order: np.ndarray | None) -> int | None:
+        """置換が巡回シフトならシフト量を返す
+
+        Args:
+            order (np.ndarray | None): 置換
+
+        Returns:
+            int | None: シフト量 巡回シフトでなければNone
+        """
+        if order is None:
+            return 0
+        shift = int(order[0])
+        if np.array_equal(order, (np.arange(order.size) + shift) % order.size):
+            return shift
+        return None
+
+    def _defer(self, vertical: bool, order: np.ndarray) -> None:
+        """行・列の置換を溜まっている置換に合成
+
+        行の置換と列の置換は可換なため, それぞれ別に合成できる
+
+        Args:
+            vertical (bool): 行の並べ替え(上下方向の操作)か
+            order (np.ndarray): 移動後の各ラインの移動前のindex
+        """
+        if vertical:
+            self._rows = order if self._rows is None else self._rows[order]
+        else:
+            self._columns = order if self._columns is None else self._columns[order]
+
+    def _permute_lines(
+        self, vertical: bool, order: np.ndarray, targets: slice
+    ) -> None:
+        """溜まっている置換を適用せずに一部のラインを並べ替え
+
+        対象ラインを置換前の座標に変換して直接書き換える
+
+        Args:
+            vertical (bool): 列を上下方向に並べ替えるか
+            order (np.ndarray): 移動後の各要素の移動前のindex
+            targets (slice): 並べ替える対象ライン
+        """
+        rows = np.arange(self.height) if self._rows is None else self._rows
+        columns = np.arange(self.width) if self._columns is None else self._columns
+        if vertical:
+            columns = columns[targets]
+            source = rows[order, np.newaxis], columns
+        else:
+            rows = rows[targets]
+            source = rows[:, np.newaxis], columns[order]
+        self._field[rows[:, np.newaxis], columns] = self._field[source]
+
+    def _check_bounds(self, die: CuttingDie, cell: Cell) -> None:
+        """抜き型が盤面に重なるか確認
 
         Args:
             die (CuttingDie): 適用する抜き型
             cell (Cell): 適用する座標
-            direction (int): 適用する方向
 
         Raises:
             ValueError: 適用範囲外
-
-        Returns:
-            CuttingInfo: 操作内容
         """
         if (
             cell.x >= self.width
@@ -132,11 +426,90 @@ class Board(Pattern):
         ):
             raise ValueError("out of bounds.")
 
+    def _clip(self, die: CuttingDie, cell: Cell) -> tuple[Cell, Cell]:
+        """抜き型の盤面上の適用範囲を取得
+
+        Args:
+            die (CuttingDie): 適用する抜き型
+            cell (Cell): 適用する座標
+
+        Raises:
+            ValueError: 適用範囲外
+
+        Returns:
+            tuple[Cell, Cell]: 適用範囲の始点と終点
+        """
+        self._check_bounds(die, cell)
         mask_start = Cell(x=0 if cell.x < 0 else cell.x, y=0 if cell.y < 0 else cell.y)
         mask_end = Cell(
             x=self.width if self.width < die.width + cell.x else die.width + cell.x,
             y=self.height if self.height < die.height + cell.y else die.height + cell.y,
         )
+        return mask_start, mask_end
+
+    def affected_region(
+        self, die: CuttingDie, cell: Cell, direction: int
+    ) -> tuple[slice, slice]:
+        """抜き型の適用で値が変わりうる範囲を取得
+
+        抜かれた要素は移動方向の端まで詰められるため, 適用範囲から移動方向の端までが変化する
+
+        Args:
+            die (CuttingDie): 適用する抜き型
+            cell (Cell): 適用する座標
+            direction (int): 適用する方向
+
+        Returns:
+            tuple[slice, slice]: 変化しうる行と列の範囲
+        """
+        return self._clipped(die, cell, direction).region
+
+    @staticmethod
+    def _region(
+        mask_start: Cell, mask_end: Cell, direction: int
+    ) -> tuple[slice, slice]:
+        """適用範囲から値が変わりうる範囲を求める
+
+        Args:
+            mask_start (Cell): 盤面上の適用範囲の始点
+            mask_end (Cell): 盤面上の適用範囲の終点
+            direction (int): 適用する方向
+
+        Returns:
+            tuple[slice, slice]: 変化しうる行と列の範囲
+        """
+        match direction:
+            case Direction.UP:
+                return slice(mask_start.y, None), slice(mask_start.x, mask_end.x)
+            case Direction.DOWN:
+                return slice(None, mask_end.y), slice(mask_start.x, mask_end.x)
+            case Direction.LEFT:
+                return slice(mask_start.y, mask_end.y), slice(mask_start.x, None)
+            case _:
+                return slice(mask_start.y, mask_end.y), slice(None, mask_end.x)
+
+    def _clip_die(self, die: CuttingDie, cell: Cell, direction: int) -> ClippedDie:
+        """抜き型の適用範囲と盤面の値によらない並べ替えを求める
+
+        Args:
+            die (CuttingDie): 適用する抜き型
+            cell (Cell): 適用する座標
+            direction (int): 適用する方向
+
+        Raises:
+            ValueError: 適用範囲外
+
+        Returns:
+            ClippedDie: 適用範囲
+        """
+        mask_start, mask_end = self._clip(die, cell)
+        region = self._region(mask_start, mask_end, direction)
+        if die.type is not None:
+            geometry = self._standard_geometry(
+                die, cell, direction, mask_start, mask_end
+            )
+            return ClippedDie(mask_start, mask_end, region, geometry=geometry)
+
         die_start = Cell(x=-cell.x if cell.x < 0 else 0, y=-cell.y if cell.y < 0 else 0)
         die_end = Cell(
             x=self.width - cell.x if self.width < die.width + cell.x else die.width,
@@ -147,35 +520,359 @@ class Board(Pattern):
             ),
         )
 
-        mask = np.zeros_like(self.field, dtype=np.bool_)
-        mask[mask_start.y : mask_end.y, mask_start.x : mask_end.x] = die.field[
-            die_start.y : die_end.y, die_start.x : die_end.x
-        ]
+        clipped = die.field[die_start.y : die_end.y, die_start.x : die_end.x]
+        if direction in (Direction.UP, Direction.DOWN):
+            start, end, length = mask_start.y, mask_end.y, self.height
+        else:
+            # 行方向は転置ビューで列方向と同じ処理にする
+            clipped = clipped.T
+            start, end, length = mask_start.x, mask_end.x, self.width
+
+        # 各ラインの安定分割を並べ替えindexとして一括で求める
+        # ラインの長さはGameSpecification.MAX_SIZE以下のため, int16で持つ
+        if direction in (Direction.UP, Direction.LEFT):
+            # 抜き型の開始位置より手前は移動しない
+            keys = np.zeros((length - start, clipped.shape[1]), dtype=np.bool_)
+            keys[: end - start] = clipped
+        else:
+            # 抜き型の終了位置より後ろは移動しない
+            keys = np.ones((end, clipped.shape[1]), dtype=np.bool_)
+            keys[start:] = ~clipped
+        order = np.argsort(keys, axis=0, kind="stable").astype(np.int16)
+        return ClippedDie(mask_start, mask_end, region, order=order)
+
+    def _clipped(self, die: CuttingDie, cell: Cell, direction: int) -> ClippedDie:
+        """登録済みの抜き型ならキャッシュを使って適用範囲を取得
+
+        Args:
+            die (CuttingDie): 適用する抜き型
+            cell (Cell): 適用する座標
+            direction (int): 適用する方向
+
+        Raises:
+            ValueError: 適用範囲外
+
+        Returns:
+            ClippedDie: 適用範囲
+        """
+        if self.registry is None or not self.registry.owns(die):
+            return self._clip_die(die, cell, direction)
+        return self.registry.clipped(
+            (die.id, cell.x, cell.y, direction, self.width, self.height),
+            lambda: self._clip_die(die, cell, direction),
+        )
+
+    def _apply_die(self, die: CuttingDie, cell: Cell, direction: int) -> CuttingInfo:
+        """抜き型を適用
+
+        Args:
+            die (CuttingDie): 適用する抜き型
+            cell (Cell): 適用する座標
+            direction (int): 適用する方向
+
+        Raises:
+            ValueError: 適用範囲外
+
+        Returns:
+            CuttingInfo: 操作内容
+        """
+        clipped = self._clipped(die, cell, direction)
+        if die.type is not None:
+            self._apply_standard_die(direction, clipped.geometry)
+            return CuttingInfo(p=die.id, x=int(cell.x), y=int(cell.y), s=direction)
+
+        mask_start, mask_end = clipped.mask_start, clipped.mask_end
         if direction in (Direction.UP, Direction.DOWN):
-            for x in range(mask_start.x, mask_end.x):
-                temp = self.field[:, x]
-                if direction == Direction.UP:
-                    self.field[:, x] = np.concatenate(
-                        [temp[~mask[:, x]], temp[mask[:, x]]]
-                    )
-                else:
-                    self.field[:, x] = np.concatenate(
-                        [temp[mask[:, x]], temp[~mask[:, x]]]
-                    )
+            lines = self.field[:, mask_start.x : mask_end.x]
+            start, end = mask_start.y, mask_end.y
+        else:
+            lines = self.field[mask_start.y : mask_end.y].T
+            start, end = mask_start.x, mask_end.x
 
+        if direction in (Direction.UP, Direction.LEFT):
+            lines[start:] = np.take_along_axis(lines[start:], clipped.order, axis=0)
         else:
-            for y in range(mask_start.y, mask_end.y):
-                temp = self.field[y]
-                if direction == Direction.LEFT:
-                    self.field[y] = np.concatenate([temp[~mask[y]], temp[mask[y]]])
-                else:
-                    self.field[y] = np.concatenate([temp[mask[y]], temp[~mask[y]]])
+            lines[:end] = np.take_along_axis(lines[:end], clipped.order, axis=0)
         return CuttingInfo(p=die.id, x=int(cell.x), y=int(cell.y), s=direction)
 
+    def _standard_geometry(
+        self,
+        die: CuttingDie,
+        cell: Cell,
+        direction: int,
+        mask_start: Cell,
+        mask_end: Cell,
+    ) -> tuple[int, int, int, slice] | None:
+        """定型抜き型で抜かれる範囲を移動方向の位置と対象ラインで表す
+
+        Args:
+            die (CuttingDie): 適用する定型抜き型
+            cell (Cell): 適用する座標
+            direction (int): 適用する方向
+            mask_start (Cell): 盤面上の適用範囲の始点
+            mask_end (Cell): 盤面上の適用範囲の終点
+
+        Returns:
+            tuple[int, int, int, slice] | None: 最初に抜かれる位置, 抜き型の終了位置,
+                抜かれる要素の間隔, 対象ライン 抜かれる要素がなければNone
+        """
+        if direction in (Direction.UP, Direction.DOWN):
+            start, end = mask_start.y, mask_end.y
+            cross_start, cross_end = mask_start.x, mask_end.x
+            origin, cross_origin = cell.y, cell.x
+            along_type, cross_type = StaticDieTypes.EVEN_ROW, StaticDieTypes.EVEN_COLUMN
+        else:
+            start, end = mask_start.x, mask_end.x
+            cross_start, cross_end = mask_start.y, mask_end.y
+            origin, cross_origin = cell.x, cell.y
+            along_type, cross_type = StaticDieTypes.EVEN_COLUMN, StaticDieTypes.EVEN_ROW
+
+        # 縞型は抜き型の原点から偶数番目のラインのみ抜かれる
+        step = 2 if die.type == along_type else 1
+        cross_step = 2 if die.type == cross_type else 1
+        first = start + (start - origin) % step
+        cross_first = cross_start + (cross_start - cross_origin) % cross_step
+        if first >= end or cross_first >= cross_end:
+            return None
+        return first, end, step, slice(cross_first, cross_end, cross_step)
+
+    def _apply_standard_die(
+        self, direction: int, geometry: tuple[int, int, int, slice] | None
+    ) -> None:
+        """定型抜き型をマスクを作らずに適用
+
+        全面型は帯の巡回シフト, 縞型は1つおきの要素の並べ替えになるため,
+        移動方向の並べ替えindexと対象ラインのスライスだけで処理する
+
+        Args:
+            direction (int): 適用する方向
+            geometry (tuple[int, int, int, slice] | None): _standard_geometryの結果
+        """
+        if geometry is None:
+            return
+        first, end, step, targets = geometry
+        vertical = direction in (Direction.UP, Direction.DOWN)
+        length, cross_length = (
+            (self.height, self.width) if vertical else (self.width, self.height)
+        )
+
+        all_lines = len(range(cross_length)[targets]) == cross_length
+        if self.lazy and (
+            all_lines or self._rows is not None or self._columns is not None
+        ):
+            # 対象ラインは全て同じ並べ替えになるためindexの置換として扱う
+            order = np.arange(length)[:, np.newaxis]
+            self._shift_lines(order, slice(None), first, end, step, direction)
+            if all_lines:
+                self._defer(vertical, order[:, 0])
+            else:
+                self._permute_lines(vertical, order[:, 0], targets)
+            return
+
+        lines = self.field if vertical else self.field.T
+        self._shift_lines(lines, targets, first, end, step, direction)
+
+    def line_permutation(
+        self, die: CuttingDie, cell: Cell, direction: int
+    ) -> tuple[bool, range, np.ndarray] | None:
+        """定型抜き型の適用を対象ラインと各ライン共通の並べ替えとして取得
+
+        Args:
+            die (CuttingDie): 適用する抜き型
+            cell (Cell): 適用する座標
+            direction (int): 適用する方向
+
+        Returns:
+            tuple[bool, range, np.ndarray] | None: 上下方向の操作か, 対象ライン,
+                移動後の各要素の移動前のindex 定型抜き型でなければNone
+        """
+        if die.type is None:
+            return None
+        geometry = self._clipped(die, cell, direction).geometry
+        vertical = direction in (Direction.UP, Direction.DOWN)
+        length, cross_length = (
+            (self.height, self.width) if vertical else (self.width, self.height)
+        )
+        if geometry is None:
+            return vertical, range(0), np.arange(length)
+        first, end, step, targets = geometry
+        order = np.arange(length)[:, np.newaxis]
+        self._shift_lines(order, slice(None), first, end, step, direction)
+        return vertical, range(cross_length)[targets], order[:, 0]
+
+    @staticmethod
+    def _shift_lines(
+        lines: np.ndarray,
+        targets: slice,
+        first: int,
+        end: int,
+        step: int,
+        direction: int,
+    ) -> None:
+        """定型抜き型で抜かれた要素をラインの端へ移動
+
+        Args:
+            lines (np.ndarray): 移動方向を0軸とした盤面のビュー
+            targets (slice): 対象ライン
+            first (int): 最初に抜かれる位置
+            end (int): 抜き型の終了位置
+            step (int): 抜かれる要素の間隔(1 or 2)
+            direction (int): 適用する方向
+        """
+        if step == 1:
+            if direction in (Direction.UP, Direction.LEFT):
+                lines[first:, targets] = np.concatenate(
+                    [lines[end:, targets], lines[first:end, targets]]
+                )
+            else:
+                lines[:end, targets] = np.concatenate(
+                    [lines[first:end, targets], lines[:first, targets]]
+                )
+            return
+
+        # 抜かれる要素とその間の要素はどちらも1つおきのスライスで表せる
+        last = end - 1 - (end - 1 - first) % 2
+        masked = lines[first : last + 1 : 2, targets]
+        between = lines[first + 1 : last : 2, targets]
+        if direction in (Direction.UP, Direction.LEFT):
+            lines[first:, targets] = np.concatenate(
+                [between, lines[last + 1 :, targets], masked]
+            )
+        else:
+            lines[: last + 1, targets] = np.concatenate(
+                [masked, lines[:first, targets], between]
+            )
+
     def copy(self) -> Self:
         """コピーを作成
 
         Returns:
             Self: 自身のコピー
         """
-        return Board(self.width, self.height, self.field.copy())
+        board = Board(self.width, self.height, self.field.copy(), lazy=self.lazy)
+        board.registry = self.registry
+        return board
+
+    def __getstate__(self) -> dict:
+        # 抜き型の一覧はワーカー側で持つため盤面と一緒に送らない
+        state = self.__dict__.copy()
+        state.pop("registry", None)
+        return state
+
+    def pack(self) -> "PackedBoard":
+        """1セル2bitに詰めた形式に変換 スナップショットやワーカーへの転送に使う
+
+        Raises:
+            ValueError: セルの値が0〜3でない
+
+        Returns:
+            PackedBoard: 詰めた盤面
+        """
+        field = self.field
+        if field.size and (
+            field.min() < 0 or field.max() >= GameSpecification.CELL_VALUES
+        ):
+            raise ValueError("cell values must be in 0-3 to pack")
+        return PackedBoard(self.width, self.height, pack_cells(field))
+
+
+@dataclass(frozen=True)
+class PackedBoard:
+    """1セル2bitに詰めた盤面"""
+
+    width: int
+    height: int
+    cells: np.ndarray
+
+    def unpack(self, lazy: bool = False) -> Board:
+        """盤面に戻す
+
+        Args:
+            lazy (bool, optional): Boardのlazy. Defaults to False.
+
+        Returns:
+            Board: uint8の盤面
+        """
+        field = unpack_cells(self.cells, (self.height, self.width))
+        return Board(self.width, self.height, field, lazy=lazy)
+
+
+class PhantomBoard(Board):
+    def __init__(self, width: int, height: int) -> None:
+        """値を持たず, 適用された操作の記録のみを行う盤面
+
+        操作列が座標と盤面の大きさのみで決まる処理の操作数を盤面に触れずに求めるために使う
+
+        Args:
+            width (int): 横幅
+            height (int): 縦幅
+        """
+        super().__init__(width, height, np.broadcast_to(np.int8(0), (height, width)))
+        self.ops: list[CuttingInfo] = []
+
+    def _apply_die(self, die: CuttingDie, cell: Cell, direction: int) -> CuttingInfo:
+        self._check_bounds(die, cell)
+        log = CuttingInfo(p=die.id, x=int(cell.x), y=int(cell.y), s=direction)
+        self.ops.append(log)
+        return log
+
+
+class RotatedBoard:
+    def __init__(self, board: Board) -> None:
+        """盤面を行・列方向に巡回シフトした読み取り専用の視点
+
+        全面の抜き型で行・列を上辺・左辺に移動する操作の代わりにずらし量のみを更新し,
+        盤面はコピーも変更もしない
+
+        Args:
+            board (Board): 元の盤面
+        """
+        self.board = board
+        self.width = board.width
+        self.height = board.height
+        self.row_offset = 0
+        self.column_offset = 0
+
+    def row(self, index: int) -> np.ndarray:
+        """ずらした後の行
+
+        Args:
+            index (int): 行のindex
+
+        Returns:
+            np.ndarray: 行の値
+        """
+        row = self.board.field[(index + self.row_offset) % self.height]
+        return np.roll(row, -self.column_offset) if self.column_offset else row
+
+    def column(self, index: int) -> np.ndarray:
+        """ずらした後の列
+
+        Args:
+            index (int): 列のindex
+
+        Returns:
+            np.ndarray: 列の値
+        """
+        column = self.board.field[:, (index + self.column_offset) % self.width]
+        return np.roll(column, -self.row_offset) if self.row_offset else column
+
+    def move_to_edge_row(self, target_row: int) -> None:
+        """Game._move_to_edge_rowで行を上辺に移動した場合と同じだけずらす
+
+        Args:
+            target_row (int): 上辺に移動させたい行のindex
+        """
+        # 盤面の高さ以上の場合は全ての行を抜くため並びは変わらない
+        if 0 < target_row < self.height:
+            self.row_offset = (self.row_offset + target_row) % self.height
+
+    def move_to_edge_column(self, target_column: int) -> None:
+        """Game._move_to_edge_columnで列を左辺に移動した場合と同じだけずらす
+
+        Args:
+            target_column (int): 左辺に移動させたい列のindex
+        """
+        # 盤面の横幅以上の場合は全ての列を抜くため並びは変わらない
+        if 0 < target_column < self.width:
+            self.column_offset = (self.column_offset + target_column) % self.width
@@ -0,0 +1,248 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .data import Cell, CuttingInfo, Direction, StaticDieTypes
+from .patterns import Board, CuttingDie, DieRegistry
+from .replay import ReplayEngine, ops_to_array
+
+
+@dataclass
+class _LineOperation:
+    """定型抜き型の操作を対象ラインとライン内の並べ替えとして表したもの"""
+
+    log: CuttingInfo
+    vertical: bool
+    lines: range
+    order: np.ndarray
+
+    @property
+    def moved(self) -> np.ndarray:
+        """並べ替えで位置が変わるindex"""
+        return np.flatnonzero(self.order != np.arange(len(self.order)))
+
+    def is_full(self, cross_length: int) -> bool:
+        """全ラインが対象か"""
+        return len(self.lines) == cross_length
+
+
+class PeepholeOptimizer:
+    def __init__(self, dies: list[CuttingDie], width: int, height: int) -> None:
+        """操作ログの局所最適化
+
+        定型抜き型の操作を各ライン共通の並べ替えとみなし,
+        可換な操作を飛び越えて同じラインへの操作同士を合成する
+        合成結果が恒等なら両方を削除し, 全面型1回で表せるならその操作に置き換える
+        一般抜き型の操作は飛び越えない
+
+        Args:
+            dies (list[CuttingDie]): idの順に並んだ全ての抜き型
+            width (int): 盤面の横幅
+            height (int): 盤面の縦幅
+        """
+        self.dies = dies
+        self.width = width
+        self.height = height
+        self._board = Board(width, height, np.zeros((height, width), dtype=np.int8))
+        if isinstance(dies, DieRegistry):
+            self._board.registry = dies
+        # 全面型のサイズとidの対応 小さい順
+        self._full_dies = sorted(
+            (die.width, die.id)
+            for die in dies
+            if die.type == StaticDieTypes.FULL and die.width == die.height
+        )
+
+    def _parse(self, log: CuttingInfo) -> _LineOperation | None:
+        """操作を並べ替えとして解釈
+
+        Args:
+            log (CuttingInfo): 操作
+
+        Returns:
+            _LineOperation | None: 並べ替え 一般抜き型の場合はNone
+        """
+        permutation = self._board.line_permutation(
+            self.dies[log.p], Cell(log.x, log.y), log.s
+        )
+        if permutation is None:
+            return None
+        return _LineOperation(log, *permutation)
+
+    def _commutes(self, a: _LineOperation, b: _LineOperation) -> bool:
+        """2つの操作の順序を入れ替えても結果が変わらないか
+
+        Args:
+            a (_LineOperation): 操作
+            b (_LineOperation): 操作
+
+        Returns:
+            bool: 可換か
+        """
+        if a.vertical == b.vertical:
+            if not set(a.lines) & set(b.lines):
+                return True
+            return np.array_equal(a.order[b.order], b.order[a.order])
+
+        # 一方が動かすラインと他方の対象ラインが交わらなければ互いに影響しない
+        if not set(a.moved.tolist()) & set(b.lines) or not set(
+            b.moved.tolist()
+        ) & set(a.lines):
+            return True
+        for full, other in ((a, b), (b, a)):
+            cross_length = self.width if full.vertical else self.height
+            if full.is_full(cross_length):
+                # 全ラインの並べ替えが他方の対象ラインの集合を保てば可換
+                lines = np.array(other.lines)
+                if set(full.order[lines].tolist()) == set(other.lines):
+                    return True
+        return False
+
+    def _full_rotation(
+        self, vertical: bool, lines: range, order: np.ndarray
+    ) -> CuttingInfo | None:
+        """並べ替えを全面型1回の操作で表す
+
+        Args:
+            vertical (bool): 上下方向の操作か
+            lines (range): 対象ライン
+            order (np.ndarray): 移動後の各要素の移動前のindex
+
+        Returns:
+            CuttingInfo | None: 操作 表せなければNone
+        """
+        length = len(order)
+        shift = int(order[0])
+        if lines.step != 1 or not np.array_equal(
+            order, (np.arange(length) + shift) % length
+        ):
+            return None
+        cross_length = self.width if vertical else self.height
+        start, end = lines.start, lines.stop
+        for size, id in self._full_dies:
+            # 交差方向は対象ラインをちょうど覆う位置に置く
+            if start == 0:
+                if size < end:
+                    continue
+                cross = end - size
+            elif end == cross_length:
+                if size < cross_length - start:
+                    continue
+                cross = start
+            elif size == end - start:
+                cross = start
+            else:
+                continue
+            # 先頭から抜いて末尾に寄せるか, 末尾から抜いて先頭に寄せる
+            if size >= shift:
+                along, direction = shift - size, (Direction.UP, Direction.LEFT)
+            elif size >= length - shift:
+                along, direction = shift, (Direction.DOWN, Direction.RIGHT)
+            else:
+                continue
+            if vertical:
+                return CuttingInfo(id, cross, along, direction[0])
+            return CuttingInfo(id, along, cross, direction[1])
+        return None
+
+    def _merge(self, a: _LineOperation, b: _LineOperation) -> list[_LineOperation] | None:
+        """同じラインへの連続した操作を合成
+
+        Args:
+            a (_LineOperation): 先の操作
+            b (_LineOperation): 後の操作
+
+        Returns:
+            list[_LineOperation] | None: 合成後の操作 合成できなければNone
+        """
+        if a.vertical != b.vertical or a.lines != b.lines:
+            return None
+        order = a.order[b.order]
+        if np.array_equal(order, np.arange(len(order))):
+            return []
+        log = self._full_rotation(a.vertical, a.lines, order)
+        if log is None:
+            return None
+        return [_LineOperation(log, a.vertical, a.lines, order)]
+
+    def _pass(self, logs: list[CuttingInfo]) -> list[CuttingInfo]:
+        """1回分の最適化
+
+        Args:
+            logs (list[CuttingInfo]): 操作ログ
+
+        Returns:
+            list[CuttingInfo]: 最適化後の操作ログ
+        """
+        stack: list[_LineOperation | CuttingInfo] = []
+        for log in logs:
+            operation = self._parse(log)
+            if operation is None:
+                stack.append(log)
+                continue
+            if not len(operation.lines) or not len(operation.moved):
+                continue
+
+            merged = None
+            for i in range(len(stack) - 1, -1, -1):
+                previous = stack[i]
+                if isinstance(previous, CuttingInfo):
+                    break
+                merged = self._merge(previous, operation)
+                if merged is not None:
+                    stack[i : i + 1] = merged
+                    break
+                if not self._commutes(previous, operation):
+                    break
+            if merged is None:
+                stack.append(operation)
+        return [
+            item if isinstance(item, CuttingInfo) else item.log for item in stack
+        ]
+
+    def optimize(self, logs: list[CuttingInfo]) -> list[CuttingInfo]:
+        """操作数が減らなくなるまで最適化
+
+        最適化後の操作で全セルの移動先が一致しない場合は元の操作ログを返す
+
+        Args:
+            logs (list[CuttingInfo]): 操作ログ
+
+        Returns:
+            list[CuttingInfo]: 最適化後の操作ログ
+        """
+        optimized = logs
+        while True:
+            candidate = self._pass(optimized)
+            if len(candidate) >= len(optimized):
+                break
+            optimized = candidate
+        if optimized is logs:
+            return logs
+
+        # 各セルに固有の値を持つ盤面で全セルの移動先を比較する
+        engine = ReplayEngine(self.dies, self.width, self.height)
+        index = np.arange(self.width * self.height).reshape(self.height, self.width)
+        if not np.array_equal(
+            engine.replay(index, ops_to_array(optimized)),
+            engine.replay(index, ops_to_array(logs)),
+        ):
+            return logs
+        return optimized
+
+
+def optimize_logs(
+    logs: list[CuttingInfo], dies: list[CuttingDie], width: int, height: int
+) -> list[CuttingInfo]:
+    """操作ログを局所最適化
+
+    Args:
+        logs (list[CuttingInfo]): 操作ログ
+        dies (list[CuttingDie]): idの順に並んだ全ての抜き型
+        width (int): 盤面の横幅
+        height (int): 盤面の縦幅
+
+    Returns:
+        list[CuttingInfo]: 最適化後の操作ログ
+    """
+    return PeepholeOptimizer(dies, width, height).optimize(logs)
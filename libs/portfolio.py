@@ -0,0 +1,314 @@
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .data import CuttingInfo, Direction, StaticDieTypes
+from .executor import Executor, SharedArrays, get_executor
+from .game import Game
+from .oplog import OpLog
+from .patterns import Board, CuttingDie, PackedBoard
+from .replay import ReplayEngine, ops_to_array
+
+
+@dataclass(frozen=True)
+class Variant:
+    """解法の変種
+
+    盤面は転置してから左右・上下に反転した座標系で解き, 操作ログを元の座標系に戻す
+    """
+
+    name: str
+    stages: tuple[tuple[str, dict], ...] = tuple((stage, {}) for stage in Game.STAGES)
+    transpose: bool = False
+    flip_x: bool = False
+    flip_y: bool = False
+
+    @property
+    def framed(self) -> bool:
+        """座標系を変換するか"""
+        return self.transpose or self.flip_x or self.flip_y
+
+
+def _stages(**options: dict) -> tuple[tuple[str, dict], ...]:
+    """Game.STAGESの一部の引数を変えた処理の並び
+
+    Args:
+        **options (dict): 処理名と引数 Noneの場合は処理を省く
+
+    Returns:
+        tuple[tuple[str, dict], ...]: 処理名と引数の並び
+    """
+    return tuple(
+        (stage, options.get(stage, {}))
+        for stage in Game.STAGES
+        if options.get(stage, {}) is not None
+    )
+
+
+VARIANTS: tuple[Variant, ...] = (
+    Variant("default"),
+    Variant("columns_first", _stages(rough_arrange={"columns_first": True})),
+    Variant("skip_initial", _stages(initial_optimize_board=None)),
+    *(
+        Variant(
+            f"shred_{offset}",
+            (("shred", {"offset": offset, "goal": False}), *_stages()),
+        )
+        for offset in (-1, 0)
+    ),
+    Variant("flip_x", flip_x=True),
+    Variant("flip_y", flip_y=True),
+)
+
+
+@dataclass
+class PortfolioResult:
+    """各変種の結果"""
+
+    # 完成した変種がなく通常の処理で解いた場合はNone
+    best: str | None
+    logs: OpLog
+    counts: dict[str, int | None] = field(default_factory=dict)
+
+
+def _to_frame(field: np.ndarray, variant: Variant) -> np.ndarray:
+    """盤面を変種の座標系に変換
+
+    Args:
+        field (np.ndarray): 盤面
+        variant (Variant): 変種
+
+    Returns:
+        np.ndarray: 変換後の盤面 元の盤面とは独立した配列
+    """
+    if variant.transpose:
+        field = field.T
+    if variant.flip_x:
+        field = field[:, ::-1]
+    if variant.flip_y:
+        field = field[::-1]
+    return field.copy()
+
+
+def _flip_op(
+    op: tuple[int, int, int, int], die: CuttingDie, vertical: bool, length: int
+) -> tuple[int, int, int, int]:
+    """左右または上下に反転した座標系の操作を反転前の座標系に変換
+
+    Args:
+        op (tuple[int, int, int, int]): (p, x, y, s)
+        die (CuttingDie): 操作の抜き型
+        vertical (bool): 上下反転か
+        length (int): 反転する軸の盤面の長さ
+
+    Returns:
+        tuple[int, int, int, int]: 変換後の操作
+    """
+    p, x, y, s = op
+    # 縞の向きと反転方向が直交する場合は抜かれる列・行の偶奇を合わせる
+    striped = StaticDieTypes.EVEN_ROW if vertical else StaticDieTypes.EVEN_COLUMN
+    shift = 1 if die.type == striped else 0
+    swapped = {
+        Direction.UP: Direction.DOWN,
+        Direction.DOWN: Direction.UP,
+        Direction.LEFT: Direction.RIGHT,
+        Direction.RIGHT: Direction.LEFT,
+    }
+    if vertical:
+        y = length - y - die.height + shift
+        if s in (Direction.UP, Direction.DOWN):
+            s = swapped[s]
+    else:
+        x = length - x - die.width + shift
+        if s in (Direction.LEFT, Direction.RIGHT):
+            s = swapped[s]
+    return p, x, y, int(s)
+
+
+def _from_frame(logs: OpLog, game: Game, variant: Variant) -> OpLog | None:
+    """変種の座標系の操作ログを元の座標系に戻す
+
+    Args:
+        logs (OpLog): 変種の座標系の操作ログ
+        game (Game): 変種の座標系のゲーム
+        variant (Variant): 変種
+
+    Returns:
+        OpLog | None: 元の座標系の操作ログ 一般抜き型を含む場合はNone
+    """
+    if not variant.framed:
+        return logs
+    transposed = {
+        Direction.UP: Direction.LEFT,
+        Direction.LEFT: Direction.UP,
+        Direction.DOWN: Direction.RIGHT,
+        Direction.RIGHT: Direction.DOWN,
+    }
+    striped = {
+        StaticDieTypes.FULL: StaticDieTypes.FULL,
+        StaticDieTypes.EVEN_ROW: StaticDieTypes.EVEN_COLUMN,
+        StaticDieTypes.EVEN_COLUMN: StaticDieTypes.EVEN_ROW,
+    }
+    mapped = OpLog()
+    for log in logs:
+        die = game.dies[log.p]
+        if die.type is None:
+            return None
+        op = log.tuple()
+        if variant.flip_y:
+            op = _flip_op(op, die, True, game.board.height)
+        if variant.flip_x:
+            op = _flip_op(op, die, False, game.board.width)
+        p, x, y, s = op
+        if variant.transpose:
+            p = game.get_static_die(die.width, striped[die.type]).id
+            x, y, s = y, x, int(transposed[Direction(s)])
+        mapped.append(CuttingInfo(p, x, y, s))
+    return mapped
+
+
+def _solve_shared(
+    shared: SharedArrays, width: int, height: int, variant: Variant
+) -> OpLog | None:
+    board = PackedBoard(width, height, shared["board"]).unpack().field
+    goal = PackedBoard(width, height, shared["goal"]).unpack().field
+    start = _to_frame(board, variant)
+    target = _to_frame(goal, variant)
+    height, width = start.shape
+    game = Game.from_boards(
+        Board(width, height, start, lazy=True),
+        Board(width, height, target),
+        CuttingDie.unpack(shared["die_fields"], shared["die_meta"]),
+        executor="serial",
+        # 一般抜き型の操作は座標系を戻せないため使わない
+        custom_dies=not variant.framed,
+    )
+    for stage, options in variant.stages:
+        getattr(game, stage)(**options)
+    if not game.is_goal:
+        return None
+    return _from_frame(game.logs, game, variant)
+
+
+def solve_variant(
+    shared: SharedArrays, width: int, height: int, variant: Variant
+) -> tuple[OpLog | None, float]:
+    """1つの変種で解く ワーカーで実行する
+
+    Args:
+        shared (SharedArrays): 1セル2bitに詰めた現在盤面・最終盤面と抜き型の共有ハンドル
+        width (int): 盤面の横幅
+        height (int): 盤面の縦幅
+        variant (Variant): 変種
+
+    Returns:
+        tuple[OpLog | None, float]: 元の座標系の操作ログ 戻せなければNone, と処理時間
+    """
+    start = time.perf_counter()
+    # 共有配列のビューを全て手放してから閉じる
+    logs = _solve_shared(shared, width, height, variant)
+    shared.close()
+    return logs, time.perf_counter() - start
+
+
+def solve_portfolio(
+    game: Game,
+    variants: tuple[Variant, ...] = VARIANTS,
+    executor: Executor | str = "auto",
+    workers: int | None = None,
+) -> PortfolioResult:
+    """複数の変種を並列に解き, 再生して完成を確認できた最短の操作ログを選ぶ
+
+    ゲームの盤面と操作ログは選んだ操作ログを適用した状態に置き換える
+    完成した変種がなければゲームをそのまま通常の処理で解く
+    計測が有効な場合は全体の時間と変種ごとの処理時間・操作数を記録する
+
+    Args:
+        game (Game): 未着手のゲーム
+        variants (tuple[Variant, ...], optional): 試す変種. Defaults to VARIANTS.
+        executor (Executor | str, optional): 並列処理の実行方式. Defaults to "auto".
+        workers (int | None, optional): 並列処理のワーカー数. Defaults to None.
+
+    Returns:
+        PortfolioResult: 各変種の結果
+    """
+    with game.profiler.stage("portfolio"):
+        result = _solve_portfolio(game, variants, executor, workers)
+    if result.best is None:
+        # 完成した変種がなければ通常の処理で解く
+        game.main()
+        result.logs = game.logs.copy()
+    elif game.profiler.enabled:
+        game.profiler.record_mismatch(len(game.logs), game.mismatch_count)
+    return result
+
+
+def _solve_portfolio(
+    game: Game,
+    variants: tuple[Variant, ...],
+    executor: Executor | str,
+    workers: int | None,
+) -> PortfolioResult:
+    """変種を並列に解き, 最短の操作ログを適用した状態にゲームを置き換える
+
+    Args:
+        game (Game): 未着手のゲーム
+        variants (tuple[Variant, ...]): 試す変種
+        executor (Executor | str): 並列処理の実行方式
+        workers (int | None): 並列処理のワーカー数
+
+    Returns:
+        PortfolioResult: 各変種の結果 完成した変種がなければbestはNone
+    """
+    owned = not isinstance(executor, Executor)
+    if owned:
+        executor = get_executor(
+            executor, workers, game.board.width * game.board.height
+        )
+    board = Board(game.board.width, game.board.height, game.board.field.copy())
+    goal = Board(game.goal.width, game.goal.height, game.goal.field.copy())
+    die_fields, die_meta = CuttingDie.pack(game.dies)
+    arrays = {
+        "board": board.pack().cells,
+        "goal": goal.pack().cells,
+        "die_fields": die_fields,
+        "die_meta": die_meta,
+    }
+    try:
+        # 盤面は詰めた上で抜き型とともに1度だけ共有し, 各変種には共有ハンドルのみ渡す
+        with executor.share(arrays) as shared:
+            results = executor.map(
+                solve_variant,
+                [shared] * len(variants),
+                [board.width] * len(variants),
+                [board.height] * len(variants),
+                variants,
+            )
+    finally:
+        if owned:
+            executor.shutdown()
+
+    engine = ReplayEngine(game.dies, board.width, board.height)
+    result = PortfolioResult(None, OpLog())
+    for variant, (logs, seconds) in zip(variants, results):
+        if logs is not None:
+            # 座標系の変換などの誤りで完成しない, または適用できない操作があれば採用しない
+            try:
+                replayed = engine.verify(board.field, ops_to_array(logs), goal.field)
+            except ValueError:
+                logs = None
+            else:
+                if replayed.matched != replayed.field.size:
+                    logs = None
+        result.counts[variant.name] = None if logs is None else len(logs)
+        if game.profiler.enabled:
+            game.profiler.record_variant(
+                variant.name, seconds, result.counts[variant.name]
+            )
+        if logs is not None and (result.best is None or len(logs) < len(result.logs)):
+            result.best, result.logs = variant.name, logs
+            game.set_board(Board(board.width, board.height, replayed.field, lazy=True))
+    if result.best is not None:
+        game.logs = result.logs.copy()
+    return result
@@ -0,0 +1,174 @@
+import json
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from .data import Direction
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False) -> None:
+        """処理時間と操作回数の計測
+
+        無効の場合は呼び出し側でenabledを確認して計測処理自体を省く
+
+        Args:
+            enabled (bool, optional): 計測を有効にする. Defaults to False.
+        """
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self) -> None:
+        """計測結果を初期化"""
+        self.stages: dict[str, float] = {}
+        self.die_calls = 0
+        # (抜き型id, 方向)ごとの[呼び出し回数, 累計時間]
+        self.dies: defaultdict[tuple[int, int], list] = defaultdict(lambda: [0, 0.0])
+        # 交換に使った角ごとの[交換回数, 操作数]
+        self.swaps: defaultdict[str, list[int]] = defaultdict(lambda: [0, 0])
+        self.materialize = [0, 0.0]
+        # 値を持たない盤面への抜き型の適用の[呼び出し回数, 累計時間]
+        self.phantom = [0, 0.0]
+        # 並列に試した解法の変種ごとの(処理時間, 操作数) 完成しなければ操作数はNone
+        self.variants: dict[str, tuple[float, int | None]] = {}
+        # (経過時間, 操作数, 不一致数)
+        self.mismatches: list[tuple[float, int, int]] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """処理段階の時間を計測
+
+        Args:
+            name (str): 処理段階名
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def record_die(self, id: int, direction: int, seconds: float) -> None:
+        """抜き型の適用を記録
+
+        Args:
+            id (int): 抜き型id
+            direction (int): 方向
+            seconds (float): 処理時間
+        """
+        self.die_calls += 1
+        record = self.dies[id, direction]
+        record[0] += 1
+        record[1] += seconds
+
+    def record_phantom(self, seconds: float) -> None:
+        """値を持たない盤面への抜き型の適用を記録
+
+        盤面を変更しないためrecord_dieとは分けて集計する
+
+        Args:
+            seconds (float): 処理時間
+        """
+        self.phantom[0] += 1
+        self.phantom[1] += seconds
+
+    @property
+    def ops(self) -> int:
+        """値を持たない盤面も含めた抜き型の適用回数"""
+        return self.die_calls + self.phantom[0]
+
+    def record_swap(self, corner: str, ops: int) -> None:
+        """2点交換を記録
+
+        Args:
+            corner (str): 使用した角
+            ops (int): 交換で適用した抜き型の数
+        """
+        record = self.swaps[corner]
+        record[0] += 1
+        record[1] += ops
+
+    def record_materialize(self, seconds: float) -> None:
+        """溜まっていた置換の適用を記録
+
+        Args:
+            seconds (float): 処理時間
+        """
+        self.materialize[0] += 1
+        self.materialize[1] += seconds
+
+    def record_variant(self, name: str, seconds: float, ops: int | None) -> None:
+        """解法の変種の結果を記録
+
+        Args:
+            name (str): 変種名
+            seconds (float): ワーカーでの処理時間
+            ops (int | None): 操作数 完成しなかった場合はNone
+        """
+        self.variants[name] = (seconds, ops)
+
+    def record_mismatch(self, ops: int, mismatch: int) -> None:
+        """不一致数の推移を記録
+
+        Args:
+            ops (int): その時点の操作数
+            mismatch (int): 不一致数
+        """
+        self.mismatches.append((time.perf_counter() - self._start, ops, mismatch))
+
+    def dict(self) -> dict:
+        """計測結果をJSON形式に変換
+
+        Returns:
+            dict: 計測結果
+        """
+        return {
+            "stages": self.stages,
+            "apply_die": {
+                "calls": self.die_calls,
+                "seconds": sum(seconds for _, seconds in self.dies.values()),
+                "dies": [
+                    {
+                        "p": id,
+                        "direction": Direction(direction).name,
+                        "calls": calls,
+                        "seconds": seconds,
+                    }
+                    for (id, direction), (calls, seconds) in sorted(self.dies.items())
+                ],
+            },
+            "materialize": {
+                "calls": self.materialize[0],
+                "seconds": self.materialize[1],
+            },
+            "phantom_apply": {
+                "calls": self.phantom[0],
+                "seconds": self.phantom[1],
+            },
+            "swap": {
+                corner: {"calls": calls, "ops": ops}
+                for corner, (calls, ops) in sorted(self.swaps.items())
+            },
+            "portfolio": {
+                name: {"seconds": seconds, "ops": ops}
+                for name, (seconds, ops) in self.variants.items()
+            },
+            "mismatch": [
+                {"seconds": seconds, "ops": ops, "mismatch": mismatch}
+                for seconds, ops, mismatch in self.mismatches
+            ],
+        }
+
+    def save(self, path: str | Path) -> None:
+        """計測結果をJSONで保存
+
+        Args:
+            path (str | Path): 保存先
+        """
+        with Path(path).open("w") as f:
+            json.dump(self.dict(), f, indent=2)
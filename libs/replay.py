@@ -0,0 +1,174 @@
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from .data import Cell, CuttingInfo, Direction
+from .oplog import OP_FIELDS, OpLog
+from .patterns import Board, CuttingDie, DieRegistry
+
+
+def ops_to_array(
+    ops: OpLog | Iterable[dict | CuttingInfo | Sequence[int]],
+) -> np.ndarray:
+    """操作を(n, 4)の整数配列に変換
+
+    Args:
+        ops (OpLog | Iterable[dict | CuttingInfo | Sequence[int]]): 回答フォーマットの
+            ops, 操作ログまたは(p, x, y, s)の並び
+
+    Returns:
+        np.ndarray: 各行が(p, x, y, s)の配列
+    """
+    if isinstance(ops, OpLog):
+        return ops.array()
+    rows = [
+        (
+            tuple(op[key] for key in OP_FIELDS)
+            if isinstance(op, dict)
+            else op.tuple() if isinstance(op, CuttingInfo) else tuple(op)
+        )
+        for op in ops
+    ]
+    return np.array(rows, dtype=np.int32).reshape(-1, len(OP_FIELDS))
+
+
+@dataclass
+class ReplayResult:
+    """再生結果"""
+
+    field: np.ndarray
+    n: int
+    matched: int | None = None
+    match_rate: float | None = None
+    divergence: int | None = None
+
+
+class ReplayEngine:
+    def __init__(self, dies: list[CuttingDie], width: int, height: int) -> None:
+        """操作ログの再生と検証
+
+        操作はまとめて配列で受け取り, 定型抜き型は行・列の置換として高速に適用する
+        参照用には全ての抜き型を一般抜き型として即時に適用する経路を使う
+
+        Args:
+            dies (list[CuttingDie]): idの順に並んだ全ての抜き型
+            width (int): 盤面の横幅
+            height (int): 盤面の縦幅
+        """
+        self.dies = dies
+        self.width = width
+        self.height = height
+        self._reference_dies = [
+            CuttingDie(die.id, die.width, die.height, die.field) for die in dies
+        ]
+
+    def _apply(
+        self, board: Board, dies: list[CuttingDie], ops: np.ndarray, offset: int = 0
+    ) -> None:
+        """盤面に操作を順に適用
+
+        Args:
+            board (Board): 対象の盤面
+            dies (list[CuttingDie]): 使用する抜き型
+            ops (np.ndarray): 各行が(p, x, y, s)の配列
+            offset (int, optional): エラー表示用の先頭の操作番号. Defaults to 0.
+
+        Raises:
+            ValueError: 存在しない抜き型・方向または盤面外への適用
+        """
+        for i, (p, x, y, s) in enumerate(ops.tolist(), offset):
+            if not 0 <= p < len(dies) or s not in tuple(Direction):
+                raise ValueError(f"invalid op {i}: p={p}, s={s}")
+            try:
+                board._apply_die(dies[p], Cell(x, y), s)
+            except ValueError as e:
+                raise ValueError(f"invalid op {i}: {e}") from e
+
+    def _board(self, start: np.ndarray, reference: bool = False) -> Board:
+        board = Board(self.width, self.height, start.copy(), lazy=not reference)
+        if isinstance(self.dies, DieRegistry):
+            board.registry = self.dies
+        return board
+
+    def replay(
+        self, start: np.ndarray, ops: np.ndarray, reference: bool = False
+    ) -> np.ndarray:
+        """操作を適用した盤面を取得
+
+        Args:
+            start (np.ndarray): 初期盤面
+            ops (np.ndarray): 各行が(p, x, y, s)の配列
+            reference (bool, optional): 参照用の経路で適用する. Defaults to False.
+
+        Returns:
+            np.ndarray: 適用後の盤面
+        """
+        board = self._board(start, reference)
+        self._apply(board, self._reference_dies if reference else self.dies, ops)
+        return board.field
+
+    def first_divergence(
+        self, start: np.ndarray, ops: np.ndarray, interval: int = 256
+    ) -> int | None:
+        """高速な経路と参照用の経路で盤面が最初に食い違う操作を探す
+
+        interval個ごとに盤面を比較し, 食い違った区間のみ1操作ずつ比較する
+
+        Args:
+            start (np.ndarray): 初期盤面
+            ops (np.ndarray): 各行が(p, x, y, s)の配列
+            interval (int, optional): 比較する間隔. Defaults to 256.
+
+        Returns:
+            int | None: 操作番号 食い違わなければNone
+        """
+        fast = self._board(start)
+        reference = self._board(start, reference=True)
+        for offset in range(0, len(ops), interval):
+            checkpoint = fast.field.copy()
+            block = ops[offset : offset + interval]
+            self._apply(fast, self.dies, block, offset)
+            self._apply(reference, self._reference_dies, block, offset)
+            if np.array_equal(fast.field, reference.field):
+                continue
+
+            fast.field = checkpoint
+            reference.field = checkpoint.copy()
+            for i in range(len(block)):
+                self._apply(fast, self.dies, block[i : i + 1], offset + i)
+                self._apply(
+                    reference, self._reference_dies, block[i : i + 1], offset + i
+                )
+                if not np.array_equal(fast.field, reference.field):
+                    return offset + i
+        return None
+
+    def verify(
+        self,
+        start: np.ndarray,
+        ops: np.ndarray,
+        expected: np.ndarray | None = None,
+        check: bool = False,
+    ) -> ReplayResult:
+        """操作を再生して期待する盤面との一致率を求める
+
+        Args:
+            start (np.ndarray): 初期盤面
+            ops (np.ndarray): 各行が(p, x, y, s)の配列
+            expected (np.ndarray | None, optional): 期待する盤面. Defaults to None.
+            check (bool, optional): 期待する盤面と一致しない場合に
+                参照用の経路と食い違う操作を探す. Defaults to False.
+
+        Returns:
+            ReplayResult: 再生結果
+        """
+        field = self.replay(start, ops)
+        result = ReplayResult(field, len(ops))
+        if expected is None:
+            return result
+        result.matched = int(np.count_nonzero(field == expected))
+        result.match_rate = result.matched / field.size
+        if check and result.matched != field.size:
+            result.divergence = self.first_divergence(start, ops)
+        return result
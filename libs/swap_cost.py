@@ -0,0 +1,128 @@
+import numpy as np
+
+# Game.swapで交換に使う角
+CORNERS = ("nw", "ne", "sw", "se")
+# 使えない角の操作数
+INVALID_COST = np.iinfo(np.int64).max
+
+
+def edge_swap_cost(margin: np.ndarray) -> np.ndarray:
+    """角と同じ辺上の点の交換(Game._swap_edge_horizontal, _swap_edge_vertical)の操作数
+
+    Args:
+        margin (np.ndarray): 2点の間のセル数
+
+    Returns:
+        np.ndarray: 操作数
+    """
+    margin = np.asarray(margin, dtype=np.int64)
+    margins = np.bitwise_count(margin)
+    margins_with_target = np.bitwise_count(margin + 1)
+    return np.where(
+        (margins_with_target < margins) & (margins_with_target < 4),
+        margins_with_target + 1,
+        np.where(margins < 4, margins + 1, 4),
+    )
+
+
+def swap_costs(
+    x_1: np.ndarray,
+    y_1: np.ndarray,
+    x_2: np.ndarray,
+    y_2: np.ndarray,
+    width: int,
+    height: int,
+) -> np.ndarray:
+    """各角を使ったGame.swapの操作数を盤面に触れずに求める
+
+    Args:
+        x_1 (np.ndarray): 交換対象1のx座標
+        y_1 (np.ndarray): 交換対象1のy座標
+        x_2 (np.ndarray): 交換対象2のx座標
+        y_2 (np.ndarray): 交換対象2のy座標
+        width (int): 盤面の横幅
+        height (int): 盤面の縦幅
+
+    Returns:
+        np.ndarray: 先頭の軸がCORNERSの順の操作数 その角で交換できない組はINVALID_COST
+    """
+    x_1, y_1, x_2, y_2 = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.int64) for v in (x_1, y_1, x_2, y_2))
+    )
+    shape = (len(CORNERS),) + (1,) * x_1.ndim
+    north = np.array([corner[0] == "n" for corner in CORNERS]).reshape(shape)
+    west = np.array([corner[1] == "w" for corner in CORNERS]).reshape(shape)
+    corner_x = np.where(west, 0, width - 1)
+    corner_y = np.where(north, 0, height - 1)
+
+    # 2点を囲むブロックの角を盤面の角に移動した後の座標
+    block_x = np.where(west, np.minimum(x_1, x_2), np.maximum(x_1, x_2))
+    block_y = np.where(north, np.minimum(y_1, y_2), np.maximum(y_1, y_2))
+    moved_x_1 = x_1 - block_x + corner_x
+    moved_x_2 = x_2 - block_x + corner_x
+    moved_y_1 = y_1 - block_y + corner_y
+    moved_y_2 = y_2 - block_y + corner_y
+    # ブロックの移動と戻す操作
+    cost = 2 * (block_x != corner_x) + 2 * (block_y != corner_y)
+
+    same_column = moved_x_1 == moved_x_2
+    same_row = moved_y_1 == moved_y_2
+    # 同じ列・行の場合は辺上の交換のみ
+    line_cost = edge_swap_cost(
+        np.where(same_column, np.abs(moved_y_1 - moved_y_2), np.abs(moved_x_1 - moved_x_2))
+        - 1
+    )
+
+    # それ以外は上側の点(upper)と下側の点(lower)が角のブロックの辺上にある必要がある
+    swapped = moved_y_1 > moved_y_2
+    upper_x = np.where(swapped, moved_x_2, moved_x_1)
+    upper_y = np.where(swapped, moved_y_2, moved_y_1)
+    lower_x = np.where(swapped, moved_x_1, moved_x_2)
+    lower_y = np.where(swapped, moved_y_1, moved_y_2)
+    on_edge = ((upper_y == 0) & ((lower_x == 0) | (lower_x == width - 1))) | (
+        (lower_y == height - 1) & ((upper_x == 0) | (upper_x == width - 1))
+    )
+    # 角と同じ行の点を横方向, もう一方を縦方向に角へ移動する
+    upper_on_row = upper_y == corner_y
+    vertical_x = np.where(upper_on_row, lower_x, upper_x)
+    horizontal_x = np.where(upper_on_row, upper_x, lower_x)
+    horizontal_y = np.where(upper_on_row, upper_y, lower_y)
+    margin = np.abs(horizontal_x - corner_x) - 1
+    block_cost = 2 + edge_swap_cost(margin)
+    # 固定4手の交換は角と同じ行にない点を扱えない
+    fixed_turn = (np.bitwise_count(margin) >= 4) & (np.bitwise_count(margin + 1) >= 4)
+    block_valid = (
+        on_edge
+        & (vertical_x == corner_x)
+        & ~(fixed_turn & (horizontal_y != corner_y) & (horizontal_x != corner_x))
+    )
+
+    line = same_column | same_row
+    cost = cost + np.where(line, line_cost, block_cost)
+    return np.where(line | block_valid, cost, INVALID_COST)
+
+
+def cheapest_corner(
+    x_1: np.ndarray,
+    y_1: np.ndarray,
+    x_2: np.ndarray,
+    y_2: np.ndarray,
+    width: int,
+    height: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Game.swapの操作数が最小となる角を求める
+
+    Args:
+        x_1 (np.ndarray): 交換対象1のx座標
+        y_1 (np.ndarray): 交換対象1のy座標
+        x_2 (np.ndarray): 交換対象2のx座標
+        y_2 (np.ndarray): 交換対象2のy座標
+        width (int): 盤面の横幅
+        height (int): 盤面の縦幅
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: CORNERSのindexと操作数
+    """
+    costs = swap_costs(x_1, y_1, x_2, y_2, width, height)
+    corners = np.argmin(costs, axis=0)
+    return corners, np.take_along_axis(costs, corners[np.newaxis], axis=0)[0]
@@ -0,0 +1,30 @@
+import time
+
+from .anytime import PORTFOLIO, AnytimeSolver
+from .test_replay import make_input
+
+
+def test_portfolio_is_tried_first():
+    submitted = []
+    solver = AnytimeSolver(
+        make_input(8, 8),
+        submitted.append,
+        deadline=time.time() + 60,
+        portfolio=True,
+        executor="serial",
+    )
+    assert next(iter(solver.strategies)) == PORTFOLIO
+    best = solver.solve()
+    assert best is not None and best.is_goal
+    # 提出は操作数が減った回答のみ
+    counts = [len(answer) for answer in submitted]
+    assert counts == sorted(counts, reverse=True)
+    assert counts[-1] == len(best.logs)
+
+
+def test_no_verified_answer_returns_none(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(AnytimeSolver, "_verify", lambda self, game: False)
+    solver = AnytimeSolver(make_input(6, 6), submitted.append, executor="serial")
+    assert solver.solve() is None
+    assert submitted == []
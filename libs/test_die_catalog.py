@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from .data import Cell, Direction
+from .die_catalog import DieCatalog
+from .patterns import Board, CuttingDie
+
+
+def random_dies(rng: np.random.Generator, count: int, size: int) -> list[CuttingDie]:
+    return [
+        CuttingDie(25 + i, width, height, rng.integers(0, 2, (height, width)))
+        for i, (width, height) in enumerate(
+            rng.integers(1, size + 1, (count, 2)).tolist()
+        )
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_agree_with_stable_partition(seed: int):
+    rng = np.random.default_rng(seed)
+    catalog = DieCatalog(random_dies(rng, int(rng.integers(1, 8)), 40))
+    for edge in Direction:
+        length = int(rng.integers(1, 60))
+        partitions = catalog.partitions(edge, length)
+        line = rng.integers(0, 4, length)
+        goal = rng.integers(0, 4, length)
+        matches = partitions.matches(line, goal)
+        for i in range(len(partitions)):
+            # 抜かれたセルを後ろ(前)に寄せる安定分割
+            keys = partitions.punched(i) ^ partitions.backward[i]
+            order = np.argsort(keys, kind="stable")
+            assert matches[i] == np.count_nonzero(line[order] == goal)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_best_partition_applies_to_edge_only(seed: int):
+    rng = np.random.default_rng(seed)
+    dies = random_dies(rng, 5, 12)
+    catalog = DieCatalog(dies)
+    width, height = 10, 8
+    field = rng.integers(0, 4, (height, width))
+    goal = rng.integers(0, 4, (height, width))
+    # 辺ごとの盤面のラインのindexと, 列か
+    edges = {
+        Direction.UP: (0, False),
+        Direction.DOWN: (-1, False),
+        Direction.LEFT: (0, True),
+        Direction.RIGHT: (-1, True),
+    }
+    for edge, (index, vertical) in edges.items():
+        lines, goals = (field.T, goal.T) if vertical else (field, goal)
+        result = catalog.best_partition(edge, lines[index], goals[index], width, height)
+        if result is None:
+            continue
+        gain, log = result
+        board = Board(width, height, field.copy())
+        board._apply_die(dies[log.p - 25], Cell(log.x, log.y), log.s)
+        after = board.field.T if vertical else board.field
+        before = np.count_nonzero(lines[index] == goals[index])
+        assert np.count_nonzero(after[index] == goals[index]) - before == gain
+        # 辺以外のラインは変わらない
+        others = np.delete(after, index, axis=0)
+        assert np.array_equal(others, np.delete(lines, index, axis=0))
@@ -0,0 +1,30 @@
+import pytest
+
+from .executor import SERIAL_MAX_CELLS, ProcessExecutor, SerialExecutor, get_executor
+from .game import Game
+from .test_replay import make_input
+
+
+@pytest.mark.parametrize(
+    "workers, cells, expected",
+    [
+        (1, None, SerialExecutor),
+        (1, SERIAL_MAX_CELLS + 1, SerialExecutor),
+        (4, SERIAL_MAX_CELLS, SerialExecutor),
+        (4, SERIAL_MAX_CELLS + 1, ProcessExecutor),
+        (4, None, ProcessExecutor),
+    ],
+)
+def test_auto_picks_serial_for_small_boards(workers, cells, expected):
+    with get_executor("auto", workers, cells) as executor:
+        assert type(executor) is expected
+
+
+def test_explicit_name_ignores_cells():
+    with get_executor("process", 2, 1) as executor:
+        assert isinstance(executor, ProcessExecutor)
+
+
+def test_game_executor_uses_board_size():
+    game = Game(make_input(8, 8), executor="auto", workers=4)
+    assert isinstance(game.executor, SerialExecutor)
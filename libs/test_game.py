@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from .data import Cell, Direction
+from .game import Game
+
+
+def random_input(rng: np.random.Generator) -> dict:
+    width, height = (int(size) for size in rng.integers(1, 41, 2))
+    start = rng.integers(0, 4, (height, width))
+    goal = rng.permutation(start.ravel()).reshape(height, width)
+    patterns = []
+    for i in range(int(rng.integers(1, 5))):
+        die_width, die_height = (int(size) for size in rng.integers(1, 48, 2))
+        cells = rng.integers(0, 2, (die_height, die_width))
+        patterns.append(
+            {
+                "p": 25 + i,
+                "width": die_width,
+                "height": die_height,
+                "cells": ["".join(map(str, row)) for row in cells],
+            }
+        )
+    return {
+        "board": {
+            "width": width,
+            "height": height,
+            "start": ["".join(map(str, row)) for row in start],
+            "goal": ["".join(map(str, row)) for row in goal],
+        },
+        "general": {"n": len(patterns), "patterns": patterns},
+    }
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_matched_tracks_from_scratch_comparison(seed: int):
+    rng = np.random.default_rng(seed)
+    game = Game(random_input(rng), executor="serial")
+    width, height = game.board.width, game.board.height
+    # 1x1, 最大の定型抜き型, 最後の一般抜き型を多めに選ぶ
+    edge_ids = [0, 22, 23, 24, len(game.dies) - 1]
+    for step in range(300):
+        if rng.random() < 0.3:
+            die = game.dies[int(rng.choice(edge_ids))]
+        else:
+            die = game.dies[int(rng.integers(len(game.dies)))]
+        cell = Cell(
+            int(rng.integers(1 - die.width, width)),
+            int(rng.integers(1 - die.height, height)),
+        )
+        # 最終盤面への適用も追跡範囲に反映される
+        board = game.board if rng.random() < 0.8 else game.goal
+        game.apply_die(board, die, cell, int(rng.choice(list(Direction))))
+        expected = game.board.field == game.goal.field
+        assert np.array_equal(game.check_board(), expected), step
+        assert game.mismatch_count == np.count_nonzero(~expected), step
+
+
+def test_many_regions_are_merged():
+    rng = np.random.default_rng(0)
+    game = Game(random_input(rng), executor="serial")
+    game.mismatch_count
+    die = game.dies[0]
+    width, height = game.board.width, game.board.height
+    # DIRTY_REGIONSを超える数の1セルの範囲を溜めてから比較する
+    for _ in range(Game.DIRTY_REGIONS * 3):
+        cell = Cell(int(rng.integers(width)), int(rng.integers(height)))
+        game.apply_die(game.board, die, cell, int(rng.integers(len(Direction))))
+    expected = game.board.field == game.goal.field
+    assert np.array_equal(game.check_board(), expected)
+    assert game.mismatch_count == np.count_nonzero(~expected)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_planned_swaps_are_valid(seed: int):
+    rng = np.random.default_rng(seed)
+    game = Game(random_input(rng), executor="serial")
+    # 区間分けも通るように小さくする
+    game.ASSIGNMENT_CHUNK = int(rng.integers(1, 8))
+    pairs = game.plan_swaps()
+    cells = [cell for pair in pairs for cell in pair]
+    assert len(set(cells)) == len(cells)
+    field = game.board.field.copy()
+    goal = game.goal.field
+    for step, (target_1, target_2) in enumerate(pairs):
+        before = np.count_nonzero(field != goal)
+        a, b = (target_1.y, target_1.x), (target_2.y, target_2.x)
+        field[a], field[b] = field[b], field[a]
+        # 両方が揃う交換のみ
+        assert np.count_nonzero(field != goal) == before - 2, step
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_assign_uses_each_cell_once(seed: int):
+    rng = np.random.default_rng(seed)
+    game = Game(random_input(rng), executor="serial")
+    size = game.board.width * game.board.height
+    cells = rng.permutation(size)
+    split = int(rng.integers(0, size + 1))
+    cells_1, cells_2 = np.sort(cells[:split]), np.sort(cells[split:])
+    pairs = game._assign(cells_1, cells_2)
+    assert len(pairs) == min(len(cells_1), len(cells_2))
+    width = game.board.width
+    indexes_1 = [cell.y * width + cell.x for cell, _ in pairs]
+    indexes_2 = [cell.y * width + cell.x for _, cell in pairs]
+    assert len(set(indexes_1)) == len(indexes_1) and set(indexes_1) <= set(cells_1)
+    assert len(set(indexes_2)) == len(indexes_2) and set(indexes_2) <= set(cells_2)
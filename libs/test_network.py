@@ -0,0 +1,91 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from . import network
+from .data import CuttingInfo
+from .local_server import LocalServer
+from .network import API
+from .oplog import OpLog
+
+PROBLEM = {
+    "board": {"width": 2, "height": 1, "start": ["01"], "goal": ["10"]},
+    "general": {"n": 0, "patterns": []},
+}
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> list[float]:
+    """クライアントの待機時間を記録して待機しない"""
+    recorded = []
+    monkeypatch.setattr(
+        network, "time", SimpleNamespace(time=time.time, sleep=recorded.append)
+    )
+    return recorded
+
+
+def make_api(server: LocalServer, **kwargs) -> API:
+    return API(env_file="", url=server.url, token=server.token, **kwargs)
+
+
+def statuses(server: LocalServer) -> list[int]:
+    return [status for _, _, status in server.requests]
+
+
+def test_waiting_does_not_use_retries(sleeps: list[float]):
+    with LocalServer(PROBLEM, starts_at=time.time() + 0.5) as server:
+        api = make_api(server)
+        # 待機しないため開始まで403が続くが, 再試行回数1でも失敗しない
+        assert api.get_problem(retry=1, interval=10) == PROBLEM
+    assert statuses(server)[-1] == 200
+    assert statuses(server).count(403) == len(sleeps) > 0
+    # 開始時刻が不明な場合はinterval(10秒)ではなくwait_intervalで確認する
+    assert set(sleeps) == {api.wait_interval}
+
+
+def test_waiting_until_known_start(sleeps: list[float]):
+    with LocalServer(PROBLEM, starts_at=time.time() + 30) as server:
+        api = make_api(server)
+        # 開始時刻が分かれば直前まで待つ 待機中に開始したことにする
+        server.starts_at = time.time() + 0.5
+        assert api.get_problem(interval=1, starts_at=time.time() + 30) == PROBLEM
+    assert 29 < sleeps[0] < 30
+
+
+def test_failures_back_off_up_to_limit(sleeps: list[float]):
+    with LocalServer(PROBLEM, failure_rate=1.0) as server:
+        api = make_api(server, max_interval=0.4)
+        with pytest.raises(requests.HTTPError):
+            api.get_problem(retry=5, interval=0.1)
+        server.failure_rate = 0.0
+        assert api.get_problem(retry=5, interval=0.1) == PROBLEM
+    assert statuses(server) == [500] * 5 + [200]
+    assert sleeps == pytest.approx([0.1, 0.2, 0.4, 0.4])
+
+
+def test_injected_failures_are_retried(sleeps: list[float]):
+    with LocalServer(PROBLEM, failure_rate=0.5, seed=0) as server:
+        api = make_api(server)
+        for _ in range(5):
+            assert api.get_problem(retry=20, interval=0.1) == PROBLEM
+    assert 500 in statuses(server)
+    assert max(sleeps) <= api.max_interval
+
+
+def test_post_oplog_is_accepted(sleeps: list[float]):
+    logs = OpLog([CuttingInfo(0, 0, 0, 2), CuttingInfo(22, -255, 1, 3)])
+    with LocalServer(PROBLEM, failure_rate=0.3, seed=1) as server:
+        api = make_api(server)
+        assert api.post_answer(logs, retry=20, interval=0.1) == {"revision": 1}
+        assert api.post_answer(logs.format(), retry=20) == {"revision": 2}
+    assert server.answers == [logs.format(), logs.format()]
+
+
+def test_timeout_is_retried(sleeps: list[float]):
+    with LocalServer(PROBLEM, latency=0.5) as server:
+        api = make_api(server, timeout=0.1)
+        with pytest.raises(requests.HTTPError):
+            api.get_problem(retry=2, interval=0.1)
+    assert len(sleeps) == 1
@@ -0,0 +1,80 @@
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from .data import CuttingInfo
+from .oplog import OpLog
+
+
+def random_log(count: int, seed: int = 0) -> OpLog:
+    rng = np.random.default_rng(seed)
+    ops = np.column_stack(
+        [
+            rng.integers(0, 50, count),
+            rng.integers(-255, 256, count),
+            rng.integers(-255, 256, count),
+            rng.integers(0, 4, count),
+        ]
+    )
+    return OpLog.from_array(ops)
+
+
+def test_append_and_extend_keep_order():
+    log = OpLog([CuttingInfo(1, 2, 3, 0)])
+    log.extend(np.array([[4, -5, 6, 1]]))
+    log.append(CuttingInfo(7, 8, -9, 2))
+    log.extend([(10, 11, 12, 3), CuttingInfo(13, 14, 15, 0)])
+    log.extend(OpLog([CuttingInfo(16, 17, 18, 1)]))
+    assert len(log) == 6
+    assert [op.tuple() for op in log] == [
+        (1, 2, 3, 0),
+        (4, -5, 6, 1),
+        (7, 8, -9, 2),
+        (10, 11, 12, 3),
+        (13, 14, 15, 0),
+        (16, 17, 18, 1),
+    ]
+    assert log[2] == CuttingInfo(7, 8, -9, 2)
+    assert log[1:3].array().tolist() == [[4, -5, 6, 1], [7, 8, -9, 2]]
+
+
+def test_grows_past_initial_capacity():
+    log = OpLog()
+    for i in range(OpLog.INITIAL_CAPACITY * 2 + 1):
+        log.append(CuttingInfo(i % 25, i, -i % 256, i % 4))
+    assert len(log) == OpLog.INITIAL_CAPACITY * 2 + 1
+    assert log[-1] == CuttingInfo(2048 % 25, 2048, -2048 % 256, 0)
+
+
+@pytest.mark.parametrize("count", [0, 1, OpLog.CHUNK_SIZE, OpLog.CHUNK_SIZE + 1])
+def test_json_round_trip(count: int):
+    log = random_log(count)
+    assert json.loads(log.json_bytes()) == log.format()
+    assert log.format()["n"] == count
+
+
+@pytest.mark.parametrize("count", [0, 1, 5000])
+def test_binary_round_trip(count: int, tmp_path):
+    log = random_log(count)
+    assert np.array_equal(OpLog.from_bytes(log.to_bytes()).array(), log.array())
+    log.save(tmp_path / "log.bin")
+    assert np.array_equal(OpLog.load(tmp_path / "log.bin").array(), log.array())
+
+
+def test_from_bytes_rejects_other_data():
+    with pytest.raises(ValueError):
+        OpLog.from_bytes(b'{"n":0,"ops":[]}')
+
+
+def test_pickle_and_copy_are_independent():
+    log = random_log(100)
+    restored = pickle.loads(pickle.dumps(log))
+    copied = log.copy()
+    assert np.array_equal(restored.array(), log.array())
+    first = log[0]
+    log.append(CuttingInfo(0, 0, 0, 0))
+    log.array()[0] = (99, 0, 0, 0)
+    assert len(restored) == len(copied) == 100
+    assert restored[0] == copied[0] == first
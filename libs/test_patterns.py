@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from .data import Cell, StaticDieTypes
+from .patterns import Board, CuttingDie, pack_cells, unpack_cells
+from .test_replay import make_game, random_ops
+
+
+@pytest.mark.parametrize("width, height", [(1, 7), (9, 6), (16, 16)])
+def test_lazy_board_matches_eager(width: int, height: int):
+    game = make_game(width, height)
+    lazy = game.board
+    eager = Board(width, height, lazy.field.copy())
+    rng = np.random.default_rng(width * height)
+    for i, (p, x, y, s) in enumerate(random_ops(game, 400).tolist()):
+        for board in (lazy, eager):
+            board._apply_die(game.dies[p], Cell(x, y), s)
+        # 置換を溜めたままの場合と途中で適用した場合の両方を確かめる
+        if rng.random() < 0.1:
+            assert np.array_equal(lazy.field, eager.field), i
+    assert np.array_equal(lazy.field, eager.field)
+
+
+# 端の大きさと奇数の横幅を含む(縦幅, 横幅)
+SHAPES = [(1, 1), (1, 3), (3, 1), (5, 7), (255, 1), (1, 255), (256, 256), (255, 253)]
+SHAPES += [
+    tuple(shape) for shape in np.random.default_rng(0).integers(1, 257, (8, 2)).tolist()
+]
+
+
+@pytest.mark.parametrize("height, width", SHAPES)
+def test_pack_cells_round_trip(height: int, width: int):
+    field = np.random.default_rng(height * width).integers(0, 4, (height, width))
+    packed = pack_cells(field)
+    assert packed.dtype == np.uint8 and packed.size == -(-field.size // 4)
+    assert np.array_equal(unpack_cells(packed, (height, width)), field)
+
+
+@pytest.mark.parametrize("height, width", SHAPES)
+def test_packed_board_round_trip(height: int, width: int):
+    field = np.random.default_rng(height + width).integers(0, 4, (height, width))
+    board = Board(width, height, field)
+    for lazy in (False, True):
+        restored = board.pack().unpack(lazy=lazy)
+        assert (restored.width, restored.height) == (width, height)
+        assert np.array_equal(restored.field, field)
+
+
+def test_packed_board_rejects_out_of_range():
+    with pytest.raises(ValueError):
+        Board(2, 1, np.array([[0, 4]])).pack()
+
+
+def test_cutting_die_round_trip():
+    rng = np.random.default_rng(0)
+    dies = [
+        CuttingDie.make_standard(0, 1, StaticDieTypes.FULL),
+        CuttingDie.make_standard(1, 256, StaticDieTypes.EVEN_ROW),
+        CuttingDie.make_standard(2, 255, StaticDieTypes.EVEN_COLUMN),
+    ]
+    for height, width in SHAPES:
+        cells = rng.integers(0, 2, (height, width)).astype(bool)
+        dies.append(CuttingDie(25 + len(dies), width, height, cells))
+    restored = CuttingDie.unpack(*CuttingDie.pack(dies))
+    assert len(restored) == len(dies)
+    for die, copy in zip(dies, restored):
+        assert (copy.id, copy.width, copy.height, copy.type) == (
+            die.id,
+            die.width,
+            die.height,
+            die.type,
+        )
+        assert np.array_equal(copy.field, die.field)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from .data import CuttingInfo, Direction, StaticDieTypes
+from .peephole import PeepholeOptimizer, optimize_logs
+from .replay import ReplayEngine, ops_to_array
+from .test_replay import make_game
+
+WIDTH, HEIGHT = 8, 6
+
+
+@pytest.fixture(scope="module")
+def game():
+    return make_game(WIDTH, HEIGHT)
+
+
+def moves(game, logs: list[CuttingInfo]) -> np.ndarray:
+    """各セルに固有の値を持つ盤面で操作を再生した結果"""
+    engine = ReplayEngine(game.dies, WIDTH, HEIGHT)
+    index = np.arange(WIDTH * HEIGHT).reshape(HEIGHT, WIDTH)
+    return engine.replay(index, ops_to_array(logs))
+
+
+def test_inverse_pair_cancels(game):
+    logs = [
+        CuttingInfo(0, 3, 0, Direction.UP),
+        CuttingInfo(0, 5, 2, Direction.LEFT),
+        CuttingInfo(0, 3, HEIGHT - 1, Direction.DOWN),
+    ]
+    optimized = optimize_logs(logs, game.dies, WIDTH, HEIGHT)
+    assert optimized == [logs[1]]
+
+
+def test_rotations_fold_into_full_die(game):
+    logs = [CuttingInfo(0, 0, 0, Direction.UP)] * 2
+    optimized = optimize_logs(logs, game.dies, WIDTH, HEIGHT)
+    assert len(optimized) == 1
+    assert optimized[0].p == game.get_static_die(2, StaticDieTypes.FULL).id
+    assert np.array_equal(moves(game, optimized), moves(game, logs))
+
+
+def test_custom_die_is_barrier(game):
+    logs = [
+        CuttingInfo(0, 3, 0, Direction.UP),
+        CuttingInfo(25, 0, 0, Direction.UP),
+        CuttingInfo(0, 3, HEIGHT - 1, Direction.DOWN),
+    ]
+    assert optimize_logs(logs, game.dies, WIDTH, HEIGHT) == logs
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_logs_keep_every_cell(game, seed: int):
+    # 1x1と2x2の全面型のみにして打ち消し合う操作を作りやすくする
+    rng = np.random.default_rng(seed)
+    dies = [game.dies[0], game.get_static_die(2, StaticDieTypes.FULL)]
+    logs = []
+    for _ in range(200):
+        die = dies[int(rng.integers(len(dies)))]
+        x = int(rng.integers(1 - die.width, WIDTH))
+        y = int(rng.integers(1 - die.height, HEIGHT))
+        logs.append(CuttingInfo(die.id, x, y, int(rng.integers(len(Direction)))))
+    optimized = optimize_logs(logs, game.dies, WIDTH, HEIGHT)
+    assert len(optimized) < len(logs)
+    assert np.array_equal(moves(game, optimized), moves(game, logs))
+
+
+def test_mismatch_keeps_original(game, monkeypatch):
+    logs = [CuttingInfo(0, 3, 0, Direction.UP), CuttingInfo(0, 4, 0, Direction.UP)]
+    # 操作を落とすだけの壊れた最適化は採用されない
+    monkeypatch.setattr(PeepholeOptimizer, "_pass", lambda self, logs: logs[:-1])
+    assert optimize_logs(logs, game.dies, WIDTH, HEIGHT) == logs
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from . import portfolio
+from .data import CuttingInfo, Direction
+from .oplog import OpLog
+from .portfolio import Variant, _from_frame, _to_frame, solve_portfolio
+from .replay import ReplayEngine
+from .test_replay import make_game, random_ops
+
+FLIPS = [
+    Variant("flip_x", flip_x=True),
+    Variant("flip_y", flip_y=True),
+    Variant("flip_xy", flip_x=True, flip_y=True),
+]
+
+
+@pytest.mark.parametrize("variant", FLIPS, ids=lambda variant: variant.name)
+@pytest.mark.parametrize("width, height", [(7, 5), (12, 12)])
+def test_frame_ops_map_back(variant: Variant, width: int, height: int):
+    game = make_game(width, height)
+    engine = ReplayEngine(game.dies, width, height)
+    # 盤面を動かす定型抜き型の操作のみ 縞の抜き型の偶奇の補正も含めて確かめる
+    # 何も抜かない縞の抜き型の操作は反転すると盤面外になりうるが, 解法は出力しない
+    index = np.arange(width * height).reshape(height, width)
+    ops = np.array(
+        [
+            op
+            for op in random_ops(game, 300)
+            if op[0] < 25 and not np.array_equal(engine.replay(index, op[None]), index)
+        ]
+    )
+    start = game.board.field.copy()
+
+    framed = engine.replay(_to_frame(start, variant), ops)
+    mapped = _from_frame(OpLog.from_array(ops), game, variant)
+    assert mapped is not None and len(mapped) == len(ops)
+    restored = engine.replay(start, mapped.array())
+    assert np.array_equal(_to_frame(restored, variant), framed)
+
+
+def test_custom_die_is_not_mapped():
+    game = make_game(6, 6)
+    logs = OpLog([CuttingInfo(25, 0, 0, Direction.UP)])
+    assert _from_frame(logs, game, FLIPS[0]) is None
+    assert _from_frame(logs, game, Variant("default")) is logs
+
+
+def test_invalid_variant_is_rejected(monkeypatch):
+    game = make_game(8, 8)
+    solve_shared = portfolio._solve_shared
+
+    def broken(shared, width, height, variant):
+        if variant.name == "broken":
+            # 存在しない抜き型の操作を返す
+            return OpLog([CuttingInfo(len(game.dies), 0, 0, Direction.UP)])
+        return solve_shared(shared, width, height, variant)
+
+    monkeypatch.setattr(portfolio, "_solve_shared", broken)
+    result = solve_portfolio(
+        game, (Variant("broken"), Variant("default")), executor="serial"
+    )
+    assert result.counts["broken"] is None
+    assert result.best == "default"
+    assert game.is_goal
+
+
+def test_profile_records_variants():
+    game = make_game(8, 8)
+    game.profiler.enabled = True
+    variants = (Variant("default"), Variant("flip_x", flip_x=True))
+    result = solve_portfolio(game, variants, executor="serial")
+    profile = game.profiler.dict()
+    assert "portfolio" in profile["stages"]
+    assert {
+        name: record["ops"] for name, record in profile["portfolio"].items()
+    } == result.counts
+    assert profile["mismatch"][-1]["mismatch"] == 0
+    # 置き換えた盤面にもゲームと同じ設定がされる
+    assert game.board.registry is game.dies
+    assert game.board.profiler is game.profiler
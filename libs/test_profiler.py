@@ -0,0 +1,18 @@
+import pytest
+
+from .data import Cell
+from .game import Game
+from .test_replay import make_input
+
+
+@pytest.mark.parametrize("fast_swap", [True, False])
+def test_phantom_applies_are_not_die_calls(fast_swap: bool):
+    game = Game(make_input(10, 9), executor="serial", fast_swap=fast_swap, profile=True)
+    game.swap(game.board, Cell(1, 2), Cell(7, 6))
+    profile = game.profiler.dict()
+    ops = len(game.logs)
+    assert ops > 0
+    # 盤面に適用した抜き型のみapply_dieに計上する
+    assert profile["apply_die"]["calls"] == (0 if fast_swap else ops)
+    assert profile["phantom_apply"]["calls"] == (ops if fast_swap else 0)
+    assert sum(swap["ops"] for swap in profile["swap"].values()) == ops
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from .data import Cell, Direction
+from .game import Game
+from .patterns import Board, CuttingDie
+from .replay import ReplayEngine, ops_to_array
+
+
+def make_input(width: int, height: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    start = rng.integers(0, 4, (height, width))
+    goal = rng.permutation(start.ravel()).reshape(height, width)
+    return {
+        "board": {
+            "width": width,
+            "height": height,
+            "start": ["".join(map(str, row)) for row in start],
+            "goal": ["".join(map(str, row)) for row in goal],
+        },
+        "general": {
+            "n": 1,
+            "patterns": [{"p": 25, "width": 3, "height": 2, "cells": ["101", "010"]}],
+        },
+    }
+
+
+def make_game(width: int, height: int, seed: int = 0) -> Game:
+    return Game(make_input(width, height, seed), executor="serial")
+
+
+def random_ops(game: Game, count: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    ops = []
+    for _ in range(count):
+        die = game.dies[int(rng.integers(len(game.dies)))]
+        x = int(rng.integers(1 - die.width, game.board.width))
+        y = int(rng.integers(1 - die.height, game.board.height))
+        ops.append((die.id, x, y, int(rng.integers(len(Direction)))))
+    return np.array(ops, dtype=np.int32)
+
+
+def test_fast_path_matches_reference():
+    game = make_game(12, 9)
+    engine = ReplayEngine(game.dies, game.board.width, game.board.height)
+    ops = random_ops(game, 300)
+    start = game.board.field.copy()
+    assert np.array_equal(
+        engine.replay(start, ops), engine.replay(start, ops, reference=True)
+    )
+    assert engine.first_divergence(start, ops, interval=64) is None
+
+
+def test_replay_reproduces_game_logs():
+    game = make_game(16, 16)
+    start = game.board.field.copy()
+    game.main()
+    engine = ReplayEngine(game.dies, game.board.width, game.board.height)
+    result = engine.verify(start, ops_to_array(game.logs), game.goal.field)
+    assert result.n == len(game.logs)
+    assert result.match_rate == 1
+    assert result.divergence is None
+
+
+def test_first_divergence_finds_broken_die():
+    game = make_game(10, 8)
+    engine = ReplayEngine(game.dies, game.board.width, game.board.height)
+    ops = random_ops(game, 200, seed=1)
+    start = game.board.field.copy()
+    # 高速な経路の抜き型を1つだけ別のパターンに差し替える
+    broken = 25
+    engine.dies = list(game.dies)
+    engine.dies[broken] = CuttingDie(broken, 3, 2, ["111", "000"])
+
+    expected = None
+    board = Board(game.board.width, game.board.height, start.copy())
+    reference = Board(game.board.width, game.board.height, start.copy())
+    for i, (p, x, y, s) in enumerate(ops.tolist()):
+        board._apply_die(engine.dies[p], Cell(x, y), s)
+        reference._apply_die(game.dies[p], Cell(x, y), s)
+        if not np.array_equal(board.field, reference.field):
+            expected = i
+            break
+    assert expected is not None
+    assert engine.first_divergence(start, ops, interval=32) == expected
+
+    result = engine.verify(start, ops, engine.replay(start, ops, reference=True))
+    assert result.divergence is None
+    result = engine.verify(
+        start, ops, engine.replay(start, ops, reference=True), check=True
+    )
+    assert result.divergence == expected
+
+
+@pytest.mark.parametrize("reference", [False, True])
+def test_invalid_op_reports_index(reference: bool):
+    game = make_game(6, 6)
+    engine = ReplayEngine(game.dies, game.board.width, game.board.height)
+    ops = random_ops(game, 10)
+    ops[7] = (0, game.board.width, 0, Direction.UP)
+    with pytest.raises(ValueError, match="invalid op 7"):
+        engine.replay(game.board.field, ops, reference=reference)
+    ops[7] = (len(game.dies), 0, 0, Direction.UP)
+    with pytest.raises(ValueError, match="invalid op 7"):
+        engine.first_divergence(game.board.field, ops, interval=4)
+
+
+def test_ops_to_array_accepts_formats():
+    ops = [{"p": 1, "x": -2, "y": 3, "s": 2}, (4, 5, -6, 1)]
+    assert ops_to_array(ops).tolist() == [[1, -2, 3, 2], [4, 5, -6, 1]]
+    assert ops_to_array([]).shape == (0, 4)
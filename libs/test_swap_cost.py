@@ -0,0 +1,57 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from .data import Cell
+from .patterns import Board, PhantomBoard
+from .swap_cost import CORNERS, INVALID_COST, cheapest_corner, swap_costs
+from .test_replay import make_game
+
+
+def pairs(width: int, height: int) -> list[tuple[int, int, int, int]]:
+    cells = list(itertools.product(range(width), range(height)))
+    return [(*a, *b) for a, b in itertools.permutations(cells, 2)]
+
+
+@pytest.mark.parametrize("width, height", [(1, 5), (5, 1), (3, 4), (7, 6), (9, 9)])
+def test_costs_match_dry_run(width: int, height: int):
+    game = make_game(width, height)
+    for x_1, y_1, x_2, y_2 in pairs(width, height):
+        costs = swap_costs(x_1, y_1, x_2, y_2, width, height)
+        for corner, cost in zip(CORNERS, costs.tolist()):
+            phantom = PhantomBoard(width, height)
+            if cost == INVALID_COST:
+                # 交換できない角の手順は盤面外への適用などで失敗する
+                with pytest.raises((ValueError, AssertionError)):
+                    game._swap_corner(phantom, corner, Cell(x_1, y_1), Cell(x_2, y_2))
+                continue
+            game._swap_corner(phantom, corner, Cell(x_1, y_1), Cell(x_2, y_2))
+            assert len(phantom.ops) == cost, (x_1, y_1, x_2, y_2, corner)
+
+            # 操作列を適用すると2点のみが入れ替わる
+            index = np.arange(width * height).reshape(height, width)
+            board = Board(width, height, index.copy())
+            for log in phantom.ops:
+                board._apply_die(game.dies[log.p], Cell(log.x, log.y), log.s)
+            index[y_1, x_1], index[y_2, x_2] = index[y_2, x_2], index[y_1, x_1]
+            assert np.array_equal(board.field, index), (x_1, y_1, x_2, y_2, corner)
+
+
+def test_every_pair_has_a_corner():
+    width, height = 12, 10
+    x_1, y_1, x_2, y_2 = np.array(pairs(width, height)).T
+    costs = swap_costs(x_1, y_1, x_2, y_2, width, height)
+    assert (costs.min(axis=0) < INVALID_COST).all()
+
+
+def test_vectorised_matches_scalar():
+    width, height = 13, 7
+    rng = np.random.default_rng(0)
+    x_1, x_2 = rng.integers(0, width, (2, 50))
+    y_1, y_2 = rng.integers(0, height, (2, 50))
+    corners, costs = cheapest_corner(x_1, y_1, x_2, y_2, width, height)
+    for i in range(50):
+        scalar = swap_costs(x_1[i], y_1[i], x_2[i], y_2[i], width, height)
+        assert costs[i] == scalar.min()
+        assert scalar[corners[i]] == scalar.min()
@@ -1,15 +1,18 @@
 import json
-import os
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 
 import numpy as np
-import ray
 
-from libs import Cell, Game
+from libs import Board, Cell, Game
+from libs.anytime import AnswerSubmitter, AnytimeSolver
 from libs.arg_parse import parser
 from libs.network import API
+from libs.oplog import OpLog
+from libs.portfolio import solve_portfolio
+from libs.replay import ReplayEngine, ops_to_array
 
 
 @dataclass
@@ -18,7 +21,10 @@ class DebugConfig:
     seed: int | None = None
 
 
-ray.init(num_cpus=os.cpu_count() - 2)
+@dataclass
+class ExecutorConfig:
+    name: str = "auto"
+    workers: int | None = None
 
 
 def save_logs(game: Game, log_dir: str | Path = "./logs"):
@@ -31,13 +37,15 @@ def save_logs(game: Game, log_dir: str | Path = "./logs"):
         f.write(f"Width: {game.board.width}\n")
         f.write(f"Height: {game.board.height}\n\n")
         f.write(f"n: {len(game.logs)}\n\n")
-        f.write(f"True: {np.count_nonzero(game.check_board())}\n")
-        f.write(f"False: {np.count_nonzero(~game.check_board())}\n")
-        f.write(
-            f"True rate: {np.count_nonzero(game.check_board())/game.board.field.size:%}"
-        )
+        matched = game.board.field.size - game.mismatch_count
+        f.write(f"True: {matched}\n")
+        f.write(f"False: {game.mismatch_count}\n")
+        f.write(f"True rate: {matched/game.board.field.size:%}")
     with (log_dir / "log.json").open("w") as f:
         json.dump(game.format_log(), f, indent=2)
+    game.logs.save(log_dir / "log.bin")
+    if game.profiler.enabled:
+        game.profiler.save(log_dir / "profile.json")
 
 
 def dump_initialize(game: Game, log_dir: str | Path = "./logs"):
@@ -83,24 +91,50 @@ def post_debug_info(dump: str | Path | dict, log: str | Path | dict):
     api.post_debug_info(dump, log)
 
 
+def solve(game: Game, portfolio: bool = False):
+    if not portfolio:
+        game.main()
+        return
+    result = solve_portfolio(game, executor=game.executor)
+    print(f"portfolio: {result.best} {result.counts}")
+
+
 def offline(
     input_json: str | Path | dict,
     log_dir: str | Path = "./logs",
     debug_config: DebugConfig | None = None,
+    executor_config: ExecutorConfig | None = None,
+    profile: bool = False,
+    portfolio: bool = False,
 ):
     if isinstance(input_json, (str, Path)):
         with open(input_json) as f:
             input_json = json.load(f)
+    executor_config = executor_config or ExecutorConfig()
 
     if debug_config is None:
-        game = Game(input_json)
+        game = Game(
+            input_json,
+            executor=executor_config.name,
+            workers=executor_config.workers,
+            profile=profile,
+        )
     else:
-        game = Game(input_json, debug=debug_config.size, debug_seed=debug_config.seed)
+        game = Game(
+            input_json,
+            debug=debug_config.size,
+            debug_seed=debug_config.seed,
+            executor=executor_config.name,
+            workers=executor_config.workers,
+            profile=profile,
+        )
     dump_initialize(game, log_dir)
 
-    game.main()
-
-    save_logs(game, log_dir)
+    try:
+        solve(game, portfolio)
+        save_logs(game, log_dir)
+    finally:
+        game.executor.shutdown()
 
 
 def reproduce(input_: str | Path | dict, output: str | Path | dict):
@@ -109,16 +143,20 @@ def reproduce(input_: str | Path | dict, output: str | Path | dict):
             input_ = json.load(f)
     game = Game(input_)
 
-    if isinstance(output, (str, Path)):
-        with open(output, "r") as f:
-            output = json.load(f)
-
-    [
-        game.apply_die(
-            game.board, game.dies[info["p"]], Cell(info["x"], info["y"]), info["s"]
-        )
-        for info in output["ops"]
-    ]
+    if isinstance(output, (str, Path)) and Path(output).suffix == ".bin":
+        ops = OpLog.load(output).array()
+    else:
+        if isinstance(output, (str, Path)):
+            with open(output, "r") as f:
+                output = json.load(f)
+        ops = ops_to_array(output["ops"])
+    engine = ReplayEngine(game.dies, game.board.width, game.board.height)
+    result = engine.verify(game.board.field, ops, game.goal.field, check=True)
+    print(f"n: {result.n}, True rate: {result.match_rate:%}")
+    if result.divergence is not None:
+        print(f"diverged from reference at op {result.divergence}")
+    game.board = Board(game.board.width, game.board.height, result.field)
+    game.logs = OpLog.from_array(ops)
 
     save_logs(game, "./reproduce")
 
@@ -127,10 +165,21 @@ def online(
     retry: int,
     interval: float,
     log_dir: str | Path = "./logs",
+    executor_config: ExecutorConfig | None = None,
+    profile: bool = False,
+    deadline: float | None = None,
+    portfolio: bool = False,
+    starts_at: float | None = None,
 ):
     api = API()
-    input_problem = api.get_problem(retry, interval)
-    game = Game(input_problem)
+    input_problem = api.get_problem(retry, interval, starts_at)
+    executor_config = executor_config or ExecutorConfig()
+    game = Game(
+        input_problem,
+        executor=executor_config.name,
+        workers=executor_config.workers,
+        profile=profile,
+    )
 
     dump_initialize(game, log_dir)
     try:
@@ -140,17 +189,46 @@ def online(
         print(input_problem)
 
     print("start resolving...")
-    game.main()
-
-    response = api.post_answer(game.format_log(), retry, interval)
-    print(response)
-    save_logs(game, log_dir)
+    try:
+        if deadline is None:
+            solve(game, portfolio)
+            response = api.post_answer(game.logs, retry, interval)
+            print(response)
+        else:
+            # 最初の回答を提出した後も期限まで操作数の少ない回答を探して再提出する
+            with AnswerSubmitter(
+                lambda answer: api.post_answer(answer, retry, interval)
+            ) as submitter:
+                best = AnytimeSolver(
+                    input_problem,
+                    submitter.submit,
+                    deadline=input_problem.get("startsAt", starts_at or time.time())
+                    + deadline,
+                    portfolio=portfolio,
+                    executor=executor_config.name,
+                    workers=executor_config.workers,
+                    profile=profile,
+                ).solve()
+            if best is None:
+                # 完成を確認できた回答がなければ通常の処理で解いて提出する
+                print("no verified answer, fall back to the default solver")
+                solve(game)
+                response = api.post_answer(game.logs, retry, interval)
+                print(response)
+            else:
+                game.executor.shutdown()
+                game = best
+        save_logs(game, log_dir)
+    finally:
+        if game is not None:
+            game.executor.shutdown()
 
 
 def main():
     args = parser.parse_args()
 
     log_dir = Path(args.log, str(datetime.now()))
+    executor_config = ExecutorConfig(name=args.executor, workers=args.workers)
 
     if args.debug:
         game_input = args.json
@@ -182,10 +260,26 @@ def main():
                 },
             }
 
-        offline(game_input, log_dir, debug_config)
+        offline(
+            game_input,
+            log_dir,
+            debug_config,
+            executor_config,
+            args.profile,
+            args.portfolio,
+        )
 
     else:
-        online(args.retry, args.interval, log_dir)
+        online(
+            args.retry,
+            args.interval,
+            log_dir,
+            executor_config,
+            args.profile,
+            args.deadline,
+            args.portfolio,
+            args.starts_at,
+        )
 
     if args.post_debugger:
         post_debug_info(dump=log_dir / "dump.json", log=log_dir / "log.json")